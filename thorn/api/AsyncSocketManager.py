@@ -0,0 +1,226 @@
+import datetime
+import json
+
+import asyncio
+import websockets
+
+from confluent_kafka import Producer
+
+from thorn.api import config
+from thorn.api.exchanges.binance import config as binance_config
+from thorn.api.exchanges.bitmex import config as bitmex_config
+from thorn.api.exchanges.gemini import config as gemini_config
+
+
+class AsyncSocketManager(object):
+
+    def __init__(self, brokers=[], loop=None):
+        '''Initialization method for the `AsyncSocketManager` class. Unlike
+        `SocketManager`, which blocks on a single socket per process, the class
+        runs any number of exchange sockets on one asyncio event loop and
+        publishes their messages with a single Kafka `Producer`. Symbols are
+        carried over as few connections as each exchange allows: Binance
+        combined streams, one multi-arg `subscribe` on Bitmex, and one
+        connection per symbol on Gemini. Every connection is reopened with
+        exponential backoff when it drops, and its subscriptions are replayed.
+
+        Ex:
+            manager = AsyncSocketManager()
+            manager.add_binance(['bnbbtc', 'ethbtc'])
+            manager.add_bitmex(['XBTUSD', 'ETHUSD'])
+            manager.add_gemini(['BTCUSD'])
+            loop.run_until_complete(manager.run())
+
+        Args:
+            - brokers (list, optional): broker information for Producer.
+                Defaults to config settings.
+            - loop (asyncio.event_loop, optional): The event loop of the sockets.
+
+        Returns: None.
+        '''
+        self.brokers = brokers
+        if len(self.brokers) < 1:
+            self.brokers = config.SOCKET_MANAGER_CONFIG['brokers']
+        if len(self.brokers) > 1:
+            self.broker_string = ",".join(self.brokers)
+        else:
+            self.broker_string = self.brokers[0]
+        self.loop = asyncio.get_event_loop() if loop is None else loop
+        self.p = Producer({'bootstrap.servers': self.broker_string})
+        self.connections = []
+        self.reconnects = {}
+
+    def add_connection(self, name, url, topic, subscribe=[], parse=None):
+        '''Registers a socket connection.
+
+        Args:
+            - name (str): The name of the connection, used in logs and in
+                `self.reconnects`.
+            - url (str): The websocket url.
+            - topic (str): The Kafka topic of the messages.
+            - subscribe (list[dict], optional): The messages sent every time
+                the connection opens.
+            - parse (function, optional): Turns a decoded message into the
+                message to publish, or None to drop it.
+
+        Returns: None.
+        '''
+        self.connections.append({'name': name, 'url': url, 'topic': topic,
+                                 'subscribe': subscribe, 'parse': parse})
+
+    def add_binance(self, symbols, stream='depth', base=None):
+        '''Subscribes to `stream` for every symbol of `symbols` over Binance
+        combined streams, `binance_max_streams` symbols per connection. The
+        combined stream wrapper is removed, so the published messages are the
+        same as those of a single stream socket.
+
+        Args:
+            - symbols (list[str]): The Binance symbols. Ex: ['bnbbtc', 'ethbtc']
+            - stream (str, optional): The stream. Defaults to 'depth'.
+            - base (str, optional): The combined streams url. Defaults to config
+                settings.
+
+        Returns: None.
+
+        Raises: AttributeError.
+        '''
+        if stream not in binance_config.WEBSOCKET_CONFIG['valid_streams']:
+            raise AttributeError('stream {} not a valid stream'.format(stream))
+        base = binance_config.WEBSOCKET_CONFIG['combined_base'] if base is None else base
+        n = config.SOCKET_MANAGER_CONFIG['binance_max_streams']
+        symbols = [symbol.lower() for symbol in symbols]
+        for i in range(0, len(symbols), n):
+            streams = '/'.join('{}@{}'.format(symbol, stream) for symbol in symbols[i:i+n])
+            self.add_connection('binance_{}'.format(i // n), '{}?streams={}'.format(base, streams),
+                                config.SOCKET_MANAGER_CONFIG['binance_stream_name'],
+                                parse=lambda m: m.get('data'))
+
+    def add_bitmex(self, symbols, stream='depth', base=None):
+        '''Subscribes to `stream` for every symbol of `symbols` with a single
+        Bitmex `subscribe` message on one connection.
+
+        Args:
+            - symbols (list[str]): The Bitmex symbols. Ex: ['XBTUSD', 'ETHUSD']
+            - stream (str, optional): The stream, either a Bitmex table name or
+                one of the `stream_dictionary` aliases. Defaults to 'depth'.
+            - base (str, optional): The websocket url. Defaults to config settings.
+
+        Returns: None.
+        '''
+        stream = bitmex_config.WEBSOCKET_CONFIG['stream_dictionary'].get(stream, stream)
+        base = bitmex_config.WEBSOCKET_CONFIG['base'] if base is None else base
+        args = ['{}:{}'.format(stream, symbol) for symbol in symbols]
+
+        def parse(m):
+            # drop the welcome and subscription acknowledgement messages
+            if 'table' not in m:
+                return None
+            return m
+
+        self.add_connection('bitmex', base, config.SOCKET_MANAGER_CONFIG['bitmex_stream_name'],
+                            subscribe=[{'op': 'subscribe', 'args': args}], parse=parse)
+
+    def add_gemini(self, symbols, base=None):
+        '''Subscribes to the market data of every symbol of `symbols`. Gemini
+        serves one symbol per connection, so each symbol gets its own connection
+        and the symbol is added to its messages.
+
+        Args:
+            - symbols (list[str]): The Gemini symbols. Ex: ['BTCUSD']
+            - base (str, optional): The market data url. Defaults to config
+                settings.
+
+        Returns: None.
+        '''
+        base = gemini_config.WEBSOCKET_CONFIG['base'] if base is None else base
+        for symbol in symbols:
+            def parse(m, symbol=symbol):
+                m['symbol'] = symbol
+                return m
+            self.add_connection('gemini_{}'.format(symbol), '{}/{}'.format(base, symbol),
+                                config.SOCKET_MANAGER_CONFIG['gemini_stream_name'], parse=parse)
+
+    def publish(self, connection, message):
+        '''Decodes and parses a raw socket message of `connection` and produces
+        it to the connection's topic. When the local queue of the producer is
+        full, delivery reports are served to make room and the message is
+        produced again, up to `produce_retries` times.
+
+        Returns: bool, whether the message was published.
+
+        Raises: BufferError, if the queue is still full after the retries.
+        '''
+        m = json.loads(message)
+        if connection['parse'] is not None:
+            m = connection['parse'](m)
+        if m is None:
+            return False
+        value = json.dumps(m).encode('utf-8')
+        retries = config.SOCKET_MANAGER_CONFIG['produce_retries']
+        for attempt in range(retries + 1):
+            try:
+                self.p.produce(connection['topic'], value)
+                break
+            except BufferError:
+                if attempt == retries:
+                    raise
+                self.p.poll(0.1)
+        self.p.poll(0)
+        return True
+
+    async def connect(self, connection):
+        '''Keeps `connection` open, publishing its messages. When it drops it is
+        reopened after a delay that starts at `reconnect_backoff` seconds and
+        doubles after every failed attempt up to `max_reconnect_backoff`. The
+        delay is reset once a message is received. Any error other than a
+        cancellation, including one raised while publishing a message, is
+        logged and goes through the same reconnection.
+
+        ASYNC
+
+        Returns: None, it runs until cancelled.
+        '''
+        initial = config.SOCKET_MANAGER_CONFIG['reconnect_backoff']
+        backoff = initial
+        while True:
+            try:
+                async with websockets.connect(connection['url']) as ws:
+                    print('AsyncSocketManager {}: opened'.format(connection['name']))
+                    for payload in connection['subscribe']:
+                        await ws.send(json.dumps(payload))
+                    while True:
+                        message = await ws.recv()
+                        backoff = initial
+                        self.publish(connection, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('AsyncSocketManager {}: closed ({}: {}), reconnecting in {}s'.format(
+                        connection['name'], type(e).__name__, e, backoff))
+            self.reconnects[connection['name']] = self.reconnects.get(connection['name'], 0) + 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff*2, config.SOCKET_MANAGER_CONFIG['max_reconnect_backoff'])
+
+    async def run(self, stop_at=None):
+        '''Runs every registered connection until `stop_at`, or indefinitely
+        if it is not set.
+
+        ASYNC
+
+        Args:
+            - stop_at (datetime.datetime, optional): The time at which to stop.
+
+        Returns: None.
+        '''
+        if len(self.connections) == 0:
+            return None
+        tasks = [asyncio.ensure_future(self.connect(connection)) for connection in self.connections]
+        timeout = None
+        if stop_at is not None:
+            timeout = max((stop_at - datetime.datetime.utcnow()).total_seconds(), 0)
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if len(pending) > 0:
+            await asyncio.wait(pending)
+        self.p.flush()
@@ -1,4 +1,5 @@
 import time
+import math
 import datetime
 import os
 import json
@@ -9,18 +10,37 @@ import ccxt.async as ccxt
 from confluent_kafka import Producer
 
 from thorn.api import config
+from thorn.utils import get_serializer, diff_levels, exchange_bucket, stalest
+from thorn.utils.serializers import SNAPSHOT, DELTA
+
+# the ccxt functions fetching many symbols at once
+BULK_FUNCTIONS = {
+    'fetchOrderBook': 'fetchOrderBooks',
+    'fetchTicker': 'fetchTickers',
+}
 
 class UnifiedAPIManager(object):
 
-    def __init__(self, symbol, function, exchanges, delay, brokers=[], loop=None):
-        '''Initialization for UnifiedAPIManager class
+    def __init__(self, symbols, function, exchanges, delay, brokers=[], loop=None, serializer=None,
+                    keyframe_interval=None, concurrency=None):
+        '''Initialization for UnifiedAPIManager class. A single manager tracks
+        any number of symbols on any number of exchanges from one event loop,
+        with one ccxt instance and one Kafka `Producer` per exchange.
 
-        - symbol (str): symbol as string.
+        - symbols (list[str]): the symbols to track, or a single symbol as string.
         - function (str): dictionary of function call properties.
         - exchanges (list[ccxt.exchange]): list of instantiated ccxt exchanges.
         - delay (int): the delay between API calls in ms.
         - brokers (list, optional): broker information for Producer. Defaults to
             config settings.
+        - serializer (str, optional): The serializer of the order book messages,
+            'binary' or 'json'. Defaults to config settings.
+        - keyframe_interval (int, optional): The number of order book messages
+            between two full snapshots. The messages in between only carry the
+            levels that changed. Defaults to config settings; 1 publishes full
+            snapshots only.
+        - concurrency (int, optional): The maximum number of requests in flight
+            at once, over all exchanges and symbols. Defaults to config settings.
 
         Returns: UnifiedAPIManager instance.
 
@@ -32,18 +52,35 @@ class UnifiedAPIManager(object):
             self.broker_string = ",".join(self.brokers)
         else:
             self.broker_string = self.brokers[0]
-        self.symbol = symbol
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.exchange_symbols = {}
         self.function = function
         self.loop = asyncio.get_event_loop() if loop is None else loop
         self.exchanges = exchanges
         self.delay = delay
-        self.p = Producer(**{'bootstrap.servers': self.broker_string, 'group.id': 'mygroup'})
+        self.producers = {}
         self.stream_suffixes = config.API_MANAGER_CONFIG['function_stream_suffixes']
+        if serializer is None:
+            serializer = config.API_MANAGER_CONFIG.get('serializer', 'json')
+        self.serializer = get_serializer(serializer)
+        if keyframe_interval is None:
+            keyframe_interval = config.API_MANAGER_CONFIG.get('keyframe_interval', 1)
+        self.keyframe_interval = keyframe_interval
+        if concurrency is None:
+            concurrency = config.API_MANAGER_CONFIG.get('concurrency', 100)
+        self.concurrency = concurrency
+        self.semaphore = None
+        self.seqs = {}
+        self.last_books = {}
+        self.skipped = {}
+        self.last_fetched = {}
 
     async def filter_exchanges(self):
         '''Given an instantiated list of exchanges, a ccxt universal function,
-        and a symbol, filter the exchanges that are have a market w.r.t. the
-        symbol and ccxt provides functionality for the instantiated function.
+        and a list of symbols, filter the exchanges that have a market for at
+        least one of the symbols and for which ccxt provides functionality for
+        the instantiated function. The symbols listed by each exchange are kept
+        in `self.exchange_symbols`. Markets are loaded concurrently.
 
         ASYNC
 
@@ -51,20 +88,37 @@ class UnifiedAPIManager(object):
 
         Raises: AttributeError.
         '''
+        exchanges = [exchange for exchange in self.exchanges if exchange.has.get(self.function, False)]
+        markets = await asyncio.gather(*[exchange.load_markets() for exchange in exchanges])
         ret = []
-        for exchange in self.exchanges:
-            if exchange.has.get(self.function, False):
-                markets = await exchange.load_markets()
-                if self.symbol in markets:
-                    ret.append(exchange)
+        for exchange, m in zip(exchanges, markets):
+            symbols = [symbol for symbol in self.symbols if symbol in m]
+            if len(symbols) > 0:
+                self.exchange_symbols[exchange.id] = symbols
+                ret.append(exchange)
         if len(ret) == 0:
             raise AttributeError('filter_exchanges error: no exchanges found with function implemented')
         self.exchanges = ret
 
+    def producer(self, exchange):
+        '''Returns the Kafka `Producer` of `exchange`, creating it on first use.'''
+        if exchange.id not in self.producers:
+            self.producers[exchange.id] = Producer(**{'bootstrap.servers': self.broker_string,
+                                                      'group.id': 'mygroup'})
+        return self.producers[exchange.id]
+
+    def symbols_of(self, exchange):
+        '''Returns the symbols tracked on `exchange`, all of `self.symbols` if
+        the exchanges were not filtered.
+        '''
+        return self.exchange_symbols.get(exchange.id, self.symbols)
+
     async def manage(self, stop_at=None, params={}):
         '''Wrapper function that manages the publication of market data to
-        designated streams. Depending on the instantiated function, fetch
-        data related to that function and then sleep according to `self.delay`.
+        designated streams. Depending on the instantiated function, the symbols
+        of every exchange (see `symbols_of`) are fetched on its own fixed-rate schedule of one call per
+        `self.delay` ms (see `tick`), so a slow exchange does not hold back the
+        others, and within the request budget of the exchange.
 
         ASYNC
 
@@ -77,34 +131,136 @@ class UnifiedAPIManager(object):
         Returns: None.
         '''
         if self.function == 'fetchOrderBook':
-            if stop_at is not None:
-                t = datetime.datetime.utcnow()
-                while t < stop_at:
-                    await self.manage_fetch_order_book(self.symbol, self.exchanges, params=params)
-                    t = datetime.datetime.utcnow()
-                    time.sleep(self.delay / 1e3)
-            else:
-                while True:
-                    await self.manage_fetch_order_book(self.symbol, self.exchanges, params=params)
-                    time.sleep(self.delay / 1e3)
-
-        if self.function == 'fetchTicker':
-            if stop_at is not None:
-                t = datetime.datetime.utcnow()
-                while t < stop_at:
-                    await self.manage_fetch_ticker(self.symbol, self.exchanges, params=params)
-                    t = datetime.datetime.utcnow()
-                    time.sleep(self.delay / 1e3)
+            fetch, fetch_bulk = self.publish_order_book, self.publish_order_books
+        elif self.function == 'fetchTicker':
+            fetch, fetch_bulk = self.publish_ticker, self.publish_tickers
+        else:
+            return None
+        ticks = []
+        for exchange in self.exchanges:
+            symbols = self.symbols_of(exchange)
+            if len(symbols) > 1 and self.has_bulk(exchange):
+                # a single request per tick for all the symbols
+                ticks.append(self.tick(fetch_bulk, [tuple(symbols)], exchange, stop_at=stop_at, params=params))
             else:
-                while True:
-                    await self.manage_fetch_ticker(self.symbol, self.exchanges, params=params)
-                    time.sleep(self.delay / 1e3)
+                ticks.append(self.tick(fetch, symbols, exchange, stop_at=stop_at, params=params))
+        await asyncio.gather(*ticks)
+
+    def has_bulk(self, exchange):
+        '''Returns whether `exchange` can fetch the data of many symbols in a
+        single request for the instantiated function, with `fetch_order_books`
+        or `fetch_tickers`.
+        '''
+        return bool(exchange.has.get(BULK_FUNCTIONS.get(self.function), False))
+
+    async def tick(self, fetch, symbols, exchange, stop_at=None, params={}):
+        '''Calls `fetch(symbol, exchange, params=params)` for `symbols` once
+        every `self.delay` ms until `stop_at`. The schedule is fixed-rate: the
+        period is measured from the previous tick rather than from the end of
+        the previous fetch, and ticks missed while the loop was busy are dropped
+        instead of fired in a burst.
+
+        Every tick fetches as many symbols as the token bucket of the exchange
+        (see `thorn.utils.exchange_bucket`) allows without waiting, the ones
+        fetched the longest time ago first, so that the exchange budget is
+        spread over the symbols by staleness. A symbol whose previous fetch is
+        still running is not fetched again; every symbol left out of a tick is
+        counted in `self.skipped[exchange.id]`.
+
+        ASYNC
+
+        Args:
+            - fetch (function): A coroutine function such as `publish_order_book`.
+            - symbols (list[str]): The symbols to fetch.
+            - exchange (ccxt.exchange): The exchange to fetch from.
+            - stop_at (datetime.datetime, optional): Stop at this time.
+            - params (dict, optional): The optional API request paramters.
+
+        Returns: None.
+        '''
+        period = self.delay / 1e3
+        bucket = exchange_bucket(exchange)
+        last_fetched = self.last_fetched.setdefault(exchange.id, {})
+        running = {}
+        next_tick = self.loop.time()
+        while stop_at is None or datetime.datetime.utcnow() < stop_at:
+            running = {s: f for s, f in running.items() if not f.done()}
+            idle = [s for s in symbols if s not in running]
+            budget = len(idle) if bucket is None else bucket.budget()
+            for symbol in stalest(idle, last_fetched, budget):
+                last_fetched[symbol] = self.loop.time()
+                running[symbol] = asyncio.ensure_future(self.guard(fetch, symbol, exchange, params=params))
+            left_out = len(symbols) - min(budget, len(idle))
+            if left_out > 0:
+                self.skipped[exchange.id] = self.skipped.get(exchange.id, 0) + left_out
+            next_tick += period
+            now = self.loop.time()
+            if next_tick < now:
+                next_tick += period*math.ceil((now - next_tick) / period)
+            await asyncio.sleep(next_tick - now)
+        if len(running) > 0:
+            await asyncio.wait(list(running.values()))
+
+    async def guard(self, fetch, symbol, exchange, params={}):
+        '''Runs a single fetch once the token bucket of the exchange allows it
+        and fewer than `concurrency` requests are in flight, reporting its exception instead of raising it so that one failed call
+        does not stop the exchange's schedule.
+
+        ASYNC
+        '''
+        bucket = exchange_bucket(exchange)
+        if bucket is not None:
+            await bucket.wait()
+        if self.semaphore is None:
+            # created on the running loop
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self.semaphore:
+                await fetch(symbol, exchange, params=params)
+        except Exception as e:
+            print('{} {} {}: {}'.format(exchange.id, symbol, self.function, e))
+
+    def encode_order_book(self, m):
+        '''Turns an order book fetched for `m['exchange']` and `m['symbol']` into
+        the next message to publish for that book. Every `keyframe_interval`
+        messages (and for the first message) this is the full book; otherwise
+        it only holds the levels that changed since the previous book, with a
+        quantity of 0 for removed levels. Messages are numbered with a `seq`
+        that increases by one per published message, so that consumers can
+        detect a missed delta.
+
+        Args:
+            - m (dict): The fetched order book, with `exchange` and `symbol` set.
+
+        Returns: dict, the message to publish, or None if nothing changed.
+        '''
+        key = (m['exchange'], m['symbol'])
+        bids = {l[0]: l[1] for l in m['bids']}
+        asks = {l[0]: l[1] for l in m['asks']}
+        last = self.last_books.get(key)
+        seq = self.seqs.get(key, 0)
+        if last is None or self.keyframe_interval <= 1 or seq % self.keyframe_interval == 0:
+            m['kind'] = SNAPSHOT
+        else:
+            m = {'exchange': m['exchange'], 'symbol': m['symbol'],
+                 'timestamp': m.get('timestamp'), 'datetime': m.get('datetime'),
+                 'kind': DELTA, 'bids': diff_levels(last[0], bids),
+                 'asks': diff_levels(last[1], asks)}
+            if len(m['bids']) == 0 and len(m['asks']) == 0:
+                return None
+        self.last_books[key] = (bids, asks)
+        self.seqs[key] = seq + 1
+        m['seq'] = seq
+        return m
 
     async def manage_fetch_order_book(self, symbol, exchanges, params={}):
         '''Primary method for managing function `fetchOrderBook`. Awaits for a
         get request from each exchange's API using the unified `fetch_order_book`
-        method. Upon response, add the exchange id to the json and then dump into
-        the Kafka stream determined by `self.stream_suffixes['fetchOrderBook']`.
+        method. Upon response, add the exchange id and symbol to the message,
+        encode it as a snapshot or delta (see `encode_order_book`), serialize it
+        with `self.serializer` and then dump into the Kafka stream determined by
+        `self.stream_suffixes['fetchOrderBook']`, keyed by exchange so that the
+        messages of each exchange stay in order.
 
         ASYNC
 
@@ -118,14 +274,46 @@ class UnifiedAPIManager(object):
 
         Returns: None.
         '''
+        await asyncio.gather(*[self.guard(self.publish_order_book, symbol, exchange, params=params)
+                               for exchange in exchanges])
 
-        async def wait_append_produce(symbol, exchange):
-            m = await exchange.fetch_order_book(symbol)
-            m['exchange'] = exchange.id
-            print(exchange.id, symbol)
-            self.p.produce(symbol.replace('/', '_')+self.stream_suffixes['fetchOrderBook'], json.dumps(m))
+    async def publish_order_book(self, symbol, exchange, params={}):
+        '''Fetches and publishes the order book of `symbol` on a single exchange.
+        See `manage_fetch_order_book`.
 
-        await asyncio.wait([wait_append_produce(symbol, exchange) for exchange in exchanges])
+        ASYNC
+        '''
+        m = await exchange.fetch_order_book(symbol, params=params)
+        self.produce_order_book(symbol, exchange, m)
+
+    async def publish_order_books(self, symbols, exchange, params={}):
+        '''Fetches the order books of all of `symbols` on a single exchange with
+        one `fetch_order_books` request and publishes each of them as its own
+        message. Books of symbols that are not tracked are ignored.
+
+        ASYNC
+        '''
+        books = await exchange.fetch_order_books(list(symbols), params=params)
+        for symbol in symbols:
+            if symbol in books:
+                self.produce_order_book(symbol, exchange, books[symbol])
+
+    def produce_order_book(self, symbol, exchange, m):
+        '''Encodes the order book `m` of `symbol` fetched from `exchange` (see
+        `encode_order_book`) and produces it to the symbol's stream.
+
+        Returns: None.
+        '''
+        m['exchange'] = exchange.id
+        m['symbol'] = symbol
+        print(exchange.id, symbol)
+        m = self.encode_order_book(m)
+        if m is None:
+            return None
+        p = self.producer(exchange)
+        p.produce(symbol.replace('/', '_')+self.stream_suffixes['fetchOrderBook'],
+                    self.serializer.dumps(m, seq=m['seq']), key=exchange.id)
+        p.poll(0)
 
     async def manage_fetch_ticker(self, symbol, exchanges, params={}):
         '''Primary method for managing function `fetchTicker`. Awaits for a
@@ -145,10 +333,38 @@ class UnifiedAPIManager(object):
 
         Returns: None.
         '''
+        await asyncio.gather(*[self.guard(self.publish_ticker, symbol, exchange, params=params)
+                               for exchange in exchanges])
+
+    async def publish_ticker(self, symbol, exchange, params={}):
+        '''Fetches and publishes the ticker of `symbol` on a single exchange.
+        See `manage_fetch_ticker`.
+
+        ASYNC
+        '''
+        m = await exchange.fetch_ticker(symbol, params=params)
+        self.produce_ticker(symbol, exchange, m)
 
-        async def wait_append_produce(symbol, exchange):
-            m = await exchange.fetch_ticker(symbol)
-            m['exchange'] = exchange.id
-            self.p.produce(symbol.replace('/', '_')+self.stream_suffixes['fetchTicker'], json.dumps(m))
+    async def publish_tickers(self, symbols, exchange, params={}):
+        '''Fetches the tickers of all of `symbols` on a single exchange with one
+        `fetch_tickers` request and publishes each of them as its own message.
+        Exchanges that return every ticker regardless of `symbols` are filtered
+        down to the tracked symbols.
 
-        await asyncio.wait([wait_append_produce(symbol, exchange) for exchange in exchanges])
+        ASYNC
+        '''
+        tickers = await exchange.fetch_tickers(list(symbols), params=params)
+        for symbol in symbols:
+            if symbol in tickers:
+                self.produce_ticker(symbol, exchange, tickers[symbol])
+
+    def produce_ticker(self, symbol, exchange, m):
+        '''Produces the ticker `m` of `symbol` fetched from `exchange` to the
+        symbol's stream.
+
+        Returns: None.
+        '''
+        m['exchange'] = exchange.id
+        p = self.producer(exchange)
+        p.produce(symbol.replace('/', '_')+self.stream_suffixes['fetchTicker'], json.dumps(m))
+        p.poll(0)
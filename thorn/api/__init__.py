@@ -1,2 +1,3 @@
 from .SocketManager import SocketManager
+from .AsyncSocketManager import AsyncSocketManager
 from .UnifiedAPIManager import UnifiedAPIManager
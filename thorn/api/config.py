@@ -6,7 +6,14 @@ SOCKET_MANAGER_CONFIG = {
     },
     'binance_stream_name': 'binance_socket',
     'gemini_stream_name': 'gemini_socket',
-    'bitmex_stream_name': 'bitmex_socket'
+    'bitmex_stream_name': 'bitmex_socket',
+    # seconds before reopening a dropped socket, doubled after every failure
+    'reconnect_backoff': 1,
+    'max_reconnect_backoff': 60,
+    # attempts to produce a socket message while the producer queue is full
+    'produce_retries': 50,
+    # streams per Binance combined stream connection
+    'binance_max_streams': 200
 }
 
 API_MANAGER_CONFIG = {
@@ -15,7 +22,33 @@ API_MANAGER_CONFIG = {
     'function_stream_suffixes': {
         'fetchOrderBook': '_order_book',
         'fetchTicker': '_ticker'
-    }
+    },
+    # 'binary' or 'json', see thorn.utils.serializers. 'binary' changes the
+    # format of the order book topics, only use it once every consumer reads
+    # them with thorn.utils.deserialize
+    'serializer': 'json',
+    # publish a full order book every this many messages, deltas otherwise
+    'keyframe_interval': 60,
+    # maximum number of requests in flight per UnifiedAPIManager
+    'concurrency': 100
+}
+
+HTTP_CONFIG = {
+    # connections kept alive per host, per exchange client
+    'pool_size': 10,
+    # connections kept alive in total by the aiohttp session of a loop
+    'async_pool_size': 100,
+    'keepalive_timeout': 30,
+    # seconds
+    'timeout': 10,
+    'retries': 3,
+    'backoff_factor': 0.3,
+    'status_forcelist': [429, 500, 502, 503, 504],
+    # responses of the endpoints in the cache_ttl of the exchange configs
+    'cache_size': 256,
+    # on-disk cache shared by every process, ex: '~/.thorn/cache'. None to keep
+    # it in memory only
+    'cache_dir': None,
 }
 
 KEY_CONFIG = {
@@ -0,0 +1,115 @@
+import copy
+import functools
+
+import asyncio
+
+
+class PendingRequest(Exception):
+    '''Raised by a replayed client when its endpoint method sends a request
+    whose response is not known yet.
+    '''
+    def __init__(self, payload, endpoint):
+        self.payload = payload
+        self.endpoint = endpoint
+        super(PendingRequest, self).__init__(endpoint)
+
+
+class AsyncPublicExchange(object):
+    '''Asynchronous wrapper of a `PublicExchange` client. Every endpoint method
+    of the wrapped client (`depth`, `ticker`, `order_book`, ...) becomes a
+    coroutine whose requests are sent with `get_async`, over the shared
+    `aiohttp` session of the loop, so that requests to many exchanges are in
+    flight at the same time without a thread per request.
+
+    The endpoint methods of the clients are synchronous, so they are replayed:
+    the method runs until it sends a request, the request is awaited, and the
+    method runs again with the responses received so far until it returns.
+    Endpoint methods must therefore not have side effects other than their
+    requests.
+
+    Args:
+        - client (PublicExchange): An instantiated client. Ex: BinancePublic()
+    '''
+    def __init__(self, client):
+        self.client = client
+        self.name = client.name
+
+    async def get(self, payload={}, endpoint=None):
+        '''ASYNC'''
+        return await self.client.get_async(payload=payload, endpoint=endpoint)
+
+    def replay(self, responses):
+        '''Returns a copy of the client whose `get` returns `responses` in
+        order, and raises `PendingRequest` once they are exhausted.
+        '''
+        client = copy.copy(self.client)
+        remaining = iter(responses)
+
+        def get(payload={}, endpoint=None):
+            try:
+                return next(remaining)
+            except StopIteration:
+                raise PendingRequest(payload, endpoint)
+
+        client.get = get
+        return client
+
+    async def call(self, method, *args, **kwargs):
+        '''Runs `method` of the wrapped client, sending its requests with
+        `get_async`.
+
+        ASYNC
+        '''
+        responses = []
+        while True:
+            try:
+                return getattr(self.replay(responses), method)(*args, **kwargs)
+            except PendingRequest as r:
+                responses.append(await self.client.get_async(payload=r.payload, endpoint=r.endpoint))
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+        return functools.partial(self.call, name)
+
+
+async def timed_call(key, coro, timeout=None):
+    '''Awaits `coro` for at most `timeout` seconds. A request that times out is
+    cancelled along with `coro`.
+
+    ASYNC
+
+    Returns: tuple (key, result, error), where `error` is the exception raised
+        by `coro` (asyncio.TimeoutError if it timed out) and `result` is None if
+        it failed.
+    '''
+    try:
+        return key, await asyncio.wait_for(coro, timeout), None
+    except Exception as e:
+        return key, None, e
+
+
+def fan_out(calls, timeout=None):
+    '''Runs the requests in `calls` concurrently and returns their results as
+    they complete, so that a cross-exchange query takes as long as the slowest
+    exchange instead of the sum of them. A request that fails or times out does
+    not affect the others.
+
+    Ex:
+        for f in fan_out({'binance': binance.depth('ETHBTC'),
+                          'kraken': kraken.depth('XETHXXBT')}, timeout={'kraken': 2}):
+            name, book, error = await f
+
+    Args:
+        - calls (dict): Maps a key, usually the exchange name, to a coroutine.
+        - timeout (float or dict, optional): The timeout in seconds of every
+            request, or a dict mapping keys to their own timeout. Keys missing
+            from the dict have no timeout.
+
+    Returns: iterator of awaitables, each resolving to a (key, result, error)
+        tuple (see `timed_call`) in order of completion.
+    '''
+    if not isinstance(timeout, dict):
+        timeout = {key: timeout for key in calls}
+    return asyncio.as_completed([timed_call(key, coro, timeout.get(key)) for key, coro in calls.items()])
@@ -3,21 +3,192 @@ import datetime
 import os
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import asyncio
+import aiohttp
+
+from thorn.api import config as api_config
+from thorn.utils import get_bucket, exchange_config, DiskCache, ResponseCache
+
+SESSIONS = {}
+ASYNC_SESSIONS = {}
+RESPONSE_CACHE = None
+
+def get_response_cache():
+    '''Returns the `ResponseCache` shared by every client of the process,
+    creating it on first use. It is backed by a `DiskCache` in the
+    `cache_dir` of the config, if set, so that the cached responses are also
+    shared by every process on the host. If the directory cannot be created
+    the cache is kept in memory only.
+
+    Returns: ResponseCache.
+    '''
+    global RESPONSE_CACHE
+    if RESPONSE_CACHE is None:
+        conf = api_config.HTTP_CONFIG
+        disk = None
+        if conf.get('cache_dir') is not None:
+            try:
+                disk = DiskCache(os.path.join(conf['cache_dir'], 'responses'))
+            except OSError as e:
+                print('Could not create the response cache directory:', e)
+        RESPONSE_CACHE = ResponseCache(max_size=conf.get('cache_size', 256), disk=disk)
+    return RESPONSE_CACHE
+
+def get_session(key, pool_size=None):
+    '''Returns the pooled `requests.Session` stored under `key`, creating it on
+    first use. Connections are kept alive between requests, so only the first
+    request to a host pays for the TCP and TLS handshakes. The session does not
+    retry failed requests itself, see `PublicExchange.get`.
+
+    Args:
+        - key (str): The key of the session, usually the exchange id.
+        - pool_size (int, optional): The number of connections kept alive per
+            host. Defaults to config settings.
+
+    Returns: requests.Session.
+    '''
+    if key in SESSIONS:
+        return SESSIONS[key]
+    conf = api_config.HTTP_CONFIG
+    pool_size = conf['pool_size'] if pool_size is None else pool_size
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    SESSIONS[key] = session
+    return session
+
+def retry_delay(attempt, retry_after=None):
+    '''Returns the time in seconds to wait before retrying a request for the
+    `attempt`-th time: the exponential backoff of the config, or the
+    `Retry-After` header of the response if it asks for longer.
+    '''
+    delay = api_config.HTTP_CONFIG['backoff_factor']*2**attempt
+    try:
+        return max(delay, float(retry_after))
+    except (TypeError, ValueError):
+        return delay
+
+def get_async_session(loop=None):
+    '''Returns the `aiohttp.ClientSession` of the event loop, creating it on
+    first use. All the clients of a loop share its connector and therefore its
+    pool of kept-alive connections.
+
+    Returns: aiohttp.ClientSession.
+    '''
+    loop = asyncio.get_event_loop() if loop is None else loop
+    if loop not in ASYNC_SESSIONS or ASYNC_SESSIONS[loop].closed:
+        conf = api_config.HTTP_CONFIG
+        connector = aiohttp.TCPConnector(limit=conf['async_pool_size'], limit_per_host=conf['pool_size'],
+                                         keepalive_timeout=conf['keepalive_timeout'])
+        ASYNC_SESSIONS[loop] = aiohttp.ClientSession(connector=connector,
+                                                     timeout=aiohttp.ClientTimeout(total=conf['timeout']))
+    return ASYNC_SESSIONS[loop]
+
+async def close_async_sessions(loop=None):
+    '''Closes the `aiohttp.ClientSession` of the event loop, if any.
+
+    ASYNC
+    '''
+    loop = asyncio.get_event_loop() if loop is None else loop
+    session = ASYNC_SESSIONS.pop(loop, None)
+    if session is not None:
+        await session.close()
 
 class PublicExchange(object):
     '''Base class for Public Exchanges.
+
+    Requests go through the token bucket of the exchange (see
+    `thorn.utils.get_bucket`), filled at the rate declared by the `call_limit`
+    and `per` fields of its config, so that they never exceed the exchange
+    limit. The bucket is shared with every other client of the exchange in the
+    process, including the ccxt instances of `UnifiedAPIManager`.
+
+    Requests are sent over a pooled keep-alive session per exchange (see
+    `get_session`). Connection errors and `status_forcelist` responses are
+    retried with exponential backoff (see `retry_delay`), and every attempt
+    takes a token from the bucket. `get_async` sends them over the `aiohttp`
+    session of the running loop instead.
+
+    Responses of the endpoints listed in the `cache_ttl` dict of the exchange
+    config are cached for that many seconds (see `get_response_cache`). Expired
+    entries are revalidated with `If-None-Match`/`If-Modified-Since` when the
+    server sent an `ETag` or `Last-Modified` header.
     '''
-    def __init__(self, base=None):
+    limiter = None
+    session = None
+    cache = None
+    cache_ttl = {}
+
+    def __init__(self, base=None, name=None, pool_size=None):
         self.base = base
+        self.name = name
+        if name is not None:
+            self.limiter = get_bucket(name)
+        self.session = get_session(base if name is None else name, pool_size=pool_size)
+        self.timeout = api_config.HTTP_CONFIG['timeout']
+        conf = None if name is None else exchange_config(name)
+        if conf is not None and len(conf.get('cache_ttl', {})) > 0:
+            self.cache_ttl = conf['cache_ttl']
+            self.cache = get_response_cache()
 
-    def get(self, payload={}, endpoint=None):
+    def endpoint_name(self, payload={}, endpoint=None):
+        '''Returns the name of the endpoint of a request, as listed in the
+        `cache_ttl` config. APIs that select the endpoint with a payload field
+        should override this.
+        '''
+        return endpoint
+
+    def cache_lookup(self, payload={}, endpoint=None):
+        '''Returns the cache key, the time to live and the cached entry of a
+        request. The key is None if the endpoint is not cached.
+        '''
+        if self.cache is None:
+            return None, None, None
+        ttl = self.cache_ttl.get(self.endpoint_name(payload, endpoint))
+        if ttl is None:
+            return None, None, None
+        params = '&'.join('{}={}'.format(k, v) for k, v in sorted(payload.items()) if v is not None)
+        key = '{}:{}?{}'.format(self.name, self.path(endpoint), params)
+        return key, ttl, self.cache.lookup(key, ttl)
+
+    def path(self, endpoint=None):
         if endpoint is not None:
-            path = os.path.join(self.base, endpoint)
-        else:
-            path = self.base
-        r = requests.get(path, params=payload)
+            return os.path.join(self.base, endpoint)
+        return self.base
+
+    def get(self, payload={}, endpoint=None):
+        key, ttl, entry = self.cache_lookup(payload, endpoint)
+        if entry is not None and self.cache.fresh(entry, ttl):
+            return self.cache.value(entry), None
+        path = self.path(endpoint)
+        conf = api_config.HTTP_CONFIG
+        session = requests if self.session is None else self.session
+        headers = {} if key is None else self.cache.headers(entry)
+        for attempt in range(conf['retries'] + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                r = session.get(path, params=payload, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == conf['retries']:
+                    raise
+                time.sleep(retry_delay(attempt))
+                continue
+            if r.status_code in conf['status_forcelist'] and attempt < conf['retries']:
+                time.sleep(retry_delay(attempt, r.headers.get('Retry-After')))
+                continue
+            break
+        if r.status_code == 304 and entry is not None:
+            return self.cache.value(self.cache.touch(key, entry)), None
         if r.status_code == 200:
-            return r.json(), None
+            value = r.json()
+            if key is not None:
+                self.cache.store(key, value, etag=r.headers.get('ETag'),
+                                 last_modified=r.headers.get('Last-Modified'))
+            return value, None
         else:
             print("Unexpected Status Code in request ", r.url, ':', r.status_code)
             try:
@@ -25,6 +196,48 @@ class PublicExchange(object):
             except Exception:
                 return r, r.status_code
 
+    async def get_async(self, payload={}, endpoint=None):
+        '''Same as `get`, but sent over the shared `aiohttp` session of the
+        running loop (see `get_async_session`), with the same retries. The body
+        of an error response that is not JSON is returned as text.
+
+        ASYNC
+        '''
+        key, ttl, entry = self.cache_lookup(payload, endpoint)
+        if entry is not None and self.cache.fresh(entry, ttl):
+            return self.cache.value(entry), None
+        headers = {} if key is None else self.cache.headers(entry)
+        path = self.path(endpoint)
+        conf = api_config.HTTP_CONFIG
+        params = {k: str(v) for k, v in payload.items() if v is not None}
+        session = get_async_session()
+        for attempt in range(conf['retries'] + 1):
+            if self.limiter is not None:
+                await self.limiter.wait()
+            try:
+                async with session.get(path, params=params, headers=headers) as r:
+                    if r.status in conf['status_forcelist'] and attempt < conf['retries']:
+                        await asyncio.sleep(retry_delay(attempt, r.headers.get('Retry-After')))
+                        continue
+                    if r.status == 304 and entry is not None:
+                        return self.cache.value(self.cache.touch(key, entry)), None
+                    if r.status == 200:
+                        value = await r.json(content_type=None)
+                        if key is not None:
+                            self.cache.store(key, value, etag=r.headers.get('ETag'),
+                                             last_modified=r.headers.get('Last-Modified'))
+                        return value, None
+                    print("Unexpected Status Code in request ", r.url, ':', r.status)
+                    try:
+                        return await r.json(content_type=None), r.status
+                    except Exception:
+                        # the response is closed once the block exits
+                        return await r.text(), r.status
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == conf['retries']:
+                    raise
+                await asyncio.sleep(retry_delay(attempt))
+
     def check_and_reformat_datetime(self, start, end):
         if isinstance(start, datetime.date) and isinstance(end, datetime.date):
             start = time.mktime(start.timetuple())
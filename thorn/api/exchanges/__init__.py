@@ -1,4 +1,5 @@
 from .PublicExchange import PublicExchange
+from .AsyncPublicExchange import AsyncPublicExchange, fan_out
 from .Websocket import Websocket
 
 from .poloniex.Poloniex import PoloniexPublic
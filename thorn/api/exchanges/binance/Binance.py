@@ -21,7 +21,7 @@ class BinancePublic(PublicExchange):
         url = os.path.join(base,version)
         self.default_pair = config.API_CONFIG['default_pair']
         self.valid_limits = config.API_CONFIG['valid_limits']
-        super(BinancePublic, self).__init__(base=url)
+        super(BinancePublic, self).__init__(base=url, name='binance')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=payload, endpoint=endpoint)
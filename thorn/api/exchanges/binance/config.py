@@ -6,10 +6,12 @@ API_CONFIG = {
     'valid_limits': [5, 10, 20, 50, 100, 500, 1000],
     'default_pair': 'ETHBTC',
     'fee_structure': 'fixed',
+    'cache_ttl': {'exchangeInfo': 3600},
 }
 
 WEBSOCKET_CONFIG = {
     'base': 'wss://stream.binance.com:9443/ws',
+    'combined_base': 'wss://stream.binance.com:9443/stream',
     'push_freq': 1,
     'push_per': 'second',
     'disconnect_after': 24,
@@ -15,7 +15,7 @@ class BitfinexPublic(PublicExchange):
         version = config.API_CONFIG['public_version']
         url = os.path.join(base,version)
         self.default_ticker = config.API_CONFIG['default_ticker']
-        super(BitfinexPublic, self).__init__(base=url)
+        super(BitfinexPublic, self).__init__(base=url, name='bitfinex')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
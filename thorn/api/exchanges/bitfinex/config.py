@@ -4,4 +4,5 @@ API_CONFIG = {
     'per': 'minute',
     'public_version': 'v1',
     'default_ticker': 'BTCUSD',
+    'cache_ttl': {'symbols': 3600, 'symbols_details': 3600},
 }
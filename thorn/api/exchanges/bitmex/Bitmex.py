@@ -19,7 +19,7 @@ class BitmexPublic(PublicExchange):
         url = os.path.join(base,version)
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.valid_bins = config.API_CONFIG['valid_bins']
-        super(BitmexPublic, self).__init__(base=url)
+        super(BitmexPublic, self).__init__(base=url, name='bitmex')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
@@ -288,6 +288,7 @@ class BitmexSocket(Websocket):
         except KeyError:
             print('Unexpected stream format in translate_order_book_l2:', message)
             return ret
+        header['action'] = action
         if action == 'update':
             for d in data:
                 r = {}
@@ -296,7 +297,7 @@ class BitmexSocket(Websocket):
                 r['side'] = d['side'].lower()
                 ret.append({**header, **r})
             return ret
-        if action == 'insert':
+        if action == 'insert' or action == 'partial':
             for d in data:
                 r = {}
                 r['price_id'] = d['id']
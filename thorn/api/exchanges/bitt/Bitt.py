@@ -16,7 +16,7 @@ class BittPublic(PublicExchange):
         url = os.path.join(base,version)
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.default_pair = config.API_CONFIG['default_pair']
-        super(BittPublic, self).__init__(base=url)
+        super(BittPublic, self).__init__(base=url, name='bitt')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
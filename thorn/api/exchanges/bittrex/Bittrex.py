@@ -17,7 +17,7 @@ class BittrexPublic(PublicExchange):
         self.valid_orderbook_types = config.API_CONFIG['valid_orderbook_types']
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.default_pair = config.API_CONFIG['default_pair']
-        super(BittrexPublic, self).__init__(base=url)
+        super(BittrexPublic, self).__init__(base=url, name='bittrex')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
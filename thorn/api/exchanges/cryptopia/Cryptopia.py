@@ -15,7 +15,7 @@ class CryptopiaPublic(PublicExchange):
         url = base
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.default_pair = config.API_CONFIG['default_pair']
-        super(CryptopiaPublic, self).__init__(base=url)
+        super(CryptopiaPublic, self).__init__(base=url, name='cryptopia')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
@@ -16,7 +16,7 @@ class EtoroPublic(PublicExchange):
         url = os.path.join(base)
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.default_pair = config.API_CONFIG['default_pair']
-        super(EtoroPublic, self).__init__(base=url)
+        super(EtoroPublic, self).__init__(base=url, name='etoro')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
@@ -17,7 +17,7 @@ class GeminiPublic(PublicExchange):
         url = os.path.join(base, self.public_version)
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.default_pair = config.API_CONFIG['default_pair']
-        super(GeminiPublic, self).__init__(base=url)
+        super(GeminiPublic, self).__init__(base=url, name='gemini')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
@@ -6,6 +6,7 @@ API_CONFIG = {
     'default_pair': 'BTCUSD',
     'default_ticker': 'BTC',
     'fee_structure': 'maker_taker',
+    'cache_ttl': {'symbols': 3600},
 }
 
 
@@ -13,7 +13,7 @@ class KrakenPublic(PublicExchange):
         base = config.API_CONFIG['base']
         self.default_pair = config.API_CONFIG['default_pair']
         self.valid_intervals = config.API_CONFIG['valid_intervals']
-        super(KrakenPublic, self).__init__(base=base)
+        super(KrakenPublic, self).__init__(base=base, name='kraken')
 
     def send_check(self,payload={}, endpoint=None):
         r = self.get(payload=payload, endpoint=endpoint)
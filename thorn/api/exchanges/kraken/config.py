@@ -5,6 +5,7 @@ API_CONFIG = {
     'default_pair': 'XXBTZUSD',
     'valid_intervals' : [1, 5, 15, 30, 60, 240, 1440, 10080, 21600],
     'fee_structure': 'maker_taker',
+    'cache_ttl': {'Assets': 3600, 'AssetPairs': 3600},
 }
 
 FEE_CONFIG = {
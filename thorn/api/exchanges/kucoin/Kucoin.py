@@ -17,7 +17,7 @@ class KucoinPublic(PublicExchange):
         self.default_ticker = config.API_CONFIG['default_ticker']
         self.valid_candle_units = config.API_CONFIG['valid_candle_units']
         self.valid_resolutions = config.API_CONFIG['valid_resolutions']
-        super(KucoinPublic, self).__init__(base=url)
+        super(KucoinPublic, self).__init__(base=url, name='kucoin')
 
     def send_check(self,payload={}, endpoint=None):
         r, status = self.get(payload=self.filter_none_params(payload), endpoint=endpoint)
@@ -8,4 +8,5 @@ API_CONFIG = {
     'fee_structure': 'fixed',
     'valid_candle_units': ['1min', '5min', '15min', '30min', '1hour', '8hour', '1day', '1week'],
     'valid_resolutions': [1, 5, 15, 30, 60, 480, 'D', 'W'],
+    'cache_ttl': {'open/markets': 3600, 'open/symbols': 60, 'market/open/coins': 3600},
 }
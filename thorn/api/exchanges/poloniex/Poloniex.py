@@ -13,7 +13,10 @@ class PoloniexPublic(PublicExchange):
 
     def __init__(self):
         base = config.API_CONFIG['base']
-        super(PoloniexPublic, self).__init__(base=base)
+        super(PoloniexPublic, self).__init__(base=base, name='poloniex')
+
+    def endpoint_name(self, payload={}, endpoint=None):
+        return payload.get('command')
 
     def send_check(self,payload={}):
         r = self.get(payload=payload)
@@ -3,7 +3,8 @@ API_CONFIG = {
     'call_limit': 6,
     'per': 'second',
     'fee_structure': 'maker_taker',
-    'valid_periods': [300,900,1800,7200,14400,86400]
+    'valid_periods': [300,900,1800,7200,14400,86400],
+    'cache_ttl': {'returnCurrencies': 3600},
 }
 
 
@@ -9,3 +9,12 @@ CASSANDRA = {
         'name':'second_update',
         'query': "CREATE KEYSPACE second_update WITH replication = {'class':'SimpleStrategy','replication_factor':1};"}
 }
+
+MARKETS_CACHE = {
+    # on-disk cache of the ccxt markets shared by every process, None to disable
+    'dir': '~/.thorn/cache/markets',
+    # seconds
+    'ttl': 3600,
+    # bump to invalidate the cached markets after a change of format
+    'version': 1,
+}
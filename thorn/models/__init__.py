@@ -1,3 +1,6 @@
 from .arbitrage.ArbitrageGraph import ArbitrageGraph
 from .arbitrage.ArbitrageGraph import ArbitrageOp, ArbitragePair
-from .arbitrage.ArbitrageGraph import bellman_ford, find_opportunities
+from .arbitrage.ArbitrageGraph import bellman_ford, bellman_ford_vectorized, negative_cycles, find_opportunities
+from .arbitrage.ArbitrageGraph import find_opportunities_incremental, find_triangles
+from .arbitrage.ArbitrageGraph import evaluate_depth, find_opportunities_depth
+from .arbitrage.SharedPriceTable import SharedPriceTable
@@ -26,11 +26,15 @@ class ArbitragePair(object):
         price (float): The price, or exchange rate, of the pair.
         quantity (float, optional): The quantity (bid or ask) at the price level.
         ts (int): The timestamp of the pair price information.
+        ask (float, optional): The ask price of the pair. When given, `price`
+            is taken as the bid: the base currency is sold at `price` and bought
+            back at `ask`. Otherwise both directions use `price`.
     '''
 
-    def __init__(self, exchange, pair, price, quantity=None, ts=None):
+    def __init__(self, exchange, pair, price, quantity=None, ts=None, ask=None):
         self.exchange = exchange
         self.pair = pair
+        self.ask = ask
         self.quantity = quantity
         if isinstance(price, list):
             self.price = price[0]
@@ -68,6 +72,9 @@ class ArbitrageOp(object):
         graph (ArbitrageGraph): The arbitrage graph from which the opportunity
             was derived.
         ts (int, optional): The timestamp associated to the opportunity.
+
+    The `size`, `max_size` and `profit` attributes stay None unless the
+    opportunity is evaluated against order book depth (see `evaluate_depth`).
     '''
 
     def __init__(self, path, exchange, graph, ts=None):
@@ -77,6 +84,9 @@ class ArbitrageOp(object):
         self.exchange = exchange
         self.start = self.path[0].currency
         self.ts = ts
+        self.size = None
+        self.max_size = None
+        self.profit = None
 
     def __len__(self):
         return len(self.op)
@@ -185,6 +195,49 @@ class DiArbitrageEdge(object):
         return "{} --> {}: {}".format(self.start_node.id, self.end_node.id, self.price)
 
 
+class CompiledArbitrageGraph(object):
+    '''Dense array representation of an ArbitrageGraph used by the vectorised
+    search algorithms. Nodes are numbered by their position in `nodes` and every
+    directed edge is stored as an entry of the contiguous `src`, `dst` and
+    `weight` NumPy arrays, where `weight` holds the -log(price) edge weights.
+
+    The representation is built by `ArbitrageGraph.compile` and discarded by the
+    graph whenever a node or edge is added or removed. Price updates through
+    `ArbitrageGraph.update_pair` are written straight into `weight`.
+
+    Args:
+        graph (ArbitrageGraph): The graph to compile.
+    '''
+    def __init__(self, graph):
+        self.nodes = list(graph.nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.edges = list(graph.edges)
+        self.edge_index = {e.id: i for i, e in enumerate(self.edges)}
+        self.src = np.array([self.node_index[e.start_node] for e in self.edges], dtype=np.intp)
+        self.dst = np.array([self.node_index[e.end_node] for e in self.edges], dtype=np.intp)
+        self.weight = np.array([e.price for e in self.edges], dtype=np.float64)
+        self.pair_index = {(s, d): k for k, (s, d) in enumerate(zip(self.src.tolist(), self.dst.tolist()))}
+        self.triangle_keys = list(graph.triangles)
+        self.triangles = np.array([[self.edge_index[e.id] for e in graph.triangles[key]]
+                                    for key in self.triangle_keys], dtype=np.intp).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.edges)
+
+    def set_weight(self, edge):
+        self.weight[self.edge_index[edge.id]] = edge.price
+
+    def path(self, indices):
+        return [self.nodes[i] for i in indices]
+
+    def cycle_weight(self, indices):
+        '''Returns the summed -log(price) weight of the closed walk of node
+        indices `indices`, where the first index is repeated at the end.
+        '''
+        k = [self.pair_index[(indices[i], indices[i+1])] for i in range(len(indices)-1)]
+        return self.weight[k].sum()
+
+
 class ArbitrageGraph(object):
     '''A graphical representation of a currency market. The nodes of this graph
     (of class ArbitrageNode) represent specific currencies. Connections between
@@ -196,6 +249,11 @@ class ArbitrageGraph(object):
     structure. It tracks a map of edges and nodes that map strings of ids to the
     associated ArbitrageNode or DiArbitrageEdge instances. The graph connections
     themselves are tracked through a parent and children dictionary by the class.
+    Edges that were added or repriced since the last incremental search are
+    kept in `dirty_edges` (see `find_opportunities_incremental`). Every directed
+    3-cycle of the graph is indexed in `triangles`, keyed by the rotated node
+    ids of the cycle, and `edge_triangles` maps each edge id to the keys of the
+    triangles it belongs to (see `find_triangles`).
 
     The graph takes dictionary representations of pair price updates that list
     the exchange object, the pair, and the price (exchange rate) of the currency
@@ -226,6 +284,10 @@ class ArbitrageGraph(object):
         self.parents = {}
         self.edges = set()
         self.edge_map = {}
+        self.compiled = None
+        self.dirty_edges = set()
+        self.triangles = {}
+        self.edge_triangles = {}
         if len(pairs) > 0 and len(fees) == len(pairs):
             for i in range(len(pairs)):
                 self.add_pair(pairs[i], fee=fees[i])
@@ -268,6 +330,7 @@ class ArbitrageGraph(object):
             ret['exchange'] = p.exchange
             ret['exchange_name'] = p.exchange.id
             ret['price'] = float(p.price)
+            ret['ask'] = ret['price'] if p.ask is None else float(p.ask)
             ret['ts'] = p.ts
             return ret
         elif isinstance(p, dict):
@@ -278,6 +341,7 @@ class ArbitrageGraph(object):
                 ret['exchange'] = p['exchange']
                 ret['exchange_name'] = p['exchange'].id
                 ret['price'] = float(p['price'])
+                ret['ask'] = float(p.get('ask') or p['price'])
                 if 'ts' in p:
                     ret['ts'] = p['ts']
                 else:
@@ -293,7 +357,8 @@ class ArbitrageGraph(object):
         adds trading fees to the price according to `get_highest_trading_fee`.
         The prices on the edges are also computed here wherein the base currency
         (the numerator of "Curr/Curr2" pair) is the source of the edge which
-        inherits the `price`.
+        inherits the `price`. The reverse edge gets the inverse of the `ask`
+        of the pair, which defaults to `price`.
 
         Args:
             pair (dict): Pair object containing an instantiated exchange, a string
@@ -315,11 +380,12 @@ class ArbitrageGraph(object):
         # add forward exchange rate
         self.add_edge(b, q, p['price']*(1.0+fee), p['exchange'], ts=p['ts'])
         # add reverse exchange rate
-        self.add_edge(q, b, (1.0/p['price'])*(1.0+fee), p['exchange'], ts=p['ts'])
+        self.add_edge(q, b, (1.0/p['ask'])*(1.0+fee), p['exchange'], ts=p['ts'])
 
     def add_node(self, node):
         if node in self.nodes:
             return None
+        self.compiled = None
         self.nodes.add(node)
         self.node_map[node.id] = node
         self.children[node] = {}
@@ -341,6 +407,32 @@ class ArbitrageGraph(object):
         self.parents[end_node][start_node] = e
         self.edges.add(e)
         self.edge_map[e.id] = e
+        self.dirty_edges.add(e)
+        self.edge_triangles[e.id] = set()
+        for node in self.children[end_node]:
+            if node != start_node and start_node in self.children[node]:
+                self.add_triangle(e, self.children[end_node][node], self.children[node][start_node])
+        self.compiled = None
+
+    def add_triangle(self, *edges):
+        '''Indexes the directed 3-cycle formed by `edges`, which must be given
+        in cycle order.
+        '''
+        ids = [e.start_node.id for e in edges]
+        i = ids.index(min(ids))
+        key = tuple(ids[i:] + ids[:i])
+        if key in self.triangles:
+            return None
+        self.triangles[key] = edges
+        for e in edges:
+            self.edge_triangles[e.id].add(key)
+
+    def remove_triangles(self, edge):
+        '''Drops every indexed triangle that contains `edge`.'''
+        for key in self.edge_triangles.pop(edge.id, ()):
+            for e in self.triangles.pop(key):
+                if e is not edge:
+                    self.edge_triangles[e.id].discard(key)
 
     def update_pair(self, pair, fee=None):
         p = self.parse_pair(pair)
@@ -359,12 +451,18 @@ class ArbitrageGraph(object):
             fee = get_highest_trading_fee(p['exchange']) if fee is None else fee
 
             new_price = -np.log(p['price']*(1.0+fee))
-            new_price_rev = -np.log((1.0/p['price'])*(1.0+fee))
+            new_price_rev = -np.log((1.0/p['ask'])*(1.0+fee))
 
             self.children[tail][head].price = new_price
             self.children[tail][head].ts = p['ts']
             self.children[head][tail].price = new_price_rev
             self.children[head][tail].ts = p['ts']
+            self.dirty_edges.add(self.children[tail][head])
+            self.dirty_edges.add(self.children[head][tail])
+
+            if self.compiled is not None:
+                self.compiled.set_weight(self.children[tail][head])
+                self.compiled.set_weight(self.children[head][tail])
 
     def get_node(self, name):
         return self.node_map.get(name)
@@ -408,8 +506,11 @@ class ArbitrageGraph(object):
         e = self.children[tail][head]
         del self.edge_map[e.id]
         self.edges.remove(e)
+        self.dirty_edges.discard(e)
+        self.remove_triangles(e)
         del self.children[tail][head]
         del self.parents[head][tail]
+        self.compiled = None
 
     def remove_node(self, node):
         '''Removes the node from this digraph. Also removes all arcs incident on
@@ -426,18 +527,34 @@ class ArbitrageGraph(object):
         for child in self.children[node]:
             del self.edge_map[self.parents[child][node].id]
             self.edges.remove(self.parents[child][node])
+            self.dirty_edges.discard(self.parents[child][node])
+            self.remove_triangles(self.parents[child][node])
             del self.parents[child][node]
 
         # Unlink parents:
         for parent in self.parents[node]:
             del self.edge_map[self.children[parent][node].id]
             self.edges.remove(self.children[parent][node])
+            self.dirty_edges.discard(self.children[parent][node])
+            self.remove_triangles(self.children[parent][node])
             del self.children[parent][node]
 
         del self.node_map[node.id]
         self.nodes.remove(node)
         del self.children[node]
         del self.parents[node]
+        self.compiled = None
+
+    def compile(self):
+        '''Returns the dense array representation of the graph, building it if
+        the graph structure changed since the last call.
+
+        Returns:
+            CompiledArbitrageGraph: The compiled graph.
+        '''
+        if self.compiled is None:
+            self.compiled = CompiledArbitrageGraph(self)
+        return self.compiled
 
     def get_parents(self, node):
         '''Returns all parents of `node`.'''
@@ -558,23 +675,404 @@ def bellman_ford(graph, source):
                 return retrace_negative_loop(p,source)
     return None
 
-def find_opportunities(graph, exchange=None):
+def relax_vectorized(c, d, p):
+    '''Runs a single Bellman-Ford relaxation pass over every edge of the
+    compiled graph `c` at once. `d` and `p` are the distance and predecessor
+    arrays and are updated in place.
+
+    Returns:
+        bool: Whether any distance decreased.
+    '''
+    cand = d[c.src] + c.weight
+    best = d.copy()
+    np.minimum.at(best, c.dst, cand)
+    improved = np.isfinite(best) & (best < d)
+    improved[improved] = ~np.isclose(d[improved], best[improved])
+    if not improved.any():
+        return False
+    win = improved[c.dst] & (cand == best[c.dst])
+    p[c.dst[win]] = c.src[win]
+    d[improved] = best[improved]
+    return True
+
+def retrace_negative_loop_vectorized(p, start):
+    '''Walks the predecessor array `p` back from node index `start` until it
+    enters a cycle and returns that cycle as a list of node indices in forward
+    order, with the first node repeated at the end. Returns None if the walk
+    reaches a node without predecessor.
+    '''
+    node = start
+    for i in range(len(p)):
+        node = p[node]
+        if node < 0:
+            return None
+    loop = [node]
+    prev = p[node]
+    while prev != node:
+        if prev < 0 or len(loop) > len(p):
+            return None
+        loop.append(prev)
+        prev = p[prev]
+    loop.append(node)
+    loop.reverse()
+    return loop
+
+def bellman_ford_vectorized(graph, source):
+    '''Vectorised version of `bellman_ford`. The graph is compiled into
+    contiguous `src`, `dst` and `weight` arrays and every round relaxes all of
+    the edges at once with `np.minimum.at` instead of looping over the edge
+    dictionaries. The rounds stop early as soon as no distance changes.
+
+    Args:
+        graph (ArbitrageGraph): The instantiated ArbitrageGraph over which negative
+            cycles are sought.
+        source (ArbitrageNode or str): An ArbitrageNode object or the string id
+            of such a node.
+
+    Returns:
+        list[ArbitrageNode]: If the algorithm finds a negative cycle, it returns
+            a list of the nodes that represent this cycle. Otherwise, return None.
+    '''
+    if isinstance(source, str):
+        source = graph.node_map[source]
+    c = graph.compile()
+    d = np.full(len(c.nodes), np.inf)
+    p = np.full(len(c.nodes), -1, dtype=np.intp)
+    d[c.node_index[source]] = 0.0
+    for i in range(len(c.nodes)-1):
+        if not relax_vectorized(c, d, p):
+            return None
+
+    cand = d[c.src] + c.weight
+    viol = np.isfinite(cand) & (cand < d[c.dst])
+    viol[viol] = ~np.isclose(d[c.dst[viol]], cand[viol])
+    for k in np.flatnonzero(viol):
+        p[c.dst[k]] = c.src[k]
+        loop = retrace_negative_loop_vectorized(p, c.dst[k])
+        if loop is not None:
+            return c.path(loop)
+    return None
+
+def predecessor_cycles(p):
+    '''Finds every cycle of the predecessor array `p`. Each node has at most
+    one predecessor, so the walks are stamped with the node they started from
+    and every node is visited once overall.
+
+    Returns:
+        list[list[int]]: The cycles as lists of node indices in forward order,
+            with the first node repeated at the end.
+    '''
+    stamp = np.full(len(p), -1, dtype=np.intp)
+    cycles = []
+    for start in range(len(p)):
+        node = start
+        while node >= 0 and stamp[node] < 0:
+            stamp[node] = start
+            node = p[node]
+        if node >= 0 and stamp[node] == start:
+            loop = [node]
+            prev = p[node]
+            while prev != node:
+                loop.append(prev)
+                prev = p[prev]
+            loop.append(node)
+            loop.reverse()
+            cycles.append(loop)
+    return cycles
+
+def canonical_cycle(loop):
+    '''Rotates the closed walk `loop` so that it starts at its smallest node
+    index and returns it as a tuple without the repeated end node. Two
+    rotations of the same cycle have the same canonical form.
+    '''
+    loop = list(loop[:-1])
+    i = loop.index(min(loop))
+    return tuple(loop[i:] + loop[:i])
+
+def negative_cycles(graph):
+    '''Finds the distinct negative cycles of `graph` with a single Bellman-Ford
+    run from a virtual source connected to every node with a zero-weight edge,
+    instead of one run per node. Every round relaxes all of the edges at once
+    (see `relax_vectorized`) and the cycles that appear in the predecessor
+    array are collected after each round, keyed by their canonical rotation.
+    The rounds stop early once no distance changes.
+
+    Args:
+        graph (ArbitrageGraph): The graph over which negative cycles are sought.
+
+    Returns:
+        list[list[ArbitrageNode]]: The negative cycles, each starting and ending
+            at the same node.
+    '''
+    c = graph.compile()
+    d = np.zeros(len(c.nodes))
+    p = np.full(len(c.nodes), -1, dtype=np.intp)
+    found = {}
+    for i in range(len(c.nodes)):
+        if not relax_vectorized(c, d, p):
+            break
+        for loop in predecessor_cycles(p):
+            key = canonical_cycle(loop)
+            if key not in found and c.cycle_weight(loop) < 0:
+                found[key] = loop
+    return [c.path(key + key[:1]) for key in found]
+
+def find_opportunities(graph, exchange=None, method='bellman_ford'):
     '''Given an ArbitrageGraph object, this function runs all-pairs Bellman-Ford
     to search for arbitrage opportunities. The opportunities are represented as
     paths that cycle from source node back to source node.
 
     Args:
         graph (ArbitrageGraph): The currency graph upon which to search for opportunities.
+        exchange (ccxt.exchange, optional): The exchange attached to the
+            returned opportunities.
+        method (str, optional): Either 'bellman_ford' (default) for the
+            dictionary-based search, 'vectorized' for `bellman_ford_vectorized`,
+            or 'negative_cycles' to collect every distinct cycle from a single
+            run of `negative_cycles` instead of searching from each node.
 
     Returns:
         list: A list of paths represented by the node IDs and the price between
             them.
+
+    Raises:
+        AttributeError: If `method` is not a valid search method.
     '''
+    methods = {'bellman_ford': bellman_ford,
+                'vectorized': bellman_ford_vectorized,
+                'negative_cycles': None}
+    if method not in methods:
+        raise AttributeError('method {} is not a valid search method'.format(method))
+    if method == 'negative_cycles':
+        return [ArbitrageOp(path, exchange, graph) for path in negative_cycles(graph)
+                if len(path)-1 > 2]
+    search = methods[method]
     ops = []
     for node in graph.nodes:
-        path = bellman_ford(graph, node)
+        path = search(graph, node)
         if path is not None and len(path)-1 > 2:
             op = ArbitrageOp(path, exchange, graph)
             if op not in ops:
                 ops.append(op)
     return ops
+
+def cycles_through_edge(graph, edge, max_length=3):
+    '''Enumerates the simple cycles of at most `max_length` edges that pass
+    through `edge`, by a depth-first search for the paths leading from the head
+    of the edge back to its tail.
+
+    Args:
+        graph (ArbitrageGraph): The graph to search.
+        edge (DiArbitrageEdge): The edge every returned cycle must contain.
+        max_length (int, optional): The maximum number of edges in a cycle.
+
+    Returns:
+        generator of list[ArbitrageNode]: Cycles starting and ending at the tail
+            of `edge`.
+    '''
+    tail = edge.start_node
+    path = [tail, edge.end_node]
+    on_path = set(path)
+    # each stack entry holds the children of path[-1] still to visit
+    stack = [iter(graph.children[edge.end_node])]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+        if node == tail:
+            yield path + [tail]
+        elif node not in on_path and len(path) < max_length:
+            path.append(node)
+            on_path.add(node)
+            stack.append(iter(graph.children[node]))
+
+def find_opportunities_incremental(graph, exchange=None, max_length=3):
+    '''Searches for arbitrage opportunities only among the cycles that pass
+    through an edge added or repriced since the previous call, as tracked by
+    `graph.dirty_edges`. The cost of a call therefore depends on the number of
+    changed prices and the degree of their nodes rather than on the size of the
+    whole graph. The dirty edges are cleared once the search is done.
+
+    Args:
+        graph (ArbitrageGraph): The currency graph upon which to search for opportunities.
+        exchange (ccxt.exchange, optional): The exchange attached to the
+            returned opportunities.
+        max_length (int, optional): The maximum number of trades in a cycle.
+            Defaults to 3 (triangular cycles).
+
+    Returns:
+        list[ArbitrageOp]: The opportunities, one per distinct cycle.
+    '''
+    found = {}
+    for edge in graph.dirty_edges:
+        for path in cycles_through_edge(graph, edge, max_length=max_length):
+            if len(path)-1 < 3:
+                continue
+            weight = sum(graph.children[path[i]][path[i+1]].price for i in range(len(path)-1))
+            if weight >= 0 or np.isclose(weight, 0):
+                continue
+            ids = [n.id for n in path[:-1]]
+            i = ids.index(min(ids))
+            key = tuple(ids[i:] + ids[:i])
+            if key not in found:
+                found[key] = path
+    graph.dirty_edges.clear()
+    return [ArbitrageOp(path, exchange, graph) for path in found.values()]
+
+def find_triangles(graph, threshold=0.0, exchange=None):
+    '''Evaluates every indexed triangle of `graph` at once. The log-sums of the
+    three legs are taken from the compiled edge weights in a single NumPy
+    expression, so the scan costs a constant amount per triangle and does not
+    search the graph.
+
+    Args:
+        graph (ArbitrageGraph): The currency graph upon which to search for opportunities.
+        threshold (float, optional): The minimum return of an opportunity, as a
+            fraction. Ex: 0.001 keeps triangles returning more than 0.1%.
+        exchange (ccxt.exchange, optional): The exchange attached to the
+            returned opportunities.
+
+    Returns:
+        list[ArbitrageOp]: The profitable triangles, most profitable first.
+    '''
+    c = graph.compile()
+    if len(c.triangle_keys) == 0:
+        return []
+    sums = c.weight[c.triangles].sum(axis=1)
+    profitable = np.flatnonzero((sums < -np.log1p(threshold)) & ~np.isclose(sums, 0))
+    ops = []
+    for k in profitable[np.argsort(sums[profitable])]:
+        edges = graph.triangles[c.triangle_keys[k]]
+        path = [e.start_node for e in edges] + [edges[0].start_node]
+        ops.append(ArbitrageOp(path, exchange, graph))
+    return ops
+
+def depth_curve(book, sell, fee=0.0, n=None):
+    '''Builds the execution curve of a single trade against an order book.
+    Selling the base currency walks the bids and buying it walks the asks.
+
+    Args:
+        book (UnifiedOrderBook): The order book of the traded pair.
+        sell (bool): Whether the base currency of the pair is sold.
+        fee (float, optional): The trading fee, taken from the proceeds.
+        n (int, optional): The number of levels to walk.
+
+    Returns:
+        tuple (numpy.ndarray, numpy.ndarray): The cumulative amount spent and
+            received after each level, both starting at 0.
+    '''
+    side = 'bids' if sell else 'asks'
+    levels = np.array([[l[0], sum(l[1:])] for l in book.iter_levels(side, n=n)],
+                        dtype=np.float64).reshape(-1, 2)
+    price = levels[:, 0]
+    quantity = levels[:, 1]
+    if sell:
+        spent, received = quantity, price*quantity
+    else:
+        spent, received = price*quantity, quantity
+    cum_in = np.concatenate(([0.0], np.cumsum(spent)))
+    cum_out = np.concatenate(([0.0], np.cumsum(received)))*(1.0-fee)
+    return cum_in, cum_out
+
+def evaluate_depth(op, books, fee=0.0, n=None):
+    '''Evaluates an opportunity against the bid and ask levels of the order
+    book of every leg instead of the single price on each edge. Each leg maps
+    the amount put in to the amount received as a piecewise-linear curve over
+    its cumulative level quantities, so a size is pushed through the cycle with
+    chained `np.interp` calls. The realised profit is concave in the size and
+    peaks at one of the level boundaries, so only the boundaries of every leg,
+    projected back to the starting currency, are evaluated.
+
+    Args:
+        op (ArbitrageOp): The opportunity to evaluate.
+        books (dict): Order books keyed by pair. Ex: {'ETH/BTC': UnifiedOrderBook}
+        fee (float, optional): The trading fee of each leg.
+        n (int, optional): The number of levels to walk on each book.
+
+    Returns:
+        ArbitrageOp: `op`, with `max_size` set to the largest size the books can
+            fill, `size` and `profit` set to the most profitable size and the
+            profit at that size (both in the starting currency), and `gain` set
+            to the return at that size. If no size is profitable, `size` and
+            `profit` are 0 and `gain` is the return of the first unit.
+
+    Raises:
+        KeyError: If there is no order book for one of the legs.
+    '''
+    curves = []
+    for leg in op.op:
+        if leg['from'] + '/' + leg['to'] in books:
+            curves.append(depth_curve(books[leg['from'] + '/' + leg['to']], True, fee=fee, n=n))
+        elif leg['to'] + '/' + leg['from'] in books:
+            curves.append(depth_curve(books[leg['to'] + '/' + leg['from']], False, fee=fee, n=n))
+        else:
+            raise KeyError('no order book for {} --> {}'.format(leg['from'], leg['to']))
+
+    # the largest input of each leg that the following legs can still absorb
+    cap = np.inf
+    for cum_in, cum_out in reversed(curves):
+        cap = min(cum_in[-1], np.interp(cap, cum_out, cum_in))
+
+    sizes = [np.array([0.0, cap])]
+    for i in range(len(curves)):
+        x = curves[i][0]
+        for cum_in, cum_out in reversed(curves[:i]):
+            x = np.interp(x, cum_out, cum_in)
+        sizes.append(x)
+    size = np.unique(np.clip(np.concatenate(sizes), 0.0, cap))
+    out = size
+    for cum_in, cum_out in curves:
+        out = np.interp(out, cum_in, cum_out)
+    profit = out - size
+
+    k = np.argmax(profit)
+    op.max_size = cap
+    if profit[k] > 0:
+        op.size = size[k]
+        op.profit = profit[k]
+        op.gain = out[k]/size[k]
+    else:
+        op.size = 0.0
+        op.profit = 0.0
+        op.gain = 1.0
+        for cum_in, cum_out in curves:
+            op.gain = op.gain*cum_out[1]/cum_in[1] if len(cum_in) > 1 and cum_in[1] > 0 else 0.0
+    return op
+
+def find_opportunities_depth(graph, books, exchange=None, fee=0.0, n=None, method='bellman_ford'):
+    '''Searches `graph` for opportunities with `find_opportunities`, or with
+    `find_opportunities_incremental` if `method` is 'incremental', and keeps
+    those that are still profitable when executed against the order books of
+    their legs (see `evaluate_depth`). Opportunities with a leg missing from
+    `books` are dropped.
+
+    Args:
+        graph (ArbitrageGraph): The currency graph upon which to search for opportunities.
+        books (dict): Order books keyed by pair, any object with an
+            `iter_levels` method. Ex: {'ETH/BTC': UnifiedOrderBook}
+        exchange (ccxt.exchange, optional): The exchange attached to the
+            returned opportunities.
+        fee (float, optional): The trading fee of each leg.
+        n (int, optional): The number of levels to walk on each book.
+        method (str, optional): The search method passed to `find_opportunities`,
+            or 'incremental'.
+
+    Returns:
+        list[ArbitrageOp]: The executable opportunities, highest gain first.
+    '''
+    if method == 'incremental':
+        found = find_opportunities_incremental(graph, exchange=exchange)
+    else:
+        found = find_opportunities(graph, exchange=exchange, method=method)
+    ops = []
+    for op in found:
+        try:
+            evaluate_depth(op, books, fee=fee, n=n)
+        except KeyError:
+            continue
+        if op.size > 0:
+            ops.append(op)
+    ops.sort(key=lambda op: op.gain, reverse=True)
+    return ops
@@ -0,0 +1,220 @@
+import time
+import multiprocessing
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8, fall back to a RawArray inherited by the child processes
+    shared_memory = None
+
+PRICE = 0
+QUANTITY = 1
+TS = 2
+VERSION = 3
+FIELDS = 4
+# seconds a reader waits for a row being written before giving up
+READ_TIMEOUT = 1.0
+
+class TableBook(object):
+    '''The top levels of an order book read from a `SharedPriceTable` slot. It
+    has the `iter_levels` and best price methods of `UnifiedOrderBook`, so it
+    can be passed to `evaluate_depth` in place of a full book.
+
+    Args:
+        pair (str): The pair of the book.
+        bids (numpy.ndarray): The bid levels, highest price first.
+        asks (numpy.ndarray): The ask levels, lowest price first.
+    '''
+    def __init__(self, pair, bids, asks):
+        self.pair = pair
+        self.bids = bids
+        self.asks = asks
+
+    def iter_levels(self, side, n=None, price=None, quantity=None):
+        if side in ('bids', 'bid'):
+            levels, sign = self.bids, -1.0
+        elif side in ('asks', 'ask'):
+            levels, sign = self.asks, 1.0
+        else:
+            raise AttributeError('side {} is not a valid side'.format(side))
+        total = 0.0
+        for l in levels[:n]:
+            if price is not None and sign*(l[0] - price) > 0:
+                return
+            yield [l[0], l[1]]
+            total += l[1]
+            if quantity is not None and total >= quantity:
+                return
+
+    def best_bid(self):
+        return None if len(self.bids) == 0 else [self.bids[0][0], self.bids[0][1]]
+
+    def best_ask(self):
+        return None if len(self.asks) == 0 else [self.asks[0][0], self.asks[0][1]]
+
+class SharedPriceTable(object):
+    '''A table of pair prices shared between processes. Every pair owns a
+    fixed slot (its row) holding the price, quantity, timestamp and version of
+    its latest update, so one worker per pair can publish prices without locks
+    while a single detector process reads the whole table and keeps one
+    ArbitrageGraph for every pair.
+
+    The rows live in a `multiprocessing.shared_memory` block when available
+    (Python 3.8+) and in a `multiprocessing.RawArray` otherwise. The table is
+    pickled by reference, so it may be passed to `multiprocessing.Process`.
+
+    With `depth` set, every row also holds the top `depth` bid and ask levels
+    of the pair, read back as a `TableBook` with `read_book`.
+
+    Each row has a single writer. The version is odd while the row is being
+    written and is bumped to the next even number once it is complete, so
+    readers retry instead of reading a half-written row. A row left odd for
+    more than `READ_TIMEOUT` seconds, by a writer that died mid-write, raises
+    a TimeoutError instead of blocking the reader.
+
+    Args:
+        pairs (list[str]): The pairs of the table, one slot each. Ex: ['ETH/BTC']
+        name (str, optional): The name of the shared memory block to create or
+            attach to.
+        create (bool, optional): Whether to create the block or attach to an
+            existing one.
+        depth (int, optional): The number of bid and ask levels kept per pair.
+    '''
+    def __init__(self, pairs, name=None, create=True, depth=0):
+        self.pairs = list(pairs)
+        self.slots = {pair: i for i, pair in enumerate(self.pairs)}
+        self.depth = depth
+        self.fields = FIELDS + 4*depth
+        self.shm = None
+        self.raw = None
+        size = len(self.pairs)*self.fields
+        if shared_memory is not None:
+            self.shm = shared_memory.SharedMemory(name=name, create=create, size=max(size, 1)*8)
+            self.name = self.shm.name
+            buf = self.shm.buf
+        else:
+            self.raw = multiprocessing.RawArray('d', max(size, 1))
+            self.name = None
+            buf = self.raw
+        self.table = np.ndarray((len(self.pairs), self.fields), dtype=np.float64, buffer=buf)
+        if create:
+            self.table[:] = np.nan
+            self.table[:, VERSION] = 0
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __getstate__(self):
+        return {'pairs': self.pairs, 'name': self.name, 'raw': self.raw, 'depth': self.depth}
+
+    def __setstate__(self, state):
+        self.pairs = state['pairs']
+        self.slots = {pair: i for i, pair in enumerate(self.pairs)}
+        self.depth = state['depth']
+        self.fields = FIELDS + 4*self.depth
+        self.name = state['name']
+        self.raw = state['raw']
+        self.shm = None
+        if self.raw is None:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            buf = self.shm.buf
+        else:
+            buf = self.raw
+        self.table = np.ndarray((len(self.pairs), self.fields), dtype=np.float64, buffer=buf)
+
+    def write(self, pair, price, quantity=None, ts=None, bids=None, asks=None):
+        '''Publishes the latest price of `pair` into its slot.
+
+        Args:
+            pair (str): A pair of the table.
+            price (float): The price, or exchange rate, of the pair.
+            quantity (float, optional): The quantity at the price level.
+            ts (int, optional): The timestamp of the price.
+            bids (list, optional): The bid levels as [price, quantity] lists,
+                highest price first. Only the first `depth` are kept.
+            asks (list, optional): The ask levels, lowest price first.
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: If `pair` has no slot in the table.
+        '''
+        row = self.table[self.slots[pair]]
+        version = row[VERSION]
+        row[VERSION] = version + 1
+        row[PRICE] = price
+        row[QUANTITY] = np.nan if quantity is None else quantity
+        row[TS] = np.nan if ts is None else ts
+        if self.depth > 0:
+            self.write_levels(row[FIELDS:FIELDS + 2*self.depth], bids)
+            self.write_levels(row[FIELDS + 2*self.depth:], asks)
+        row[VERSION] = version + 2
+
+    def write_levels(self, out, levels):
+        out[:] = np.nan
+        if levels is None:
+            return
+        levels = [l[:2] for l in levels[:self.depth]]
+        if len(levels) > 0:
+            out[:2*len(levels)] = np.asarray(levels, dtype=np.float64).ravel()
+
+    def snapshot(self, i):
+        '''Returns a consistent copy of the row of slot `i`.
+
+        Raises:
+            TimeoutError: If the row stays mid-write for `READ_TIMEOUT` seconds.
+        '''
+        row = self.table[i]
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            version = row[VERSION]
+            if version % 2 == 0:
+                copy = row.copy()
+                if row[VERSION] == version:
+                    return copy
+            if time.monotonic() > deadline:
+                raise TimeoutError('slot {} ({}) is stale, stuck at version {}'.format(
+                        i, self.pairs[i], int(version)))
+            time.sleep(0)
+
+    def read(self, i):
+        '''Returns a consistent copy of slot `i` as (price, quantity, ts, version).
+        Quantity and ts are None if they were not published.
+        '''
+        row = self.snapshot(i)
+        quantity = None if np.isnan(row[QUANTITY]) else row[QUANTITY]
+        ts = None if np.isnan(row[TS]) else int(row[TS])
+        return row[PRICE], quantity, ts, row[VERSION]
+
+    def read_book(self, i):
+        '''Returns a consistent copy of the levels of slot `i` as
+        (TableBook, ts, version).
+        '''
+        row = self.snapshot(i)
+        levels = row[FIELDS:].reshape(2, self.depth, 2)
+        bids, asks = [side[~np.isnan(side[:, 0])] for side in levels]
+        ts = None if np.isnan(row[TS]) else int(row[TS])
+        return TableBook(self.pairs[i], bids, asks), ts, row[VERSION]
+
+    def versions(self):
+        return self.table[:, VERSION].copy()
+
+    def changed(self, versions):
+        '''Returns the indices of the slots written since `versions` was taken.'''
+        return np.flatnonzero(self.table[:, VERSION] != versions)
+
+    def close(self):
+        if self.shm is not None:
+            # the array view must go before the mapping can be closed
+            self.table = None
+            self.shm.close()
+
+    def unlink(self):
+        '''Frees the shared memory block. Only the creating process should call
+        this, once every other process has closed the table.
+        '''
+        if self.shm is not None:
+            self.shm.unlink()
@@ -0,0 +1,184 @@
+import zlib
+import datetime
+import asyncio
+import multiprocessing
+
+from confluent_kafka import Consumer, KafkaError
+
+from thorn import config as global_config
+from thorn.utils import deserialize
+from .UnifiedOrderBook import queue_message
+
+
+class OrderBookMultiplexer(object):
+
+    def __init__(self, books=[], loop=None, batch_size=500, timeout=1.0, coalesce=False):
+        '''Initialization method for the `OrderBookMultiplexer` class. The class
+        reads the full order book streams of many `UnifiedOrderBook` instances
+        with a single Kafka consumer, instead of one consumer (and usually one
+        process) per book. Messages are read in batches and routed to their book
+        by topic and `exchange` field.
+
+        Args:
+            - books (list[UnifiedOrderBook], optional): The books to route
+                messages to. More may be added with `add_book`.
+            - loop (asyncio.event_loop, optional): The event loop used by
+                `monitor_async`.
+            - batch_size (int, optional): The maximum number of messages read
+                per call to `Consumer.consume`.
+            - timeout (float, optional): The maximum time in seconds to wait for
+                a batch.
+            - coalesce (bool, optional): Whether to route only the newest
+                snapshot of each book in a batch, and the deltas after it (see
+                `process`). Only for consumers that need the latest state of
+                the books rather than every message.
+
+        Returns: None.
+        '''
+        self.books = {}
+        self.callbacks = {}
+        self.seqs = {}
+        self.loop = asyncio.get_event_loop() if loop is None else loop
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.coalesce = coalesce
+        for book in books:
+            self.add_book(book)
+
+    def __len__(self):
+        return len(self.books)
+
+    def add_book(self, book, on_message=None):
+        '''Registers `book` with the multiplexer.
+
+        Args:
+            - book (UnifiedOrderBook): The book to route messages to.
+            - on_message (function, optional): Called with `m`, `seq` and `book`
+                for every message of the book. Defaults to
+                `book.update_message`.
+
+        Returns: None.
+        '''
+        key = (book.topicstr, book.exchange.id)
+        self.books[key] = book
+        self.callbacks[key] = book.update_message if on_message is None else on_message
+        self.seqs[key] = 0
+
+    def topics(self):
+        return sorted(set(key[0] for key in self.books))
+
+    def get_consumer(self, group):
+        conf = dict(global_config.KAFKA['consumer_config'])
+        conf['group.id'] = group
+        return Consumer(**conf)
+
+    def route(self, topic, m):
+        '''Passes the decoded message `m` read from `topic` to the callback of
+        its book. Messages of untracked books are ignored.
+
+        Returns: bool, whether the message was routed.
+        '''
+        key = (topic, m.get('exchange'))
+        if key not in self.books:
+            return False
+        seq = self.seqs[key]
+        self.seqs[key] = seq + 1
+        self.callbacks[key](m, seq=seq, book=self.books[key])
+        return True
+
+    def process(self, msgs):
+        '''Routes a batch of Kafka messages in order. If `self.coalesce` is set
+        the messages are grouped per book first and only the newest snapshot of
+        each book and the deltas after it are routed (see `queue_message`),
+        since a full snapshot supersedes the messages queued before it.
+
+        Args:
+            - msgs (list[confluent_kafka.Message]): A batch returned by `consume`.
+
+        Returns: bool, False if the batch contained a consumer error.
+        '''
+        queues = {}
+        ok = True
+        for msg in msgs:
+            if not msg.error():
+                m = deserialize(msg.value())
+                if not self.coalesce:
+                    self.route(msg.topic(), m)
+                    continue
+                key = (msg.topic(), m.get('exchange'))
+                queue_message(queues.setdefault(key, []), m)
+            elif msg.error().code() != KafkaError._PARTITION_EOF:
+                print(msg.error())
+                ok = False
+                break
+        for key, queue in queues.items():
+            for m in queue:
+                self.route(key[0], m)
+        return ok
+
+    def monitor(self, consumer_group, stop_at=None):
+        '''Consumes the topics of every registered book with one consumer and
+        routes the messages until `stop_at`, or indefinitely if it is not set.
+
+        Args:
+            - consumer_group (str): The Kafka consumer group.
+            - stop_at (datetime.datetime, optional): The time at which to stop.
+
+        Returns: None.
+        '''
+        c = self.get_consumer(consumer_group)
+        c.subscribe(self.topics())
+        running = True
+        while running:
+            msgs = c.consume(num_messages=self.batch_size, timeout=self.timeout)
+            running = self.process(msgs)
+            if stop_at is not None and datetime.datetime.utcnow() > stop_at:
+                running = False
+        c.close()
+
+    async def monitor_async(self, consumer_group, stop_at=None):
+        '''Same as `monitor`, but the blocking `consume` calls run in the loop's
+        default executor so that other coroutines keep running in between.
+
+        ASYNC
+        '''
+        c = self.get_consumer(consumer_group)
+        c.subscribe(self.topics())
+        running = True
+        while running:
+            msgs = await self.loop.run_in_executor(None, c.consume, self.batch_size, self.timeout)
+            running = self.process(msgs)
+            if stop_at is not None and datetime.datetime.utcnow() > stop_at:
+                running = False
+        c.close()
+
+    def shards(self, n):
+        '''Splits the registered books into `n` multiplexers by a stable hash
+        of their topic, so that every topic is read by exactly one shard.
+
+        Returns: list[OrderBookMultiplexer].
+        '''
+        shards = [OrderBookMultiplexer(batch_size=self.batch_size, timeout=self.timeout, coalesce=self.coalesce)
+                  for i in range(n)]
+        for key, book in self.books.items():
+            shard = shards[zlib.crc32(key[0].encode('utf-8')) % n]
+            shard.add_book(book, on_message=self.callbacks[key])
+        return shards
+
+    def monitor_sharded(self, consumer_group, processes, stop_at=None):
+        '''Runs `monitor` for each of `processes` shards (see `shards`) in its
+        own process and waits for them to finish.
+
+        Returns: None.
+        '''
+        jobs = []
+        for i, shard in enumerate(self.shards(processes)):
+            if len(shard) == 0:
+                continue
+            p = multiprocessing.Process(name='{}_{}'.format(consumer_group, i), target=shard.monitor,
+                                        args=(consumer_group,), kwargs={'stop_at':stop_at})
+            jobs.append(p)
+            p.start()
+        for p in jobs:
+            p.join()
+            print(p.name, p.exitcode)
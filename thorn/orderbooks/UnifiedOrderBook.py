@@ -2,38 +2,55 @@ import json
 import datetime
 import asyncio
 
+import numpy as np
 from confluent_kafka import Consumer, KafkaError
 
 from thorn.api import config as api_config
 from thorn import config as global_config
 from thorn.utils import Printer
 from thorn.utils import BinaryTree
-from thorn.utils import reformat_pair
+from thorn.utils import reformat_pair, deserialize
+from thorn.utils.serializers import SNAPSHOT, DELTA
+
+def queue_message(queue, m):
+    '''Adds the full order book stream message `m` to `queue`, the pending
+    messages of a single book. A snapshot supersedes everything queued before
+    it, unless it is older than the snapshot already at the head of the queue.
+    Deltas are kept in order after the snapshot they apply to.
+    '''
+    if m.get('kind', SNAPSHOT) == DELTA:
+        queue.append(m)
+    elif len(queue) == 0 or queue[0].get('kind', SNAPSHOT) == DELTA or \
+            (m.get('timestamp') or 0) >= (queue[0].get('timestamp') or 0):
+        queue[:] = [m]
 
 class UnifiedOrderBook(BinaryTree):
 
-    def __init__(self, pair, exchange, loop=None):
+    def __init__(self, pair, exchange, loop=None, level_class=BinaryTree):
         '''Initialization method for the `UnifiedOrderBook` class. The class
         tracks a pair, exchange, bids, asks, update id, event times, an asyncio
         loop, a Kafka consumer class, and a few other helper attributes. The bids
-        and asks are stored in their own binary trees. The class implements only
-        the ccxt unified API functions related to order book tracking. This allows
-        the class to be instantiated for any exchange that is able to call the
-        unified API exchange methods.
+        and asks are stored in their own price-level containers (binary trees by
+        default). The class implements only the ccxt unified API functions
+        related to order book tracking. This allows the class to be instantiated
+        for any exchange that is able to call the unified API exchange methods.
 
         Args:
             - pair (str): The pair that the order book tracks.
             - exchange (ccxt.exchange): The instantiated exchange tied to the order book.
             - loop (asyncio.event_loop): An Asyncio event loop to be used for the Order Book.
+            - level_class (class, optional): The price-level container used for
+                the bids and asks. Either `BinaryTree` (default) or `PriceLevelBook`.
 
         Returns: None.
         '''
         self.pair = pair
         self.exchange = exchange
-        self.bids = BinaryTree()
-        self.asks = BinaryTree()
+        self.bids = level_class()
+        self.asks = level_class()
         self.last_update_id = 0
         self.latest_event_time = None
+        self.seq = None
         self.loop = asyncio.get_event_loop() if loop is None else loop
         self.api_stream_suffixes = api_config.API_MANAGER_CONFIG['function_stream_suffixes']
         self.socket_stream_suffixes = api_config.SOCKET_MANAGER_CONFIG['function_stream_suffixes']
@@ -62,21 +79,196 @@ class UnifiedOrderBook(BinaryTree):
 
     def update_full_book(self, m, **kwargs):
         '''Updates the bid and ask trees along with the most recent event time
-        given an API order book message.
+        given an API order book message. The snapshot is merged into the book
+        in a single pass over both sides: new levels are added, levels whose
+        quantity moved are replaced, and levels missing from the snapshot are
+        removed, so the book never holds more than the snapshot's depth.
 
         Args:
             - m (dict): A json message returned from `fetch_order_book` or similar
                 unified API return structure.
 
-        Returns: None.
+        Returns: dict of form {'bids': diff, 'asks': diff} where each diff is a
+            dict {'added': [...], 'changed': [...], 'removed': [...]} of
+            [price, quantity] levels. Removed levels carry a quantity of 0.0.
         '''
-        bids = m['bids']
-        asks = m['asks']
         self.latest_event_time = m['datetime']
-        for bid in bids:
-            self.bids.insert(bid[0], bid[1], replace=True)
-        for ask in asks:
-            self.asks.insert(ask[0], ask[1], replace=True)
+        return {'bids': self.merge_levels(self.bids, m['bids']),
+                'asks': self.merge_levels(self.asks, m['asks'])}
+
+    def update_message(self, m, **kwargs):
+        '''Applies a message of the full order book stream, either a full
+        snapshot or a delta of changed levels (see
+        `UnifiedAPIManager.encode_order_book`). A delta only applies on top of
+        the message right before it: if its `seq` does not follow the last
+        applied one, the book waits for the next snapshot.
+
+        Args:
+            - m (dict): A decoded message of the full order book stream.
+
+        Returns: dict of form {'bids': diff, 'asks': diff} as returned by
+            `update_full_book`, or None if the message could not be applied.
+        '''
+        if m.get('kind', SNAPSHOT) == DELTA:
+            if self.seq is None or m['seq'] != self.seq + 1:
+                if self.seq is not None:
+                    print('{} {}: missed update {}, waiting for a snapshot'.format(self.exchange.id, self.pair, self.seq + 1))
+                self.seq = None
+                return None
+            self.latest_event_time = m['datetime']
+            diff = {'bids': self.apply_levels(self.bids, m['bids']),
+                    'asks': self.apply_levels(self.asks, m['asks'])}
+        else:
+            diff = self.update_full_book(m)
+        self.seq = m.get('seq')
+        return diff
+
+    def apply_levels(self, tree, levels):
+        '''Helper method that applies changed levels to `tree`, where a quantity
+        of 0 removes the level, and returns the differences in the format of
+        `merge_levels`.
+        '''
+        added = []
+        changed = []
+        removed = []
+        if isinstance(levels, np.ndarray):
+            levels = levels.tolist()
+        for price, quantity in levels:
+            exists = tree.find(price) is not None
+            if quantity == 0:
+                if exists:
+                    removed.append([price, 0.0])
+                    tree.remove(price)
+            else:
+                (changed if exists else added).append([price, quantity])
+                tree.insert(price, quantity, replace=True)
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+    def merge_levels(self, tree, levels):
+        '''Helper method that merges a full snapshot of one side of the book
+        into `tree` and returns the differences. Both the snapshot and the tree
+        are walked once in ascending price order.
+
+        Args:
+            - tree (BinaryTree or PriceLevelBook): The side of the book to update.
+            - levels (list or numpy.ndarray): The [price, quantity] levels of
+                the snapshot, in either ascending or descending price order.
+
+        Returns: dict {'added': [...], 'changed': [...], 'removed': [...]}.
+        '''
+        added = []
+        changed = []
+        removed = []
+        if isinstance(levels, np.ndarray):
+            levels = levels.tolist()
+        # already sorted either way, so this is a linear pass (or reversal)
+        levels = sorted(levels, key=lambda l: l[0])
+        current = tree.ascending()
+        cur = next(current, None)
+        for level in levels:
+            price = level[0]
+            quantity = level[1]
+            while cur is not None and cur[0] < price:
+                removed.append([cur[0], 0.0])
+                cur = next(current, None)
+            if cur is not None and cur[0] == price:
+                if quantity == 0:
+                    removed.append([price, 0.0])
+                elif cur[1:] != [quantity]:
+                    changed.append([price, quantity])
+                cur = next(current, None)
+            elif quantity != 0:
+                added.append([price, quantity])
+        while cur is not None:
+            removed.append([cur[0], 0.0])
+            cur = next(current, None)
+
+        for level in removed:
+            tree.remove(level[0])
+        for level in added:
+            tree.insert(level[0], level[1], replace=True)
+        for level in changed:
+            tree.insert(level[0], level[1], replace=True)
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+    def best_bid(self):
+        '''Returns the highest bid level of the book as [price, quantity], or
+        None if there are no bids. Reads the cached top of the bid tree, so this
+        does not walk the book.
+        '''
+        return self.bids.max()
+
+    def best_ask(self):
+        '''Returns the lowest ask level of the book as [price, quantity], or
+        None if there are no asks. Reads the cached top of the ask tree, so this
+        does not walk the book.
+        '''
+        return self.asks.min()
+
+    def spread(self):
+        '''Returns the difference between the best ask and best bid prices, or
+        None if either side of the book is empty.
+        '''
+        bid = self.best_bid()
+        ask = self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def mid(self):
+        '''Returns the price halfway between the best bid and best ask, or None
+        if either side of the book is empty.
+        '''
+        bid = self.best_bid()
+        ask = self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (ask[0] + bid[0]) / 2.0
+
+    def iter_levels(self, side, n=None, price=None, quantity=None):
+        '''Returns a generator over the levels of one side of the book, starting
+        at the best price (highest bid or lowest ask) and moving away from the
+        top of the book. Only the levels that are read are visited.
+
+        Args:
+            - side (str): Either 'bids' or 'asks' ('bid' and 'ask' also accepted).
+            - n (int, optional): Stop after this many levels.
+            - price (float, optional): Stop at the first level beyond this price.
+            - quantity (float, optional): Stop once the cumulative quantity of
+                the yielded levels reaches this amount.
+
+        Returns: generator of [price, quantity] lists.
+
+        Raises: AttributeError.
+        '''
+        if side in ('bids', 'bid'):
+            return self.bids.descending(n=n, price=price, quantity=quantity)
+        if side in ('asks', 'ask'):
+            return self.asks.ascending(n=n, price=price, quantity=quantity)
+        raise AttributeError('side {} is not a valid side'.format(side))
+
+    def depth(self, side, n):
+        '''Returns the top `n` levels of one side of the book, best price first.
+
+        Args:
+            - side (str): Either 'bids' or 'asks'.
+            - n (int): The number of levels to return.
+
+        Returns: list of [price, quantity] lists.
+        '''
+        return list(self.iter_levels(side, n=n))
+
+    def levels_until(self, side, price):
+        '''Returns the levels of one side of the book from the best price down
+        (bids) or up (asks) to and including `price`.
+
+        Args:
+            - side (str): Either 'bids' or 'asks'.
+            - price (float): The price at which to stop.
+
+        Returns: list of [price, quantity] lists.
+        '''
+        return list(self.iter_levels(side, price=price))
 
     def monitor_updates(self):
         '''Deprecated method for monitoring socket streams.
@@ -95,7 +287,8 @@ class UnifiedOrderBook(BinaryTree):
                 running = False
         self.c.close()
 
-    def monitor_full_book_stream(self, consumer_group, on_message=None, stop_at=None, **kwargs):
+    def monitor_full_book_stream(self, consumer_group, on_message=None, stop_at=None,
+                                    batch_size=None, timeout=1.0, **kwargs):
         '''Function that monitors Kafka streams containing full order book
         information. That is, responses of the unified API method `fetch_order_book`.
         This function uses the class consumer to read a stream dictated by
@@ -103,28 +296,43 @@ class UnifiedOrderBook(BinaryTree):
         bid/ask structure accordingly. This method will run indefinitely unless
         `stop_at` is set.
 
+        If `batch_size` is set, messages are read in batches of up to
+        `batch_size` messages or `timeout` seconds with `Consumer.consume`, and
+        only the newest snapshot of the batch for the book's exchange and the
+        deltas after it are passed to `on_message` (see `queue_message`), since
+        a full snapshot supersedes the messages before it. This keeps up with a
+        backlog of queued snapshots, e.g. after a restart.
+
         Args:
             - on_message (function, optional): A function to call when a message
                 is read from the Kafka stream. Should accept a single argument
                 `m`: a json message picked up from the Kafka stream.
             - stop_at (datetime.datetime, optional): The time at which to stop
                 monitoring the full order book.
+            - batch_size (int, optional): The maximum number of messages read
+                per batch. Messages are read one at a time if not set.
+            - timeout (float, optional): The maximum time in seconds to wait for
+                a batch.
 
         Returns: None.
         '''
-        seq = 0
         print('Monitoring for {}'.format(self.exchange.id))
         if stop_at is None:
             stop_at = datetime.datetime.utcnow() + datetime.timedelta(days=73000)
         if on_message is None:
-            on_message = self.update_full_book
+            on_message = self.update_message
         c = self.get_consumer(consumer_group)
         c.subscribe([self.topicstr])
+        if batch_size is not None:
+            self.monitor_batches(c, on_message, stop_at, batch_size, timeout, **kwargs)
+            c.close()
+            return None
+        seq = 0
         running = True
         while running:
             msg = c.poll()
             if not msg.error():
-                m = json.loads(msg.value().decode('utf-8'))
+                m = deserialize(msg.value())
                 if 'exchange' in m and m['exchange'] == self.exchange.id:
                     on_message(m, seq=seq, **kwargs)
                     seq += 1
@@ -136,6 +344,29 @@ class UnifiedOrderBook(BinaryTree):
                 running = False
         c.close()
 
+    def monitor_batches(self, c, on_message, stop_at, batch_size, timeout, **kwargs):
+        '''Batched read loop of `monitor_full_book_stream`.
+        '''
+        seq = 0
+        running = True
+        while running:
+            queue = []
+            for msg in c.consume(num_messages=batch_size, timeout=timeout):
+                if not msg.error():
+                    m = deserialize(msg.value())
+                    if m.get('exchange') == self.exchange.id:
+                        queue_message(queue, m)
+                elif msg.error().code() != KafkaError._PARTITION_EOF:
+                    print(msg.error())
+                    running = False
+                    break
+            for m in queue:
+                on_message(m, seq=seq, **kwargs)
+                seq += 1
+            if datetime.datetime.utcnow() > stop_at:
+                print('Stopping {} thread'.format(self.exchange.id))
+                running = False
+
     def update_book(self, m):
         '''Deprecated method for updating order books according to socket stream
         information.
@@ -147,7 +378,7 @@ class UnifiedOrderBook(BinaryTree):
             self.update_tree(bid[0], bid[1], self.bids)
         asks = m['asks']
         for ask in asks:
-            self.update_tree(bid[0], bid[1], self.asks)
+            self.update_tree(ask[0], ask[1], self.asks)
         self.last_update_id = m['u']
         self.latest_event_time = self.format_time(m['E'])
 
@@ -163,7 +394,8 @@ class UnifiedOrderBook(BinaryTree):
         '''
         if quantity == 0:
             tree.remove(price)
-        tree.insert(price, quantity)
+        else:
+            tree.insert(price, quantity, replace=True)
 
     def format_time(self, t):
         '''Helper method to format a millisecond timestamp into a datetime object.
@@ -1,2 +1,4 @@
 from .UnifiedOrderBook import UnifiedOrderBook
+from .OrderBookMultiplexer import OrderBookMultiplexer
 from .binance.Binance import BinanceBook
+from .bitmex.Bitmex import BitmexBook
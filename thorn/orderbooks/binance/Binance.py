@@ -1,4 +1,6 @@
 import json
+import time
+import datetime
 
 from confluent_kafka import Consumer, KafkaError
 
@@ -10,24 +12,175 @@ from thorn.utils import BinaryTree
 
 class BinanceBook(BinaryTree):
 
-    def __init__(self, pair):
+    def __init__(self, pair, limit=1000, level_class=BinaryTree, auto_resync=True, resync_backoff=1.0):
+        '''Initialization method for the `BinanceBook` class. The class keeps a
+        local Binance order book in sync with the `depth` socket stream. Diff
+        events are buffered until a REST snapshot is available, events older
+        than the snapshot's `lastUpdateId` are dropped, and every event must
+        start at most one update after the previous one ended. When a gap in
+        the `U`/`u` update ids is detected the book is cleared and rebuilt from
+        a fresh snapshot plus the events buffered in the meantime. A snapshot
+        is fetched once per resync, and fetched again at most every
+        `resync_backoff` seconds while the book stays out of sync.
+
+        Args:
+            - pair (str): The Binance symbol that the order book tracks. Ex: BNBBTC
+            - limit (int, optional): The depth of the REST snapshots.
+            - level_class (class, optional): The price-level container used for
+                the bids and asks.
+            - auto_resync (bool, optional): Whether to fetch a REST snapshot
+                automatically while the book is out of sync.
+            - resync_backoff (float, optional): The minimum time in seconds
+                between two snapshot fetches of the same resync.
+
+        Returns: None.
+        '''
         self.pair = pair
         self.api = BinancePublic()
-        self.bids = self
-        self.ask = self
+        self.limit = limit
+        self.level_class = level_class
+        self.bids = level_class()
+        self.asks = level_class()
         self.last_update_id = 0
         self.latest_event_time = None
+        self.auto_resync = auto_resync
+        self.synced = False
+        self.buffer = []
+        self.resyncs = 0
+        self.resync_backoff = resync_backoff
+        self.last_fetch = None
         super(BinanceBook, self).__init__()
 
-    def get_full_book(self, pair, limit=1000):
+    def get_full_book(self, pair=None, limit=None):
+        '''Fetches a REST depth snapshot and applies it with `apply_snapshot`.
+
+        Args:
+            - pair (str, optional): Defaults to the tracked pair.
+            - limit (int, optional): Defaults to the class limit.
+
+        Returns: bool, whether the book is in sync after the snapshot.
+        '''
+        pair = self.pair if pair is None else pair
+        limit = self.limit if limit is None else limit
+        self.last_fetch = time.monotonic()
         r = self.api.depth(pair, limit=limit)
-        self.last_update_id = r['lastUpdateId']
-        bids = r['bids']
-        asks = r['asks']
+        if r is None:
+            return False
+        return self.apply_snapshot(r)
+
+    def apply_snapshot(self, r):
+        '''Replaces the book with a REST depth snapshot and replays the buffered
+        diff events on top of it. Buffered events that end before the snapshot's
+        `lastUpdateId` are dropped. If the snapshot is older than the first
+        remaining event the book stays out of sync and keeps buffering.
+
+        Args:
+            - r (dict): A response of `BinancePublic.depth`.
+
+        Returns: bool, whether the book is in sync after the snapshot.
+        '''
+        last_update_id = r['lastUpdateId']
+        buffered = [e for e in self.buffer if e[1] > last_update_id]
+        if len(buffered) > 0 and buffered[0][0] > last_update_id + 1:
+            print('BinanceBook {}: snapshot {} is older than buffered events'.format(self.pair, last_update_id))
+            self.buffer = buffered
+            return False
+
+        self.bids = self.level_class()
+        self.asks = self.level_class()
+        for bid in r['bids']:
+            self.update_tree(float(bid[0]), float(bid[1]), self.bids)
+        for ask in r['asks']:
+            self.update_tree(float(ask[0]), float(ask[1]), self.asks)
+        self.last_update_id = last_update_id
+        self.synced = True
+        self.buffer = []
+        for event in buffered:
+            self.apply_event(*event)
+        return self.synced
+
+    def resync(self, event=None):
+        '''Marks the book as out of sync and, if `auto_resync` is set, fetches a
+        new snapshot. `event` is buffered to be replayed over that snapshot.
+        '''
+        self.synced = False
+        self.resyncs += 1
+        self.buffer = [] if event is None else [event]
+        if self.auto_resync:
+            self.get_full_book()
+
+    def fetch_due(self):
+        '''Returns whether the out of sync book should fetch a new snapshot:
+        none was fetched yet, or the last one was fetched at least
+        `resync_backoff` seconds ago.
+        '''
+        return self.last_fetch is None or time.monotonic() - self.last_fetch >= self.resync_backoff
+
+    def apply_event(self, first_id, last_id, bids, asks, event_time=None):
+        '''Applies a single depth diff event to the book after checking its
+        update ids against the book's `last_update_id`.
+
+        Args:
+            - first_id (int): First update id of the event (`U`).
+            - last_id (int): Last update id of the event (`u`).
+            - bids (list): [price, quantity] bid updates. A quantity of 0
+                removes the level.
+            - asks (list): [price, quantity] ask updates.
+            - event_time (int, optional): The event time in ms (`E`).
+
+        Returns: bool, False if the event was buffered, stale or out of sequence.
+        '''
+        event = (first_id, last_id, bids, asks, event_time)
+        if not self.synced:
+            self.buffer.append(event)
+            if self.auto_resync and self.fetch_due():
+                self.get_full_book()
+            return False
+        if last_id <= self.last_update_id:
+            return False
+        if first_id > self.last_update_id + 1:
+            print('BinanceBook {}: gap between update {} and {}, resyncing'.format(self.pair, self.last_update_id, first_id))
+            self.resync(event)
+            return False
+
         for bid in bids:
-            self.bids.insert(bid[0], bid[1])
+            self.update_tree(float(bid[0]), float(bid[1]), self.bids)
         for ask in asks:
-            self.asks.insert(ask[0], ask[1])
+            self.update_tree(float(ask[0]), float(ask[1]), self.asks)
+        self.last_update_id = last_id
+        if event_time is not None:
+            self.latest_event_time = self.format_time(event_time)
+        return True
+
+    def update_book(self, m):
+        '''Applies a raw `depthUpdate` socket message.
+        '''
+        return self.apply_event(m['U'], m['u'], m['b'], m['a'], event_time=m.get('E'))
+
+    def update_records(self, records):
+        '''Applies the `depth_update` records produced by
+        `BinanceSocket.translate_depth`. Records sharing the same update ids
+        are grouped back into the event they came from.
+
+        Args:
+            - records (list[dict]): Translated depth records.
+
+        Returns: None.
+        '''
+        event = None
+        for r in records:
+            if r['pair'] != self.pair:
+                continue
+            if event is None or (r['stream_start'], r['stream_end']) != event[:2]:
+                if event is not None:
+                    self.apply_event(*event)
+                event = (r['stream_start'], r['stream_end'], [], [])
+            if r['side'] == 'bid':
+                event[2].append([r['price'], r['quantity']])
+            else:
+                event[3].append([r['price'], r['quantity']])
+        if event is not None:
+            self.apply_event(*event)
 
     def monitor_updates(self):
         c = Consumer(global_config.KAFKA['consumer_config'])
@@ -37,29 +190,18 @@ class BinanceBook(BinaryTree):
             msg = c.poll()
             if not msg.error():
                 m = json.loads(msg.value().decode('utf-8'))
-                if 'e' in m and m['e'] == 'depthUpdate':
+                if 'e' in m and m['e'] == 'depthUpdate' and m['s'] == self.pair:
                     self.update_book(m)
             elif msg.error().code() != KafkaError._PARTITION_EOF:
                 print(msg.error())
                 running = False
         c.close()
 
-    def update_book(self, m):
-        if m['u'] <= self.last_update_id:
-            return None
-        bids = m['bids']
-        for bid in bids:
-            self.update_tree(bid[0], bid[1], self.bids)
-        asks = m['asks']
-        for ask in asks:
-            self.update_tree(bid[0], bid[1], self.asks)
-        self.last_update_id = m['u']
-        self.latest_event_time = self.format_time(m['E'])
-
     def update_tree(self, price, quantity, tree):
         if quantity == 0:
             tree.remove(price)
-        tree.insert(price, quantity)
+        else:
+            tree.insert(price, quantity, replace=True)
 
     def format_time(self, t):
         return datetime.datetime.fromtimestamp(t / 1e3)
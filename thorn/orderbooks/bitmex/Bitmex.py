@@ -0,0 +1,145 @@
+import json
+import datetime
+
+from confluent_kafka import Consumer, KafkaError
+
+from thorn.api import config as socket_config
+from thorn import config as global_config
+from thorn.utils import BinaryTree, PriceLevelBook
+
+
+class BitmexBook(BinaryTree):
+
+    def __init__(self, symbol='XBTUSD', level_class=PriceLevelBook):
+        '''Initialization method for the `BitmexBook` class. The class tracks
+        the Bitmex `orderBookL2` stream for one symbol. Bitmex identifies every
+        level by a `price_id` and only sends the price on `partial` and
+        `insert`, so next to the sorted bids and asks the class keeps a hash
+        index mapping each `price_id` to its side and price. `update` and
+        `delete` are then applied with a dict lookup instead of a scan of the
+        book, and the level itself is found by price in the container (a dict
+        hit for the default `PriceLevelBook`).
+
+        Args:
+            - symbol (str, optional): The Bitmex symbol that the book tracks.
+            - level_class (class, optional): The price-level container used for
+                the bids and asks.
+
+        Returns: None.
+        '''
+        self.symbol = symbol
+        self.level_class = level_class
+        self.bids = level_class()
+        self.asks = level_class()
+        self.index = {}
+        self.latest_event_time = None
+        super(BitmexBook, self).__init__()
+
+    def clear(self):
+        self.bids = self.level_class()
+        self.asks = self.level_class()
+        self.index = {}
+
+    def side_tree(self, side):
+        if side in ('buy', 'bid'):
+            return self.bids
+        if side in ('sell', 'ask'):
+            return self.asks
+        raise AttributeError('side {} is not a valid side'.format(side))
+
+    def insert_level(self, price_id, side, price, quantity):
+        tree = self.side_tree(side)
+        self.index[price_id] = (tree, price)
+        tree.insert(price, quantity, replace=True)
+
+    def update_level(self, price_id, quantity):
+        '''Sets the quantity of the level `price_id`. Returns False if the id
+        is unknown, which means the book missed an insert.
+        '''
+        level = self.index.get(price_id)
+        if level is None:
+            return False
+        level[0].insert(level[1], quantity, replace=True)
+        return True
+
+    def delete_level(self, price_id):
+        level = self.index.pop(price_id, None)
+        if level is None:
+            return False
+        level[0].remove(level[1])
+        return True
+
+    def apply(self, action, data):
+        '''Applies one `orderBookL2` message to the book.
+
+        Args:
+            - action (str): One of 'partial', 'insert', 'update' or 'delete'.
+            - data (list[dict]): The rows of the message, each with an `id`,
+                a `side` and, depending on the action, a `size` and `price`.
+
+        Returns: int, the number of rows whose `price_id` was unknown.
+        '''
+        missed = 0
+        if action == 'partial':
+            self.clear()
+        if action == 'partial' or action == 'insert':
+            for d in data:
+                self.insert_level(d['id'], d['side'].lower(), d['price'], d['size'])
+        elif action == 'update':
+            for d in data:
+                if not self.update_level(d['id'], d['size']):
+                    missed += 1
+        elif action == 'delete':
+            for d in data:
+                if not self.delete_level(d['id']):
+                    missed += 1
+        return missed
+
+    def update_book(self, m):
+        '''Applies a raw Bitmex `orderBookL2` socket message.
+        '''
+        data = [d for d in m.get('data', []) if d.get('symbol', self.symbol) == self.symbol]
+        self.latest_event_time = datetime.datetime.utcnow()
+        return self.apply(m['action'], data)
+
+    def update_records(self, records):
+        '''Applies the `depth_update` records produced by
+        `BitmexSocket.translate_order_book_l2`.
+
+        Args:
+            - records (list[dict]): Translated depth records.
+
+        Returns: int, the number of records whose `price_id` was unknown.
+        '''
+        missed = 0
+        if len(records) > 0 and records[0].get('action') == 'partial':
+            self.clear()
+        for r in records:
+            if r['pair'] != self.symbol:
+                continue
+            if 'price' in r:
+                self.insert_level(r['price_id'], r['side'], r['price'], r['quantity'])
+            elif r['quantity'] == 0:
+                missed += not self.delete_level(r['price_id'])
+            else:
+                missed += not self.update_level(r['price_id'], r['quantity'])
+            self.latest_event_time = r['timestamp']
+        return missed
+
+    def monitor_updates(self, group):
+        conf = dict(global_config.KAFKA['consumer_config'])
+        conf['group.id'] = group
+        c = Consumer(**conf)
+        c.subscribe([socket_config.SOCKET_MANAGER_CONFIG['bitmex_stream_name']])
+        running = True
+        while running:
+            msg = c.poll()
+            if not msg.error():
+                m = json.loads(msg.value().decode('utf-8'))
+                if m.get('table') == 'orderBookL2' and 'action' in m:
+                    if self.update_book(m) > 0:
+                        print('BitmexBook {}: unknown price ids, waiting for partial'.format(self.symbol))
+            elif msg.error().code() != KafkaError._PARTITION_EOF:
+                print(msg.error())
+                running = False
+        c.close()
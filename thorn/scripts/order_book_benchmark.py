@@ -0,0 +1,129 @@
+import time
+import argparse
+import random
+import tracemalloc
+
+from thorn.utils import BinaryTree, PriceLevelBook
+
+CONTAINERS = [BinaryTree, PriceLevelBook]
+MID = 0.07
+TICK = 1e-6
+
+def generate_replay(levels, steps, seed=0, churn=0.1):
+    '''Generates a sequence of order book snapshots together with the level
+    diffs leading from each snapshot to the next. The book starts with `levels`
+    levels on each side around a mid price and, on every step, the mid drifts a
+    few ticks, `churn` of the levels change quantity, and levels are added or
+    dropped at the edges of the book so that each side stays `levels` deep.
+
+    Args:
+        - levels (int): The number of levels on each side of the book.
+        - steps (int): The number of snapshots to generate.
+        - seed (int, optional): Seed for the random number generator.
+        - churn (float, optional): Fraction of levels updated on every step.
+
+    Returns: tuple (snapshots, diffs) where `snapshots` is a list of
+        {'bids': [[price, quantity], ...], 'asks': [...]} dicts and `diffs` is a
+        list of lists of (is_bid, price, quantity) updates, a quantity of 0
+        meaning the level was removed.
+    '''
+    rng = random.Random(seed)
+    mid = int(MID / TICK)
+    bids = {mid - i - 1: rng.lognormvariate(0, 1.5) for i in range(levels)}
+    asks = {mid + i + 1: rng.lognormvariate(0, 1.5) for i in range(levels)}
+
+    def snapshot():
+        return {'bids': [[p*TICK, bids[p]] for p in sorted(bids, reverse=True)],
+                'asks': [[p*TICK, asks[p]] for p in sorted(asks)]}
+
+    snapshots = [snapshot()]
+    diffs = []
+    for _ in range(steps - 1):
+        diff = []
+        mid += rng.randint(-3, 3)
+        for side, is_bid in ((bids, True), (asks, False)):
+            # drop crossed levels and refresh a fraction of the quantities
+            for p in [p for p in side if (p >= mid if is_bid else p <= mid)]:
+                del side[p]
+                diff.append((is_bid, p*TICK, 0.0))
+            for p in rng.sample(sorted(side), int(churn*len(side))):
+                side[p] = rng.lognormvariate(0, 1.5)
+                diff.append((is_bid, p*TICK, side[p]))
+            # refill the book near the top, then trim the tail back to depth
+            best = max(side) if is_bid else min(side)
+            step = -1 if is_bid else 1
+            p = mid + step
+            while p != best:
+                if p not in side:
+                    side[p] = rng.lognormvariate(0, 1.5)
+                    diff.append((is_bid, p*TICK, side[p]))
+                p += step
+            tail = sorted(side, reverse=not is_bid)[levels:]
+            for p in tail:
+                del side[p]
+                diff.append((is_bid, p*TICK, 0.0))
+        diffs.append(diff)
+        snapshots.append(snapshot())
+    return snapshots, diffs
+
+def load_snapshot(container, snapshot):
+    bids = container()
+    asks = container()
+    for bid in snapshot['bids']:
+        bids.insert(bid[0], bid[1], replace=True)
+    for ask in snapshot['asks']:
+        asks.insert(ask[0], ask[1], replace=True)
+    return bids, asks
+
+def bench_snapshots(container, snapshots):
+    start = time.perf_counter()
+    for snapshot in snapshots:
+        bids, asks = load_snapshot(container, snapshot)
+        bids.max()
+        asks.min()
+    return time.perf_counter() - start
+
+def bench_diffs(container, snapshot, diffs):
+    bids, asks = load_snapshot(container, snapshot)
+    start = time.perf_counter()
+    for diff in diffs:
+        for is_bid, price, quantity in diff:
+            tree = bids if is_bid else asks
+            if quantity == 0:
+                tree.remove(price)
+            else:
+                tree.insert(price, quantity, replace=True)
+        bids.max()
+        asks.min()
+    return time.perf_counter() - start, sum(len(d) for d in diffs)
+
+def bench_memory(container, snapshot):
+    tracemalloc.start()
+    books = load_snapshot(container, snapshot)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del books
+    return size
+
+def run(levels, steps, seed=0):
+    print('Generating {} snapshots of {} levels per side'.format(steps, levels))
+    snapshots, diffs = generate_replay(levels, steps, seed=seed)
+    print('{:<16}{:>18}{:>18}{:>14}'.format('container', 'snapshot (ms)', 'diff (us/upd)', 'memory (KB)'))
+    for container in CONTAINERS:
+        t_snap = bench_snapshots(container, snapshots)
+        t_diff, n_diff = bench_diffs(container, snapshots[0], diffs)
+        mem = bench_memory(container, snapshots[0])
+        print('{:<16}{:>18.3f}{:>18.3f}{:>14.1f}'.format(container.__name__,
+                1e3*t_snap/len(snapshots), 1e6*t_diff/max(n_diff, 1), mem/1024))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the order book \
+                                    price-level containers.')
+
+    parser.add_argument('-l', '--levels', help='number of levels on each side of the book', type=int, required=False, default=1000)
+    parser.add_argument('-n', '--snapshots', help='number of snapshots to replay', type=int, required=False, default=60)
+    parser.add_argument('-s', '--seed', help='random seed', type=int, required=False, default=0)
+
+    args = parser.parse_args()
+    run(args.levels, args.snapshots, seed=args.seed)
@@ -8,20 +8,22 @@ import logging
 
 import asyncio
 import ccxt.async as ccxt
+import numpy as np
 
 import cassandra
 from cassandra.cluster import Cluster
 
 from thorn.api import UnifiedAPIManager
-from thorn.orderbooks import UnifiedOrderBook
+from thorn.orderbooks import UnifiedOrderBook, OrderBookMultiplexer
 from thorn import config
 from thorn.utils import instantiate_exchanges, create_diff_object
 
 FUNCTION = 'fetchOrderBook'
 FULL_DB_SUFFIX = '_order_book_snapshots'
 UPDATE_DB_SUFFIX = '_second_updates'
+GROUP_SUFFIX = '_second_consumer'
 
-def run(symbol, exchange, stop_at=None):
+def run(symbol, exchanges, stop_at=None):
     print('RUNNING ', symbol)
 
     symbolstr = symbol.replace('/','_')
@@ -29,8 +31,6 @@ def run(symbol, exchange, stop_at=None):
     full_db_name = symbolstr + FULL_DB_SUFFIX
     cluster = Cluster(config.CASSANDRA['nodes'])
 
-    book = UnifiedOrderBook(symbol, exchange)
-
     base_query = "INSERT INTO {} (ts, seq, is_trade, is_bid, price, quantity, exchange) \
                 VALUES (%(ts)s, %(seq)s, %(is_trade)s, %(is_bid)s, %(price)s, \
                 %(quantity)s, %(exchange)s)".format(update_db_name)
@@ -46,55 +46,43 @@ def run(symbol, exchange, stop_at=None):
             session.execute(config.CASSANDRA['second_update_keyspace']['query'])
             session.set_keyspace(config.CASSANDRA['second_update_keyspace']['name'])
 
-    def on_message(m, **kwargs):
-        '''Function passed to UnifiedOrderBook class that will be executed each
-        time the UnifiedOrderBook reads an order book message from Kafka. If the
-        message is about the exchange of the instantiated order book, this
-        function will compute the diff on the order book from the previous
-        second's complete book. This diff is then sent to the DB for storage.
+    snapshotted = set()
 
-        If the message is not from the exchange of `book`, do nothing.
+    def on_message(m, seq=-1, **kwargs):
+        '''Function passed to UnifiedOrderBook class that will be executed each
+        time the multiplexer routes an order book message from Kafka to one of
+        the exchanges' books. Messages are either full snapshots or deltas of
+        the levels that changed; either way the book returns the diff from the
+        previous second's book. This diff is then sent to the DB for storage.
         '''
         print('Got message: ', m)
         ex_name = m['exchange']
+        book = kwargs['book']
 
         ts = m['timestamp']
-        # first update in sequence, save full order book snapshot in different table
-        if seq == 0:
-            u = {'ts': ts, 'bids':m['bids'], 'asks': m['asks'], 'exchange': ex_name}
+        diff = book.update_message(m)
+        # delta without the update before it, wait for the next snapshot
+        if diff is None:
+            return None
+        # first snapshot of the book, save full order book snapshot in different table
+        if ex_name not in snapshotted:
+            u = {'ts': ts, 'bids': np.asarray(m['bids']).tolist(),
+                'asks': np.asarray(m['asks']).tolist(), 'exchange': ex_name}
             session.execute(full_base_query, u)
+            snapshotted.add(ex_name)
 
-        # don't run update because last_bids not yet available
+        # otherwise store the levels that changed since the previous second's book
         else:
-            current_bids = set((x[0], x[1]) for x in m['bids'])
-            current_asks = set((x[0], x[1]) for x in m['asks'])
-
-            last_bids = set((x[0], x[1]) for x in book.bids.inorder())
-            last_asks = set((x[0], x[1]) for x in book.asks.inorder())
-
-            removed_bids = last_bids.difference(current_bids)
-            removed_asks = last_asks.difference(current_asks)
-
-            added_bids = current_bids.difference(last_bids)
-            added_asks = current_asks.difference(last_asks)
-
-            for bid in removed_bids:
-                u = create_diff_object(ts, seq, True, bid[0], 0.0, ex_name)
-                session.execute(base_query, u)
-            for bid in added_bids:
-                u = create_diff_object(ts, seq, True, bid[0], bid[1], ex_name)
-                session.execute(base_query, u)
-
-            for ask in removed_asks:
-                u = create_diff_object(ts, seq, False, ask[0], 0.0, ex_name)
-                session.execute(base_query, u)
-            for ask in added_asks:
-                u = create_diff_object(ts, seq, False, ask[0], ask[1], ex_name)
-                session.execute(base_query, u)
-
-        book.update_full_book(m)
+            for is_bid, side in ((True, 'bids'), (False, 'asks')):
+                d = diff[side]
+                for level in d['removed'] + d['added'] + d['changed']:
+                    u = create_diff_object(ts, seq, is_bid, level[0], level[1], ex_name)
+                    session.execute(base_query, u)
 
-    book.monitor_full_book_stream(exchange.id, on_message=on_message, stop_at=stop_at)
+    multiplexer = OrderBookMultiplexer()
+    for exchange in exchanges:
+        multiplexer.add_book(UnifiedOrderBook(symbol, exchange), on_message=on_message)
+    multiplexer.monitor(symbolstr + GROUP_SUFFIX, stop_at=stop_at)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Second-level order book change \
@@ -125,15 +113,7 @@ if __name__ == "__main__":
     asyncio.get_event_loop().run_until_complete(manager.filter_exchanges())
     print('Filtered Exchanges:', list(map(lambda x: x.id, manager.exchanges)))
 
-    jobs = []
-    multiprocessing.log_to_stderr(logging.DEBUG)
-    for e in manager.exchanges:
-        p = multiprocessing.Process(name=e.id, target=run, args=(symbol, e), kwargs={'stop_at':stop_at})
-        jobs.append(p)
-        p.start()
-    for p in jobs:
-        p.join()
-        print(p.name, p.exitcode)
+    run(symbol, manager.exchanges, stop_at=stop_at)
 
 
 
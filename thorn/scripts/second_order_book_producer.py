@@ -15,13 +15,18 @@ from thorn.utils import instantiate_exchanges
 FUNCTION = 'fetchOrderBook'
 DELAY = 1000
 
-def run(symbol, exchanges, delay=DELAY, stop_at=None):
-    print('RUNNING ', symbol)
+def run(symbols, exchanges, delay=DELAY, stop_at=None, concurrency=None):
+    '''Publishes the order books of every symbol in `symbols` on every exchange
+    listing it, with a single `UnifiedAPIManager`, so that the exchanges are
+    instantiated and their markets loaded once for all the symbols.
+    '''
+    print('RUNNING ', symbols)
     print('Exchanges:', exchanges)
 
     loop = asyncio.get_event_loop()
     exchanges = instantiate_exchanges(exchanges)
-    manager = UnifiedAPIManager(symbol, FUNCTION, list(exchanges.values()), delay)
+    manager = UnifiedAPIManager(symbols, FUNCTION, list(exchanges.values()), delay,
+                                concurrency=concurrency)
     loop.run_until_complete(manager.filter_exchanges())
 
     print('Filtered Exchanges:', list(map(lambda x: x.id, manager.exchanges)))
@@ -40,6 +45,8 @@ if __name__ == "__main__":
     parser.add_argument('-ae', '--allExchanges', action='store_true', help='whether to run all exchanges', required=False)
     parser.add_argument('-p', '--pairs', help='the pairs/tickers to monitor', nargs='+', required=False)
     parser.add_argument('-d', '--delay', help='the delay (ms) between calls', type=int, required=False, default=DELAY)
+    parser.add_argument('-c', '--concurrency', help='the maximum number of requests in flight per process', type=int, required=False)
+    parser.add_argument('-w', '--workers', help='number of producer processes to split the pairs over', type=int, required=False, default=1)
     parser.add_argument('-sa', '--stopAfter', help='Stop managing after this number of ms', type=int, required=False)
 
     args = parser.parse_args()
@@ -61,9 +68,8 @@ if __name__ == "__main__":
     pairs = []
     if args.allPairs:
         print('Using as many pairs as possible given exchanges')
-        for exchange in exchanges:
-            ex = instantiate_exchanges([exchange])[exchange]
-            pairs.append(ex.markets)
+        instantiated = instantiate_exchanges(exchanges)
+        pairs = sorted(set(symbol for ex in instantiated.values() for symbol in ex.symbols))
     elif args.pairs is not None:
         pairs = args.pairs
     else:
@@ -71,8 +77,11 @@ if __name__ == "__main__":
 
     multiprocessing.log_to_stderr(logging.DEBUG)
     jobs = []
-    for p in pairs:
-        p = multiprocessing.Process(name=p, target=run, args=(p, exchanges), kwargs={'delay':delay,'stop_at':stop_at})
+    workers = max(min(args.workers, len(pairs)), 1)
+    for i in range(workers):
+        symbols = pairs[i::workers]
+        p = multiprocessing.Process(name='producer_{}'.format(i), target=run, args=(symbols, exchanges),
+                                    kwargs={'delay':delay, 'stop_at':stop_at, 'concurrency':args.concurrency})
         jobs.append(p)
         p.start()
     for p in jobs:
@@ -10,51 +10,95 @@ import asyncio
 import ccxt.async as ccxt
 
 from thorn.api import UnifiedAPIManager
-from thorn.orderbooks import UnifiedOrderBook
+from thorn.orderbooks import UnifiedOrderBook, OrderBookMultiplexer
 from thorn import config
 from thorn.utils import instantiate_exchanges, get_highest_trading_fee, \
                         reformat_pair
-from thorn.models import ArbitrageGraph, ArbitragePair, find_opportunities
+from thorn.models import ArbitrageGraph, ArbitragePair, SharedPriceTable, \
+                         find_opportunities_depth
 from thorn.brokers import ArbitrageBroker
 
 GROUP_SUFFIX = '_triangular'
 
-def create_pair_object(pair, exchange, price):
-    return ArbitragePair(exchange, pair, price[0], quantity=price[1])
+DEPTH = 10
 
-def run(pair, exchange, graph, broker, stop_at=None):
+def create_pair_object(pair, exchange, price, quantity=None, ts=None, ask=None):
+    return ArbitragePair(exchange, pair, price, quantity=quantity, ts=ts, ask=ask)
 
-    def on_message(m, seq=-1, **kwargs):
-        '''Function passed to UnifiedOrderBook class that will be executed each
-        time the UnifiedOrderBook reads an order book message from Kafka. If the
-        message is about the exchange of the instantiated order book, this
-        function will compute the diff on the order book from the previous
-        second's complete book. This diff is then sent to the DB for storage.
+def run(pairs, exchange, table, workers=1, stop_at=None):
+    '''Reads the order book streams of every pair with a multiplexed consumer,
+    sharded over `workers` processes, and publishes the top bid and ask levels
+    of each pair into its slot of the shared price table.
+    '''
 
-        If the message is not from the exchange of `book`, do nothing.
+    def on_message(m, seq=-1, **kwargs):
+        '''Function passed to the OrderBookMultiplexer that will be executed each
+        time it routes an order book message from Kafka to one of the books. The
+        book is updated and its top levels written to the shared table, where the
+        detector process picks them up.
         '''
-        ex_name = m['exchange']
-        ts = m['timestamp']
-
-        book.update_full_book(m)
-        price = book.asks.min()
-        p = create_pair_object(book.pair, exchange, price)
-        # first read in sequence, add pair
-        if seq == 0:
-            graph.add_pair(p, fee=0)
-        else:
-            graph.update_pair(p, fee=0)
-        ops = find_opportunities(graph, exchange=exchange)
-        graph.update_draw()
-        print(ts,':', ops)
+        book = kwargs['book']
+        if book.update_message(m) is None:
+            return None
+        bid = book.best_bid()
+        if bid is not None:
+            table.write(book.pair, bid[0], quantity=bid[1], ts=m['timestamp'],
+                        bids=book.depth('bids', table.depth),
+                        asks=book.depth('asks', table.depth))
+
+    # only the latest prices matter to the detector
+    multiplexer = OrderBookMultiplexer(coalesce=True)
+    for pair in pairs:
+        print('RUNNING ', pair)
+        multiplexer.add_book(UnifiedOrderBook(pair, exchange), on_message=on_message)
+
+    group_name = exchange.id + GROUP_SUFFIX
+    multiplexer.monitor_sharded(group_name, workers, stop_at=stop_at)
+
+def detect(exchange, table, stop_at=None, interval=0.01, draw=False):
+    '''Detector process. Polls the shared price table, applies the slots that
+    changed since the last poll to a single ArbitrageGraph holding every pair,
+    and searches the cycles through the updated edges. Each pair is sold at its
+    best bid and bought at its best ask, and only the cycles still profitable
+    against the published levels are passed to the broker.
+    '''
+    graph = ArbitrageGraph()
+    broker = ArbitrageBroker()
+    if draw:
+        graph.draw()
+    versions = table.versions()
+    added = set()
+    books = {}
+    while stop_at is None or datetime.datetime.utcnow() < stop_at:
+        changed = table.changed(versions)
+        if len(changed) == 0:
+            time.sleep(interval)
+            continue
+        for i in changed:
+            try:
+                book, ts, versions[i] = table.read_book(i)
+            except TimeoutError as e:
+                # skip the slot until its writer publishes again
+                print(datetime.datetime.utcnow(), ':', e)
+                versions[i] = table.versions()[i]
+                continue
+            bid, ask = book.best_bid(), book.best_ask()
+            if bid is None or ask is None:
+                continue
+            books[book.pair] = book
+            p = create_pair_object(book.pair, exchange, bid[0], quantity=bid[1], ts=ts, ask=ask[0])
+            if i in added:
+                graph.update_pair(p, fee=0)
+            else:
+                graph.add_pair(p, fee=0)
+                added.add(i)
+        ops = find_opportunities_depth(graph, books, exchange=exchange, method='incremental')
+        if draw:
+            graph.update_draw()
         if len(ops) > 0:
+            print(datetime.datetime.utcnow(), ':', ops)
             broker.handle_ops(ops)
-
-    print('RUNNING ', pair)
-    book = UnifiedOrderBook(pair, exchange)
-
-    group_name = pair + '_' + exchange.id + GROUP_SUFFIX
-    book.monitor_full_book_stream(group_name, on_message=on_message, stop_at=stop_at)
+    table.close()
 
 
 if __name__ == "__main__":
@@ -64,6 +108,8 @@ if __name__ == "__main__":
     parser.add_argument('-a', '--all', action='store_true', help='whether to run all pairs', required=False)
     parser.add_argument('-p', '--pairs', nargs='+', help='list of pairs to monitor', required=False)
     parser.add_argument('-sa', '--stopAfter', help='Stop managing after this number of ms', type=int, required=False)
+    parser.add_argument('-w', '--workers', help='number of consumer processes', type=int, required=False, default=1)
+    parser.add_argument('-d', '--draw', action='store_true', help='whether to draw the graph', required=False)
 
     cores = multiprocessing.cpu_count()
     print('Number of CPU Cores: {}'.format(cores))
@@ -81,15 +127,13 @@ if __name__ == "__main__":
     if stop_at is not None:
         stop_at = datetime.datetime.utcnow() + datetime.timedelta(milliseconds=stop_at)
 
-    graph = ArbitrageGraph()
-    graph.draw()
-    broker = ArbitrageBroker()
-    jobs = []
+    table = SharedPriceTable(pairs, depth=DEPTH)
     multiprocessing.log_to_stderr(logging.DEBUG)
-    for p in pairs:
-        p = multiprocessing.Process(name=p, target=run, args=(p, exchange, graph, broker), kwargs={'stop_at':stop_at})
-        jobs.append(p)
-        p.start()
-    for p in jobs:
-        p.join()
-        print(p.name, p.exitcode)
+    detector = multiprocessing.Process(name='detector', target=detect, args=(exchange, table),
+                                        kwargs={'stop_at':stop_at, 'draw':args.draw})
+    detector.start()
+    run(pairs, exchange, table, workers=args.workers, stop_at=stop_at)
+    detector.join()
+    print(detector.name, detector.exitcode)
+    table.close()
+    table.unlink()
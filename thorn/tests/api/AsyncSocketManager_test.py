@@ -0,0 +1,136 @@
+import unittest
+import datetime
+import json
+
+import asyncio
+import websockets
+
+from thorn.api import AsyncSocketManager
+from thorn.api import config
+
+
+class FakeProducer(object):
+    def __init__(self):
+        self.produced = []
+
+    def produce(self, topic, value, key=None):
+        self.produced.append((topic, json.loads(value.decode('utf-8'))))
+
+    def poll(self, timeout):
+        return 0
+
+    def flush(self):
+        return 0
+
+
+class FullProducer(FakeProducer):
+    '''Producer whose local queue is full for the first `full` messages.'''
+    def __init__(self, full):
+        super(FullProducer, self).__init__()
+        self.full = full
+        self.polls = 0
+
+    def produce(self, topic, value, key=None):
+        if self.full > 0:
+            self.full -= 1
+            raise BufferError('Local: Queue full')
+        super(FullProducer, self).produce(topic, value, key=key)
+
+    def poll(self, timeout):
+        self.polls += 1
+        return 0
+
+
+class AsyncSocketManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backoff = config.SOCKET_MANAGER_CONFIG['reconnect_backoff']
+        config.SOCKET_MANAGER_CONFIG['reconnect_backoff'] = 0.05
+        self.loop = asyncio.get_event_loop()
+        self.paths = []
+        self.subscriptions = []
+
+    def tearDown(self):
+        config.SOCKET_MANAGER_CONFIG['reconnect_backoff'] = self.backoff
+
+    async def handler(self, ws, path=None):
+        if path is None:
+            path = ws.request.path if hasattr(ws, 'request') else ws.path
+        self.paths.append(path)
+        if path.startswith('/stream'):
+            for symbol in ['BNBBTC', 'ETHBTC']:
+                data = {'e': 'depthUpdate', 's': symbol, 'U': 1, 'u': 2, 'b': [], 'a': []}
+                await ws.send(json.dumps({'stream': symbol.lower() + '@depth', 'data': data}))
+            await ws.wait_closed()
+        elif path.startswith('/realtime'):
+            await ws.send(json.dumps({'info': 'Welcome to the BitMEX Realtime API.'}))
+            self.subscriptions.append(json.loads(await ws.recv()))
+            await ws.send(json.dumps({'table': 'orderBookL2', 'action': 'partial', 'data': []}))
+            # drop the connection, the manager reconnects and subscribes again
+        else:
+            await ws.send(json.dumps({'eventId': 1, 'events': []}))
+            await ws.wait_closed()
+
+    def test_run(self):
+        manager = AsyncSocketManager(loop=self.loop)
+        manager.p = FakeProducer()
+
+        async def run():
+            server = await websockets.serve(self.handler, '127.0.0.1', 0)
+            base = 'ws://127.0.0.1:{}'.format(server.sockets[0].getsockname()[1])
+            manager.add_binance(['BNBBTC', 'ETHBTC'], base=base + '/stream')
+            manager.add_bitmex(['XBTUSD', 'ETHUSD'], base=base + '/realtime')
+            manager.add_gemini(['BTCUSD', 'ETHUSD'], base=base + '/marketdata')
+            await manager.run(stop_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=0.5))
+            server.close()
+            await server.wait_closed()
+
+        self.loop.run_until_complete(run())
+
+        # both Binance symbols share one combined stream connection
+        self.assertEqual(self.paths.count('/stream?streams=bnbbtc@depth/ethbtc@depth'), 1)
+        produced = manager.p.produced
+        binance = [m for topic, m in produced if topic == 'binance_socket']
+        self.assertEqual([m['s'] for m in binance], ['BNBBTC', 'ETHBTC'])
+
+        # one Bitmex subscription for both symbols, replayed on every reconnect
+        assert len(self.subscriptions) >= 2
+        self.assertEqual(self.subscriptions[0], {'op': 'subscribe',
+                                                 'args': ['orderBookL2:XBTUSD', 'orderBookL2:ETHUSD']})
+        assert manager.reconnects['bitmex'] >= 1
+        bitmex = [m for topic, m in produced if topic == 'bitmex_socket']
+        self.assertEqual(len(bitmex), len(self.subscriptions))
+
+        gemini = [m for topic, m in produced if topic == 'gemini_socket']
+        self.assertEqual(sorted(m['symbol'] for m in gemini), ['BTCUSD', 'ETHUSD'])
+
+    def test_errors(self):
+        manager = AsyncSocketManager(loop=self.loop)
+        # nothing to run
+        self.loop.run_until_complete(manager.run())
+
+        manager.p = FullProducer(2)
+        connection = {'topic': 'binance_socket', 'parse': None}
+        assert manager.publish(connection, json.dumps({'e': 'depthUpdate'}))
+        self.assertEqual(manager.p.produced, [('binance_socket', {'e': 'depthUpdate'})])
+        assert manager.p.polls >= 2
+
+        def parse(m):
+            return m['data']
+
+        async def run():
+            server = await websockets.serve(self.handler, '127.0.0.1', 0)
+            base = 'ws://127.0.0.1:{}'.format(server.sockets[0].getsockname()[1])
+            # the parse callback raises a KeyError on the messages of this feed
+            manager.add_connection('broken', base + '/marketdata/BTCUSD', 'gemini_socket', parse=parse)
+            await manager.run(stop_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=0.3))
+            server.close()
+            await server.wait_closed()
+
+        self.loop.run_until_complete(run())
+        # the connection is reopened after every failure instead of dying
+        assert manager.reconnects['broken'] >= 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import unittest
+import time
+import json
+import threading
+import tempfile
+import importlib
+
+import asyncio
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from thorn.api.exchanges import PublicExchange, AsyncPublicExchange, fan_out
+from thorn.api.exchanges.PublicExchange import close_async_sessions, get_response_cache
+from thorn.api import config
+from thorn.utils import ResponseCache
+
+# the module, shadowed by the class in the package namespace
+public_exchange = importlib.import_module('thorn.api.exchanges.PublicExchange')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        self.server.connections += 1
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path.startswith('/slow'):
+            time.sleep(0.3)
+        if self.path.startswith('/meta') and self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/flaky') and self.server.failures > 0:
+            self.server.failures -= 1
+            status, body = 503, b'{}'
+        elif self.path.startswith('/missing'):
+            status, body = 404, b'Not Found'
+        else:
+            status, body = 200, json.dumps({'path': self.path}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if self.path.startswith('/meta'):
+            self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.connections = 0
+        self.server.requests = 0
+        # the number of 503 responses of the flaky endpoint
+        self.server.failures = 2
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api = PublicExchange(base='http://127.0.0.1:{}'.format(self.server.server_port))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class CountingBucket(object):
+    def __init__(self):
+        self.calls = 0
+
+    def acquire(self, n=1):
+        self.calls += n
+
+    async def wait(self, n=1):
+        self.calls += n
+
+
+class PublicExchangeTest(ServerTestCase):
+
+    def test_keep_alive(self):
+        for i in range(5):
+            r, status = self.api.get(payload={'symbol': 'ETHBTC'}, endpoint='depth')
+            self.assertEqual(status, None)
+            self.assertEqual(r['path'], '/depth?symbol=ETHBTC')
+        # every request reuses the pooled connection
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retry(self):
+        self.api.limiter = CountingBucket()
+        r, status = self.api.get(endpoint='flaky')
+        self.assertEqual(status, None)
+        self.assertEqual(self.server.requests, 3)
+        # every attempt takes a token
+        self.assertEqual(self.api.limiter.calls, 3)
+
+        self.server.failures = 2
+        loop = asyncio.get_event_loop()
+        r, status = loop.run_until_complete(self.api.get_async(endpoint='flaky'))
+        self.assertEqual(status, None)
+        self.assertEqual(self.api.limiter.calls, 6)
+        loop.run_until_complete(close_async_sessions())
+
+    def test_error_body(self):
+        loop = asyncio.get_event_loop()
+        r, status = loop.run_until_complete(self.api.get_async(endpoint='missing'))
+        self.assertEqual((r, status), ('Not Found', 404))
+        loop.run_until_complete(close_async_sessions())
+
+    def test_get_async(self):
+        loop = asyncio.get_event_loop()
+
+        async def fetch():
+            return await asyncio.gather(*[self.api.get_async(payload={'limit': i}, endpoint='depth')
+                                          for i in range(3)])
+
+        results = loop.run_until_complete(fetch())
+        self.assertEqual([r['path'] for r, status in results], ['/depth?limit={}'.format(i) for i in range(3)])
+        r, status = loop.run_until_complete(self.api.get_async(endpoint='flaky'))
+        self.assertEqual(status, None)
+        self.assertEqual(self.server.requests, 6)
+        loop.run_until_complete(close_async_sessions())
+
+    def test_cache(self):
+        self.api.cache = ResponseCache()
+        self.api.cache_ttl = {'meta': 60}
+        for i in range(3):
+            r, status = self.api.get(endpoint='meta')
+            self.assertEqual(r, {'path': '/meta'})
+            # callers may modify the cached responses
+            r['path'] = None
+        self.assertEqual(self.server.requests, 1)
+        # endpoints without a ttl are not cached
+        self.api.get(endpoint='depth')
+        self.api.get(endpoint='depth')
+        self.assertEqual(self.server.requests, 3)
+
+        # an expired entry is revalidated with its ETag
+        key, ttl, entry = self.api.cache_lookup(endpoint='meta')
+        entry['stored_at'] -= 120
+        r, status = self.api.get(endpoint='meta')
+        self.assertEqual((r, status), ({'path': '/meta'}, None))
+        self.assertEqual(self.server.requests, 4)
+        assert self.api.cache.fresh(self.api.cache_lookup(endpoint='meta')[2], 60)
+
+        loop = asyncio.get_event_loop()
+        self.api.cache_lookup(endpoint='meta')[2]['stored_at'] -= 120
+        r, status = loop.run_until_complete(self.api.get_async(endpoint='meta'))
+        self.assertEqual((r, status), ({'path': '/meta'}, None))
+        self.assertEqual(self.server.requests, 5)
+        loop.run_until_complete(close_async_sessions())
+
+
+    def test_response_cache_dir(self):
+        self.assertIsNone(config.HTTP_CONFIG['cache_dir'])
+        self.addCleanup(setattr, public_exchange, 'RESPONSE_CACHE', public_exchange.RESPONSE_CACHE)
+        self.addCleanup(config.HTTP_CONFIG.__setitem__, 'cache_dir', None)
+        with tempfile.NamedTemporaryFile() as f:
+            # the directory cannot be created under a file
+            config.HTTP_CONFIG['cache_dir'] = f.name
+            public_exchange.RESPONSE_CACHE = None
+            cache = get_response_cache()
+        self.assertIsNone(cache.disk)
+        self.assertIs(get_response_cache(), cache)
+
+
+class Client(PublicExchange):
+    threads = set()
+
+    def depth(self, endpoint):
+        self.threads.add(threading.current_thread())
+        r, status = self.get(endpoint=endpoint)
+        return r
+
+    def paths(self, *endpoints):
+        return [self.get(endpoint=endpoint)[0]['path'] for endpoint in endpoints]
+
+
+class AsyncPublicExchangeTest(ServerTestCase):
+
+    def test_fan_out(self):
+        loop = asyncio.get_event_loop()
+        base = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        clients = {name: AsyncPublicExchange(Client(base=base)) for name in ['a', 'b', 'c', 'd']}
+        endpoints = {'a': 'slow', 'b': 'slow', 'c': 'fast', 'd': 'slow'}
+
+        async def fetch():
+            calls = {name: clients[name].depth(endpoints[name]) for name in clients}
+            return [await f for f in fan_out(calls, timeout={'d': 0.1})]
+
+        t = time.monotonic()
+        results = loop.run_until_complete(fetch())
+        # the requests run concurrently, the fast one completes first and the
+        # one with a shorter timeout fails alone
+        assert time.monotonic() - t < 0.55
+        self.assertEqual(results[0], ('c', {'path': '/fast'}, None))
+        self.assertEqual(results[1][0], 'd')
+        self.assertIsInstance(results[1][2], asyncio.TimeoutError)
+        self.assertEqual(sorted(r[0] for r in results[2:]), ['a', 'b'])
+        self.assertEqual([r[1] for r in results[2:]], [{'path': '/slow'}]*2)
+
+        r, status = loop.run_until_complete(clients['a'].get(endpoint='fast'))
+        self.assertEqual(r, {'path': '/fast'})
+        # the endpoint methods run on the loop, their requests over aiohttp
+        self.assertEqual(Client.threads, {threading.current_thread()})
+        self.assertEqual(loop.run_until_complete(clients['a'].paths('a', 'b', 'c')), ['/a', '/b', '/c'])
+        loop.run_until_complete(close_async_sessions())
+
+
+if __name__ == '__main__':
+    unittest.main()
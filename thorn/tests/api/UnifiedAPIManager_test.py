@@ -13,6 +13,9 @@ from thorn.api import config
 SYMBOL = 'ETH/BTC'
 
 from thorn.api import UnifiedAPIManager
+from thorn.orderbooks import UnifiedOrderBook
+from thorn.utils import get_serializer, deserialize, TokenBucket
+from thorn.utils import RateLimiter
 
 class ManageThread(threading.Thread):
     def __init__(self, symbol, function, exchanges, delay, loop=None):
@@ -78,6 +81,171 @@ class UnifiedAPIManagerTest(unittest.TestCase):
         t2.join()
         self.assertEqual(2+2, 4)
 
+    def test_encode_order_book(self):
+        exchange = ccxt.binance()
+        uam = UnifiedAPIManager(SYMBOL, 'fetchOrderBook', [exchange], 1000, keyframe_interval=3)
+        serializer = get_serializer('binary')
+        book = UnifiedOrderBook(SYMBOL, exchange)
+        books = [
+            {'bids': [[0.0801, 2.0], [0.0800, 5.0]], 'asks': [[0.0803, 1.0]]},
+            {'bids': [[0.0801, 2.0], [0.0800, 4.0]], 'asks': [[0.0803, 1.0], [0.0804, 2.0]]},
+            {'bids': [[0.0801, 2.0], [0.0800, 4.0]], 'asks': [[0.0803, 1.0], [0.0804, 2.0]]},
+            {'bids': [[0.0802, 1.0]], 'asks': [[0.0804, 2.0]]},
+            {'bids': [[0.0802, 1.0]], 'asks': [[0.0805, 2.0]]},
+        ]
+        kinds = []
+        for i, b in enumerate(books):
+            m = dict(b, exchange=exchange.id, symbol=SYMBOL, timestamp=1518996767361 + i,
+                        datetime=None)
+            m = uam.encode_order_book(m)
+            if m is None:
+                kinds.append(None)
+                continue
+            kinds.append(m['kind'])
+            m = deserialize(serializer.dumps(m, seq=m['seq']))
+            assert book.update_message(m) is not None
+            self.assertEqual(book.bids.inorder(), sorted(b['bids']))
+            self.assertEqual(book.asks.inorder(), sorted(b['asks']))
+        # unchanged books are not published, every third message is a keyframe
+        self.assertEqual(kinds, [0, 1, None, 1, 0])
+
+        delta = {'exchange': exchange.id, 'kind': 1, 'seq': book.seq + 2, 'datetime': None,
+                 'bids': [[0.0803, 1.0]], 'asks': []}
+        assert book.update_message(delta) is None
+        assert book.seq is None
+
+    def test_tick(self):
+        loop = asyncio.get_event_loop()
+        fast, slow = ccxt.binance(), ccxt.gemini()
+        uam = UnifiedAPIManager(SYMBOL, 'fetchOrderBook', [fast, slow], 100, loop=loop)
+        # give both exchanges a budget well above the tick rate
+        buckets = {fast.id: TokenBucket(100), slow.id: TokenBucket(100)}
+        RateLimiter.BUCKETS.update(buckets)
+        self.addCleanup(lambda: [RateLimiter.BUCKETS.pop(k) for k in buckets])
+        calls = {fast.id: 0, slow.id: 0}
+
+        async def fetch(symbol, exchange, params={}):
+            calls[exchange.id] += 1
+            await asyncio.sleep(0.25 if exchange is slow else 0.01)
+
+        stop_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=1)
+        loop.run_until_complete(asyncio.gather(uam.tick(fetch, [SYMBOL], fast, stop_at=stop_at),
+                                               uam.tick(fetch, [SYMBOL], slow, stop_at=stop_at)))
+        # the slow exchange skips the ticks it is still busy for, without
+        # delaying the fast one
+        assert calls[fast.id] >= 8
+        assert 3 <= calls[slow.id] <= 5
+        assert uam.skipped[slow.id] >= 4
+        assert fast.id not in uam.skipped
+
+    def test_tick_budget(self):
+        loop = asyncio.get_event_loop()
+        exchange = ccxt.kraken()
+        symbols = ['ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'BCH/BTC']
+        uam = UnifiedAPIManager(SYMBOL, 'fetchOrderBook', [exchange], 100, loop=loop)
+        RateLimiter.BUCKETS[exchange.id] = TokenBucket(5, capacity=2)
+        self.addCleanup(RateLimiter.BUCKETS.pop, exchange.id)
+        calls = []
+
+        async def fetch(symbol, exchange, params={}):
+            calls.append(symbol)
+
+        stop_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=1)
+        loop.run_until_complete(uam.tick(fetch, symbols, exchange, stop_at=stop_at))
+        # the budget of 5 calls per second is shared by the symbols, stalest first
+        assert 5 <= len(calls) <= 8
+        self.assertEqual(calls[:4], ['ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'BCH/BTC'])
+        counts = [calls.count(s) for s in symbols]
+        assert max(counts) - min(counts) <= 1
+        assert uam.skipped[exchange.id] > 0
+
+    def test_manage_fetch(self):
+        loop = asyncio.get_event_loop()
+        binance, gemini = ccxt.binance(), ccxt.gemini()
+        uam = UnifiedAPIManager(SYMBOL, 'fetchOrderBook', [binance, gemini], 100, loop=loop)
+        buckets = {binance.id: TokenBucket(100), gemini.id: TokenBucket(100)}
+        RateLimiter.BUCKETS.update(buckets)
+        self.addCleanup(lambda: [RateLimiter.BUCKETS.pop(k) for k in buckets])
+        calls = []
+
+        async def fetch(symbol, exchange, params={}):
+            calls.append((exchange.id, symbol))
+
+        uam.publish_order_book = fetch
+        uam.publish_ticker = fetch
+        loop.run_until_complete(uam.manage_fetch_order_book(SYMBOL, [binance, gemini]))
+        loop.run_until_complete(uam.manage_fetch_ticker(SYMBOL, [gemini]))
+        self.assertEqual(calls, [(binance.id, SYMBOL), (gemini.id, SYMBOL), (gemini.id, SYMBOL)])
+
+    def test_symbols(self):
+        loop = asyncio.get_event_loop()
+        binance, gemini = ccxt.binance(), ccxt.gemini()
+        symbols = ['ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'BCH/BTC', 'ETH/USD']
+        uam = UnifiedAPIManager(symbols, 'fetchOrderBook', [binance, gemini], 100, loop=loop,
+                                concurrency=3)
+        uam.exchange_symbols = {binance.id: symbols[:4], gemini.id: ['ETH/BTC', 'ETH/USD']}
+        buckets = {binance.id: TokenBucket(100), gemini.id: TokenBucket(100)}
+        RateLimiter.BUCKETS.update(buckets)
+        self.addCleanup(lambda: [RateLimiter.BUCKETS.pop(k) for k in buckets])
+        calls = set()
+        in_flight = [0, 0]
+
+        async def fetch(symbol, exchange, params={}):
+            calls.add((exchange.id, symbol))
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            await asyncio.sleep(0.05)
+            in_flight[0] -= 1
+
+        stop_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=0.5)
+        loop.run_until_complete(asyncio.gather(*[uam.tick(fetch, uam.symbols_of(ex), ex, stop_at=stop_at)
+                                                 for ex in uam.exchanges]))
+        # every listed symbol is fetched, never more than 3 at once
+        self.assertEqual(calls, set([(binance.id, s) for s in symbols[:4]] +
+                                    [(gemini.id, 'ETH/BTC'), (gemini.id, 'ETH/USD')]))
+        self.assertEqual(in_flight[1], 3)
+        # one producer per exchange
+        assert uam.producer(binance) is uam.producer(binance)
+        assert uam.producer(binance) is not uam.producer(gemini)
+
+    def test_bulk(self):
+        loop = asyncio.get_event_loop()
+        exchange = ccxt.binance()
+        symbols = ['ETH/BTC', 'LTC/BTC', 'XRP/BTC']
+        uam = UnifiedAPIManager(symbols, 'fetchTicker', [exchange], 100, loop=loop)
+        RateLimiter.BUCKETS[exchange.id] = TokenBucket(100)
+        self.addCleanup(RateLimiter.BUCKETS.pop, exchange.id)
+        producer = FakeProducer()
+        uam.producers[exchange.id] = producer
+        requests = []
+
+        async def fetch_tickers(symbols=None, params={}):
+            requests.append(symbols)
+            # the exchange returns every ticker, not only the requested ones
+            return {s: {'symbol': s, 'last': 1.0} for s in ['ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'BNB/BTC']}
+
+        exchange.fetch_tickers = fetch_tickers
+        assert uam.has_bulk(exchange)
+        stop_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=0.25)
+        loop.run_until_complete(uam.manage(stop_at=stop_at))
+        # one request per tick, split into one message per tracked symbol
+        assert 2 <= len(requests) <= 4
+        self.assertEqual(requests[0], symbols)
+        topics = [topic for topic, value in producer.produced]
+        self.assertEqual(topics[:3], ['ETH_BTC_ticker', 'LTC_BTC_ticker', 'XRP_BTC_ticker'])
+        self.assertEqual(len(topics), 3*len(requests))
+
+
+class FakeProducer(object):
+    def __init__(self):
+        self.produced = []
+
+    def produce(self, topic, value, key=None):
+        self.produced.append((topic, value))
+
+    def poll(self, timeout):
+        return 0
+
 
 def consume(topic, pass_test):
     brokers = config.SOCKET_MANAGER_CONFIG['brokers']
@@ -91,8 +259,8 @@ def consume(topic, pass_test):
     while running:
         msg = c.poll()
         if not msg.error():
-            print('Received message: %s' % msg.value().decode('utf-8'))
-            m = json.loads(msg.value().decode('utf-8'))
+            print('Received message: %s' % msg.value())
+            m = deserialize(msg.value())
             running = not pass_test(m)
             print('test passed')
             break
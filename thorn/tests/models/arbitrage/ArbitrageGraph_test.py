@@ -7,7 +7,11 @@ import numpy as np
 
 import ccxt.async as ccxt
 from thorn.models import ArbitrageGraph
-from thorn.models import bellman_ford, find_opportunities
+from thorn.models import bellman_ford, bellman_ford_vectorized, negative_cycles, find_opportunities
+from thorn.models import find_opportunities_incremental, find_triangles
+from thorn.models import evaluate_depth, find_opportunities_depth
+from thorn.models import SharedPriceTable
+from thorn.orderbooks import UnifiedOrderBook
 
 pairs = [
     {
@@ -126,6 +130,142 @@ class ArbitrageGraphTest(unittest.TestCase):
         nx.draw_networkx_edges(G, pos, arrows=True)
         plt.show()
 
+    def test_bellman_ford_vectorized(self):
+        digraph = ArbitrageGraph(pairs=pairs, fees=np.zeros(shape=len(pairs)))
+        path = bellman_ford_vectorized(digraph, 'BTC_gemini')
+        assert path[0] == path[-1]
+        assert len(path) == 4
+        gain = 1.0
+        for i in range(len(path)-1):
+            gain *= digraph.get_edge_price(path[i], path[i+1])
+        assert gain > 1
+
+        digraph = ArbitrageGraph(pairs=pairs2, fees=np.zeros(shape=len(pairs2)))
+        ops = find_opportunities(digraph, method='vectorized')
+        assert len(ops) > 0
+        for op in ops:
+            assert op.gain > 1
+
+        # price updates go straight into the compiled arrays
+        c = digraph.compile()
+        digraph.update_pair(pairs2[0], fee=0)
+        assert digraph.compile() is c
+        self.assertRaises(AttributeError, find_opportunities, digraph, method='dijkstra')
+
+    def test_negative_cycles(self):
+        digraph = ArbitrageGraph(pairs=pairs, fees=np.zeros(shape=len(pairs)))
+        cycles = negative_cycles(digraph)
+        assert len(cycles) == 1
+        assert cycles[0][0] == cycles[0][-1]
+
+        digraph = ArbitrageGraph(pairs=pairs2, fees=np.zeros(shape=len(pairs2)))
+        ops = find_opportunities(digraph, method='negative_cycles')
+        assert len(ops) > 0
+        keys = set()
+        for op in ops:
+            assert op.gain > 1
+            keys.add(frozenset(n.id for n in op.path))
+        assert len(keys) == len(ops)
+
+    def test_find_opportunities_incremental(self):
+        digraph = ArbitrageGraph(pairs=pairs, fees=np.zeros(shape=len(pairs)))
+        assert len(digraph.dirty_edges) == 6
+        ops = find_opportunities_incremental(digraph)
+        assert len(ops) == 1
+        assert ops[0].gain > 1
+        assert len(digraph.dirty_edges) == 0
+        assert find_opportunities_incremental(digraph) == []
+
+        # repricing one pair re-searches only the cycles through its edges
+        update = dict(pairs[2])
+        update['price'] = 950.0
+        digraph.update_pair(update, fee=0)
+        assert len(digraph.dirty_edges) == 2
+        ops = find_opportunities_incremental(digraph)
+        assert len(ops) == 1
+        assert np.isclose(ops[0].gain, 950.0/10420.0/0.0873)
+
+    def test_find_triangles(self):
+        digraph = ArbitrageGraph(pairs=pairs, fees=np.zeros(shape=len(pairs)))
+        assert len(digraph.triangles) == 2
+        for edge in digraph.edges:
+            assert len(digraph.edge_triangles[edge.id]) == 1
+
+        ops = find_triangles(digraph)
+        assert len(ops) == 1
+        assert np.isclose(ops[0].gain, 924.99/10420.0/0.0873)
+        assert find_triangles(digraph, threshold=0.02) == []
+
+        digraph.remove_edge('USD_gemini', 'BTC_gemini')
+        assert len(digraph.triangles) == 1
+        assert find_triangles(digraph) == []
+        digraph.remove_node('ETH_gemini')
+        assert len(digraph.triangles) == 0
+        assert all(len(t) == 0 for t in digraph.edge_triangles.values())
+
+    def test_find_opportunities_depth(self):
+        levels = {
+            'ETH/USD': {'bids': [[924.99, 1.0], [910.0, 5.0]], 'asks': [[925.5, 1.0]]},
+            'BTC/USD': {'bids': [[10419.0, 1.0]], 'asks': [[10420.0, 0.05], [10600.0, 1.0]]},
+            'ETH/BTC': {'bids': [[0.0872, 1.0]], 'asks': [[0.0873, 0.3], [0.0900, 5.0]]}
+        }
+        books = {}
+        for pair in levels:
+            books[pair] = UnifiedOrderBook(pair, ccxt.gemini())
+            levels[pair]['datetime'] = None
+            books[pair].update_full_book(levels[pair])
+
+        digraph = ArbitrageGraph(pairs=pairs, fees=np.zeros(shape=len(pairs)))
+        ops = find_opportunities_depth(digraph, books, method='negative_cycles')
+        assert len(ops) == 1
+        op = ops[0]
+        assert 0 < op.size <= op.max_size
+        assert np.isclose(op.profit, op.size*(op.gain-1.0))
+        # buying past the first 0.3 ETH ask at 0.0900 no longer pays
+        sizes = {'BTC': 0.0873*0.3, 'USD': 0.0873*0.3*10420.0, 'ETH': 0.0873*0.3*10420.0/924.99}
+        assert np.isclose(op.size, sizes[op.start])
+        assert np.isclose(op.gain, 924.99/10420.0/0.0873)
+
+        # a fee larger than the spread leaves nothing to execute
+        assert find_opportunities_depth(digraph, books, fee=0.01, method='negative_cycles') == []
+
+    def test_bid_ask(self):
+        levels = {
+            'ETH/BTC': {'bids': [[0.0872, 1.0]], 'asks': [[0.0873, 0.3], [0.0900, 5.0]]},
+            'BTC/USD': {'bids': [[10419.0, 1.0]], 'asks': [[10420.0, 0.05], [10600.0, 1.0]]},
+            'ETH/USD': {'bids': [[924.99, 1.0], [910.0, 5.0]], 'asks': [[925.5, 1.0]]}
+        }
+        table = SharedPriceTable(list(levels), depth=2)
+        try:
+            for pair in levels:
+                table.write(pair, levels[pair]['bids'][0][0], bids=levels[pair]['bids'],
+                            asks=levels[pair]['asks'])
+            books = {}
+            digraph = ArbitrageGraph()
+            for i, pair in enumerate(table.pairs):
+                book = table.read_book(i)[0]
+                books[pair] = book
+                digraph.add_pair({'exchange': ccxt.gemini(), 'pair': pair, 'price': book.best_bid()[0],
+                                  'ask': book.best_ask()[0]}, fee=0)
+        finally:
+            table.close()
+            table.unlink()
+
+        # the base currency is sold at the bid and bought back at the ask
+        assert np.isclose(digraph.get_edge_price('ETH_gemini', 'BTC_gemini'), 0.0872)
+        assert np.isclose(digraph.get_edge_price('BTC_gemini', 'ETH_gemini'), 1/0.0873)
+        digraph.update_pair({'exchange': ccxt.gemini(), 'pair': 'ETH/BTC', 'price': 0.0871,
+                             'ask': 0.0874}, fee=0)
+        assert np.isclose(digraph.get_edge_price('BTC_gemini', 'ETH_gemini'), 1/0.0874)
+        digraph.update_pair({'exchange': ccxt.gemini(), 'pair': 'ETH/BTC', 'price': 0.0872,
+                             'ask': 0.0873}, fee=0)
+
+        ops = find_opportunities_depth(digraph, books, method='incremental')
+        assert len(ops) == 1
+        assert np.isclose(ops[0].gain, 924.99/10420.0/0.0873)
+        assert np.isclose(ops[0].size, {'BTC': 0.0873*0.3, 'USD': 0.0873*0.3*10420.0,
+                                        'ETH': 0.0873*0.3*10420.0/924.99}[ops[0].start])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import time
+import multiprocessing
+
+import numpy as np
+
+from thorn.models import SharedPriceTable
+
+def publish(table, pair, price):
+    table.write(pair, price, quantity=1.0, ts=1518996767361)
+    table.close()
+
+class SharedPriceTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = SharedPriceTable(['ETH/BTC', 'BTC/USD', 'ETH/USD'])
+
+    def tearDown(self):
+        self.table.close()
+        self.table.unlink()
+
+    def test_write_read(self):
+        versions = self.table.versions()
+        assert len(self.table.changed(versions)) == 0
+
+        self.table.write('BTC/USD', 10420.0)
+        assert list(self.table.changed(versions)) == [1]
+        price, quantity, ts, version = self.table.read(1)
+        assert price == 10420.0
+        assert quantity is None and ts is None
+        assert version == 2
+        self.assertRaises(KeyError, self.table.write, 'LTC/USD', 1.0)
+
+    def test_levels(self):
+        table = SharedPriceTable(['ETH/BTC', 'BTC/USD'], depth=2)
+        try:
+            table.write('ETH/BTC', 0.0872, ts=1518996767361,
+                        bids=[[0.0872, 1.0, 'a'], [0.0871, 2.0, 'b'], [0.0870, 3.0, 'c']],
+                        asks=[[0.0873, 0.3]])
+            book, ts, version = table.read_book(0)
+            assert book.pair == 'ETH/BTC' and ts == 1518996767361 and version == 2
+            assert book.best_bid() == [0.0872, 1.0]
+            assert book.best_ask() == [0.0873, 0.3]
+            assert list(book.iter_levels('bids')) == [[0.0872, 1.0], [0.0871, 2.0]]
+            assert list(book.iter_levels('bids', price=0.0872)) == [[0.0872, 1.0]]
+            assert list(book.iter_levels('asks', quantity=0.1)) == [[0.0873, 0.3]]
+            assert table.read(0)[0] == 0.0872
+
+            book = table.read_book(1)[0]
+            assert book.best_bid() is None and book.best_ask() is None
+        finally:
+            table.close()
+            table.unlink()
+
+    def test_stale_slot(self):
+        self.table.write('ETH/BTC', 0.0873)
+        # a writer died in the middle of a write
+        self.table.table[0, 3] += 1
+        t = time.monotonic()
+        self.assertRaises(TimeoutError, self.table.read, 0)
+        assert time.monotonic() - t < 2
+        assert self.table.read(1)[3] == 0
+
+    def test_processes(self):
+        versions = self.table.versions()
+        jobs = [multiprocessing.Process(target=publish, args=(self.table, pair, price))
+                for pair, price in [('ETH/BTC', 0.0873), ('ETH/USD', 924.99)]]
+        for p in jobs:
+            p.start()
+        for p in jobs:
+            p.join()
+        assert list(self.table.changed(versions)) == [0, 2]
+        assert self.table.read(0)[:3] == (0.0873, 1.0, 1518996767361)
+        assert self.table.read(2)[0] == 924.99
+        assert np.isnan(self.table.table[1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import json
+
+import ccxt.async as ccxt
+
+from thorn.orderbooks import UnifiedOrderBook, OrderBookMultiplexer
+from thorn.utils import get_serializer
+
+BOOK = {
+    'bids': [[0.0801, 2.0], [0.0800, 5.0]],
+    'asks': [[0.0803, 1.0], [0.0804, 3.0]],
+    'timestamp': 1518996767361,
+    'datetime': '2018-02-18T23:32:47.361Z'
+}
+
+class Message(object):
+    '''Minimal stand-in for a `confluent_kafka.Message` read by `consume`.'''
+    def __init__(self, topic, m):
+        self._topic = topic
+        self._value = m if isinstance(m, bytes) else json.dumps(m).encode('utf-8')
+
+    def error(self):
+        return None
+
+    def topic(self):
+        return self._topic
+
+    def value(self):
+        return self._value
+
+class OrderBookMultiplexerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.books = [UnifiedOrderBook('ETH/BTC', ccxt.gemini()),
+                      UnifiedOrderBook('ETH/BTC', ccxt.binance()),
+                      UnifiedOrderBook('LTC/BTC', ccxt.binance())]
+        self.multiplexer = OrderBookMultiplexer(self.books)
+
+    def tearDown(self):
+        pass
+
+    def test_routing(self):
+        assert len(self.multiplexer.topics()) == 2
+        msgs = []
+        for book in self.books:
+            m = dict(BOOK, exchange=book.exchange.id)
+            msgs.append(Message(book.topicstr, m))
+        # untracked exchange on a tracked topic
+        msgs.append(Message(self.books[0].topicstr, dict(BOOK, exchange='kraken')))
+        assert self.multiplexer.process(msgs)
+        for book in self.books:
+            assert book.best_bid() == [0.0801, 2.0]
+            assert self.multiplexer.seqs[(book.topicstr, book.exchange.id)] == 1
+
+    def test_shards(self):
+        self.multiplexer.coalesce = True
+        shards = self.multiplexer.shards(2)
+        assert all(s.coalesce for s in shards)
+        assert sum(len(s) for s in shards) == 3
+        for s in shards:
+            topics = s.topics()
+            for other in shards:
+                if other is not s:
+                    assert not set(topics) & set(other.topics())
+
+    def test_every_message(self):
+        book = self.books[0]
+        seen = []
+        self.multiplexer.add_book(book, on_message=lambda m, seq, book: seen.append((seq, m['bids'][0][0])))
+        msgs = []
+        for i, bid in enumerate([0.0790, 0.0810, 0.0805]):
+            m = dict(BOOK, exchange=book.exchange.id, timestamp=BOOK['timestamp'] + i*1000)
+            m['bids'] = [[bid, 1.0]]
+            msgs.append(Message(book.topicstr, m))
+        # without coalescing, e.g. for the recorder, every snapshot is routed
+        assert self.multiplexer.process(msgs)
+        self.assertEqual(seen, [(0, 0.0790), (1, 0.0810), (2, 0.0805)])
+
+    def test_latest_only(self):
+        self.multiplexer = OrderBookMultiplexer(self.books, coalesce=True)
+        book = self.books[0]
+        msgs = []
+        for i, bid in enumerate([0.0790, 0.0810, 0.0805]):
+            m = dict(BOOK, exchange=book.exchange.id, timestamp=BOOK['timestamp'] + i*1000)
+            m['bids'] = [[bid, 1.0]]
+            msgs.append(Message(book.topicstr, m))
+        # queued out of order: the newest snapshot wins
+        msgs[1], msgs[2] = msgs[2], msgs[1]
+        assert self.multiplexer.process(msgs)
+        assert book.best_bid() == [0.0805, 1.0]
+        assert self.multiplexer.seqs[(book.topicstr, book.exchange.id)] == 1
+
+    def test_binary_messages(self):
+        serializer = get_serializer('binary')
+        book = self.books[1]
+        m = dict(BOOK, exchange=book.exchange.id, symbol=book.pair)
+        assert self.multiplexer.process([Message(book.topicstr, serializer.dumps(m))])
+        assert book.best_bid() == [0.0801, 2.0]
+        assert book.best_ask() == [0.0803, 1.0]
+        assert book.latest_event_time == BOOK['datetime']
+
+    def test_deltas(self):
+        book = self.books[2]
+        key = (book.topicstr, book.exchange.id)
+        snapshot = dict(BOOK, exchange=book.exchange.id, seq=4, kind=0)
+        msgs = [Message(book.topicstr, dict(snapshot, seq=3, timestamp=BOOK['timestamp'] - 1000)),
+                Message(book.topicstr, snapshot),
+                Message(book.topicstr, {'exchange': book.exchange.id, 'seq': 5, 'kind': 1,
+                                        'datetime': None, 'bids': [[0.0801, 0.0]], 'asks': []}),
+                Message(book.topicstr, {'exchange': book.exchange.id, 'seq': 6, 'kind': 1,
+                                        'datetime': None, 'bids': [[0.0802, 1.0]], 'asks': []})]
+        assert self.multiplexer.process(msgs)
+        assert self.multiplexer.seqs[key] == 4
+        assert book.seq == 6
+        assert book.bids.inorder() == [[0.08, 5.0], [0.0802, 1.0]]
+
+
+if __name__ == '__main__':
+    unittest.main()
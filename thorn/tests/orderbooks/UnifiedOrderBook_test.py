@@ -10,6 +10,12 @@ import ccxt.async as ccxt
 from confluent_kafka import Consumer, KafkaError
 
 SYMBOL = 'ETH/BTC'
+BOOK = {
+    'bids': [[0.0801, 2.0], [0.0800, 5.0], [0.0799, 1.5]],
+    'asks': [[0.0803, 1.0], [0.0804, 3.0], [0.0806, 0.5]],
+    'timestamp': 1518996767361,
+    'datetime': '2018-02-18T23:32:47.361Z'
+}
 
 from thorn.api import UnifiedAPIManager
 from thorn.orderbooks import UnifiedOrderBook
@@ -51,6 +57,74 @@ class UnifiedOrderBookTest(unittest.TestCase):
         t1.join()
         self.assertEqual(2+2, 4)
 
+    def test_top_of_book(self):
+        ub = UnifiedOrderBook(SYMBOL, ccxt.binance())
+        assert ub.best_bid() is None
+        assert ub.spread() is None
+        ub.update_full_book(BOOK)
+        self.assertEqual(ub.best_bid(), [0.0801, 2.0])
+        self.assertEqual(ub.best_ask(), [0.0803, 1.0])
+        self.assertAlmostEqual(ub.spread(), 0.0002)
+        self.assertAlmostEqual(ub.mid(), 0.0802)
+
+    def test_depth(self):
+        ub = UnifiedOrderBook(SYMBOL, ccxt.binance())
+        ub.update_full_book(BOOK)
+        self.assertEqual(ub.depth('bids', 2), BOOK['bids'][:2])
+        self.assertEqual(ub.depth('asks', 5), BOOK['asks'])
+        self.assertEqual(ub.levels_until('asks', 0.0804), BOOK['asks'][:2])
+        self.assertEqual(ub.levels_until('bids', 0.08), BOOK['bids'][:2])
+        self.assertRaises(AttributeError, ub.depth, 'buys', 2)
+
+    def test_update_full_book_diff(self):
+        ub = UnifiedOrderBook(SYMBOL, ccxt.binance())
+        diff = ub.update_full_book(BOOK)
+        self.assertEqual(diff['bids']['added'], sorted(BOOK['bids']))
+        self.assertEqual(diff['asks']['removed'], [])
+
+        m = dict(BOOK)
+        m['bids'] = [[0.0802, 1.0], [0.0801, 2.0], [0.0799, 4.0]]
+        m['asks'] = [[0.0804, 3.0]]
+        diff = ub.update_full_book(m)
+        self.assertEqual(diff['bids'], {'added': [[0.0802, 1.0]],
+                                        'changed': [[0.0799, 4.0]],
+                                        'removed': [[0.08, 0.0]]})
+        self.assertEqual(diff['asks'], {'added': [],
+                                        'changed': [],
+                                        'removed': [[0.0803, 0.0], [0.0806, 0.0]]})
+        self.assertEqual(ub.depth('bids', 10), m['bids'])
+        self.assertEqual(ub.depth('asks', 10), m['asks'])
+        self.assertEqual(len(ub.bids), 3)
+
+    def test_monitor_batches(self):
+        class Message(object):
+            def __init__(self, m):
+                self.m = m
+            def error(self):
+                return None
+            def value(self):
+                return json.dumps(self.m).encode('utf-8')
+
+        class BatchConsumer(object):
+            def __init__(self, batches):
+                self.batches = batches
+            def consume(self, num_messages=1, timeout=-1):
+                return self.batches.pop(0) if self.batches else []
+
+        ub = UnifiedOrderBook(SYMBOL, ccxt.binance())
+        newer = dict(BOOK, exchange='binance', timestamp=BOOK['timestamp'] + 1000,
+                        bids=[[0.0802, 1.0]])
+        batch = [Message(newer), Message(dict(BOOK, exchange='binance')),
+                 Message(dict(BOOK, exchange='gemini', bids=[[0.09, 1.0]]))]
+        seqs = []
+        def on_message(m, seq=-1, **kwargs):
+            seqs.append(seq)
+            ub.update_full_book(m)
+        stop_at = datetime.datetime.utcnow()
+        ub.monitor_batches(BatchConsumer([batch]), on_message, stop_at, 10, 0.1)
+        self.assertEqual(seqs, [0])
+        self.assertEqual(ub.best_bid(), [0.0802, 1.0])
+
 
 
 if __name__ == '__main__':
@@ -18,6 +18,96 @@ class FuncThread(threading.Thread):
         self._target(*self._args)
 
 
+def snapshot(last_update_id, bids, asks):
+    return {'lastUpdateId': last_update_id,
+            'bids': [[str(p), str(q), []] for p, q in bids],
+            'asks': [[str(p), str(q), []] for p, q in asks]}
+
+def event(first_id, last_id, bids=[], asks=[]):
+    return {'e': 'depthUpdate', 'E': 1518996767361, 's': 'BNBBTC',
+            'U': first_id, 'u': last_id,
+            'b': [[str(p), str(q), []] for p, q in bids],
+            'a': [[str(p), str(q), []] for p, q in asks]}
+
+
+class BinanceBookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshots = []
+        self.book = BinanceBook('BNBBTC')
+        self.fetches = 0
+        self.book.api.depth = self.depth
+
+    def depth(self, pair, limit=100):
+        self.fetches += 1
+        return self.snapshots.pop(0) if self.snapshots else None
+
+    def tearDown(self):
+        pass
+
+    def test_buffer_until_snapshot(self):
+        book = self.book
+        book.update_book(event(90, 95, bids=[(1.0, 1.0)]))
+        book.update_book(event(96, 102, bids=[(1.1, 2.0)], asks=[(1.3, 1.0)]))
+        assert not book.synced
+        assert len(book.buffer) == 2
+        # the failed fetch is not retried before the backoff has passed
+        assert self.fetches == 1
+
+        self.snapshots.append(snapshot(100, [(1.0, 5.0), (0.9, 1.0)], [(1.2, 1.0), (1.3, 3.0)]))
+        book.last_fetch -= book.resync_backoff
+        book.update_book(event(103, 105, asks=[(1.2, 0.0)]))
+        assert book.synced
+        assert book.last_update_id == 105
+        self.assertEqual(book.bids.max(), [1.1, 2.0])
+        self.assertEqual(book.asks.inorder(), [[1.3, 1.0]])
+        self.assertEqual(book.bids.inorder(), [[0.9, 1.0], [1.0, 5.0], [1.1, 2.0]])
+
+    def test_resync_on_gap(self):
+        book = self.book
+        self.snapshots.append(snapshot(100, [(1.0, 5.0)], [(1.2, 1.0)]))
+        book.update_book(event(101, 101))
+        assert book.synced and book.last_update_id == 101
+
+        # updates 102-109 are lost
+        self.snapshots.append(snapshot(111, [(1.05, 1.0)], [(1.2, 4.0)]))
+        assert not book.update_book(event(110, 112, bids=[(1.06, 1.0)]))
+        assert book.synced
+        assert book.resyncs == 1
+        assert book.last_update_id == 112
+        self.assertEqual(book.bids.inorder(), [[1.05, 1.0], [1.06, 1.0]])
+        self.assertEqual(book.asks.inorder(), [[1.2, 4.0]])
+
+    def test_stale_snapshot(self):
+        book = self.book
+        self.snapshots.append(snapshot(50, [(1.0, 5.0)], [(1.2, 1.0)]))
+        book.update_book(event(60, 61))
+        assert not book.synced
+        self.snapshots.append(snapshot(60, [(1.0, 5.0)], [(1.2, 1.0)]))
+        for i in range(62, 70, 2):
+            book.update_book(event(i, i + 1))
+        assert not book.synced
+        assert self.fetches == 1
+        assert len(book.buffer) == 5
+
+        book.last_fetch -= book.resync_backoff
+        book.update_book(event(70, 71))
+        assert book.synced
+        assert self.fetches == 2
+        assert book.last_update_id == 71
+
+    def test_update_records(self):
+        book = self.book
+        self.snapshots.append(snapshot(100, [(1.0, 5.0)], [(1.2, 1.0)]))
+        header = {'exchange': 'binance', 'stream': 'depth_update', 'pair': 'BNBBTC',
+                  'stream_start': 101, 'stream_end': 102}
+        book.update_records([dict(header, side='bid', price='1.1', quantity='1.0'),
+                             dict(header, side='ask', price='1.2', quantity='0.0')])
+        assert book.last_update_id == 102
+        self.assertEqual(book.bids.max(), [1.1, 1.0])
+        assert book.asks.min() is None
+
+
 class BinanceOrderBookTest(unittest.TestCase):
 
     def setUp(self):
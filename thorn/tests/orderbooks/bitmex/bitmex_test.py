@@ -0,0 +1,54 @@
+import unittest
+
+from thorn.orderbooks import BitmexBook
+from thorn.api.exchanges import BitmexSocket
+
+PARTIAL = {'table': 'orderBookL2', 'action': 'partial', 'data': [
+    {'symbol': 'XBTUSD', 'id': 8799100000, 'side': 'Sell', 'size': 30, 'price': 9000.5},
+    {'symbol': 'XBTUSD', 'id': 8799100050, 'side': 'Sell', 'size': 20, 'price': 9000.0},
+    {'symbol': 'XBTUSD', 'id': 8799100100, 'side': 'Buy', 'size': 10, 'price': 8999.5},
+    {'symbol': 'XBTUSD', 'id': 8799100150, 'side': 'Buy', 'size': 40, 'price': 8999.0}]}
+
+
+class BitmexBookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.book = BitmexBook('XBTUSD')
+        self.book.update_book(PARTIAL)
+
+    def tearDown(self):
+        pass
+
+    def test_partial(self):
+        self.assertEqual(self.book.bids.max(), [8999.5, 10])
+        self.assertEqual(self.book.asks.min(), [9000.0, 20])
+        assert len(self.book.index) == 4
+
+    def test_update_delete_insert(self):
+        book = self.book
+        book.update_book({'table': 'orderBookL2', 'action': 'update', 'data': [
+            {'symbol': 'XBTUSD', 'id': 8799100100, 'side': 'Buy', 'size': 15}]})
+        self.assertEqual(book.bids.max(), [8999.5, 15])
+        book.update_book({'table': 'orderBookL2', 'action': 'delete', 'data': [
+            {'symbol': 'XBTUSD', 'id': 8799100050, 'side': 'Sell'}]})
+        self.assertEqual(book.asks.inorder(), [[9000.5, 30]])
+        book.update_book({'table': 'orderBookL2', 'action': 'insert', 'data': [
+            {'symbol': 'XBTUSD', 'id': 8799100075, 'side': 'Sell', 'size': 5, 'price': 8999.75}]})
+        self.assertEqual(book.asks.min(), [8999.75, 5])
+        missed = book.update_book({'table': 'orderBookL2', 'action': 'update', 'data': [
+            {'symbol': 'XBTUSD', 'id': 1, 'side': 'Buy', 'size': 15}]})
+        assert missed == 1
+
+    def test_update_records(self):
+        socket = BitmexSocket('depth', 'XBTUSD')
+        book = BitmexBook('XBTUSD')
+        book.update_records(socket.translate_order_book_l2(PARTIAL))
+        self.assertEqual(book.bids.inorder(), self.book.bids.inorder())
+        update = {'table': 'orderBookL2', 'action': 'delete', 'data': [
+            {'symbol': 'XBTUSD', 'id': 8799100150, 'side': 'Buy'}]}
+        book.update_records(socket.translate_order_book_l2(update))
+        self.assertEqual(book.bids.inorder(), [[8999.5, 10]])
+
+
+if __name__ == '__main__':
+    unittest.main()
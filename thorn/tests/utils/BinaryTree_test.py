@@ -0,0 +1,59 @@
+import unittest
+import random
+
+from thorn.utils import BinaryTree
+
+class BinaryTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_min_max(self):
+        tree = BinaryTree()
+        assert tree.min() is None
+        assert tree.max() is None
+
+        rng = random.Random(0)
+        prices = set()
+        for _ in range(3000):
+            price = rng.randint(0, 500)
+            if rng.random() < 0.4:
+                tree.remove(price)
+                prices.discard(price)
+            else:
+                tree.insert(price, 1.0, replace=True)
+                prices.add(price)
+            assert len(tree) == len(prices)
+            if prices:
+                assert tree.min() == [min(prices), 1.0]
+                assert tree.max() == [max(prices), 1.0]
+            else:
+                assert tree.min() is None
+                assert tree.max() is None
+
+    def test_remove_root(self):
+        tree = BinaryTree([(1, 1), (2, 2)])
+        tree.remove(1)
+        assert tree.root.price == 2
+        assert tree.root.parent is None
+        assert tree.min() == [2, 2]
+        assert tree.inorder() == [[2, 2]]
+
+    def test_bounded_iterators(self):
+        tree = BinaryTree([(p, 1.0) for p in range(100)])
+        assert list(tree.ascending()) == tree.inorder()
+        assert list(tree.descending()) == tree.inorder()[::-1]
+        assert list(tree.ascending(n=3)) == [[0, 1.0], [1, 1.0], [2, 1.0]]
+        assert list(tree.descending(n=2)) == [[99, 1.0], [98, 1.0]]
+        assert [l[0] for l in tree.ascending(price=4)] == [0, 1, 2, 3, 4]
+        assert [l[0] for l in tree.descending(price=97.5)] == [99, 98]
+        assert [l[0] for l in tree.descending(quantity=2.5)] == [99, 98, 97]
+        assert list(BinaryTree().ascending()) == []
+
+
+
+if __name__ == '__main__':
+    unittest.main()
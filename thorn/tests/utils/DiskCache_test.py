@@ -0,0 +1,56 @@
+import unittest
+import os
+import time
+import tempfile
+import multiprocessing
+
+from thorn.utils import DiskCache
+
+
+def write(directory, i):
+    cache = DiskCache(directory)
+    for j in range(50):
+        cache.set('markets', {'writer': i, 'values': list(range(1000))})
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(os.path.join(self.tmp.name, 'cache'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_set(self):
+        assert self.cache.get('binance') is None
+        self.cache.set('binance', {'ETH/BTC': 1}, etag='"abc"')
+        entry = self.cache.get('binance')
+        self.assertEqual(entry['value'], {'ETH/BTC': 1})
+        self.assertEqual(entry['etag'], '"abc"')
+        # another instance on the same directory sees the entry
+        self.assertEqual(DiskCache(self.cache.directory).get('binance')['value'], {'ETH/BTC': 1})
+        self.cache.delete('binance')
+        assert self.cache.get('binance') is None
+
+    def test_ttl_and_version(self):
+        self.cache.set('binance', 1, stored_at=time.time() - 10)
+        assert self.cache.get('binance', ttl=5) is None
+        self.assertEqual(self.cache.get('binance', ttl=20)['value'], 1)
+        assert DiskCache(self.cache.directory, version=2).get('binance') is None
+
+    def test_concurrent_writes(self):
+        jobs = [multiprocessing.Process(target=write, args=(self.cache.directory, i)) for i in range(4)]
+        for p in jobs:
+            p.start()
+        for i in range(200):
+            entry = self.cache.get('markets')
+            # readers never see a partial write
+            assert entry is None or len(entry['value']['values']) == 1000
+        for p in jobs:
+            p.join()
+        self.assertEqual(len(os.listdir(self.cache.directory)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import random
+
+from thorn.utils import BinaryTree, PriceLevelBook
+
+class PriceLevelBookTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_basics(self):
+        book = PriceLevelBook([(3, 4), (1, 2), (5, 6)])
+        assert len(book) == 3
+        assert book.min() == [1, 2]
+        assert book.max() == [5, 6]
+
+        book.insert(1, 7)
+        assert book.find(1) == [2, 7]
+        book.insert(1, 8, replace=True)
+        assert book.find(1) == [8]
+
+        book.remove(3)
+        assert len(book) == 2
+        assert book.find(3) is None
+        book.remove(3)
+        assert book.inorder() == [[1, 8], [5, 6]]
+
+    def test_matches_binary_tree(self):
+        rng = random.Random(0)
+        tree = BinaryTree()
+        book = PriceLevelBook()
+        for _ in range(2000):
+            price = rng.randint(0, 200) / 100
+            if rng.random() < 0.3:
+                tree.remove(price)
+                book.remove(price)
+            else:
+                quantity = rng.random()
+                tree.insert(price, quantity, replace=True)
+                book.insert(price, quantity, replace=True)
+        assert book.inorder() == tree.inorder()
+        assert book.min() == tree.min()
+        assert book.max() == tree.max()
+        assert list(book.ascending(n=5)) == list(tree.ascending(n=5))
+        assert list(book.descending(quantity=3.0)) == list(tree.descending(quantity=3.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import time
+
+import asyncio
+
+from thorn.utils import TokenBucket, get_bucket, stalest
+from thorn.utils import RateLimiter
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        RateLimiter.BUCKETS.clear()
+
+    def test_acquire(self):
+        bucket = TokenBucket(20, capacity=5)
+        self.assertEqual(bucket.budget(), 5)
+        t = time.monotonic()
+        for i in range(10):
+            bucket.acquire()
+        # the burst of 5 is free, the next 5 calls are paced at 20 per second
+        assert 0.2 <= time.monotonic() - t < 0.4
+        self.assertEqual(bucket.budget(), 0)
+
+    def test_wait(self):
+        loop = asyncio.get_event_loop()
+        bucket = TokenBucket(50, capacity=1)
+        done = []
+
+        async def call(i):
+            await bucket.wait()
+            done.append(i)
+
+        t = time.monotonic()
+        loop.run_until_complete(asyncio.gather(*[call(i) for i in range(6)]))
+        # waiting callers are served in order at the bucket rate
+        self.assertEqual(done, list(range(6)))
+        assert 0.09 <= time.monotonic() - t < 0.2
+
+    def test_get_bucket(self):
+        # 1200 per minute in the binance config, 20 per second
+        bucket = get_bucket('binance')
+        self.assertAlmostEqual(bucket.rate, 20)
+        assert get_bucket('binance') is bucket
+        # the slowest of the config and the ccxt rate limit wins
+        self.assertAlmostEqual(get_bucket('bitmex', rate_limit=2000).rate, 0.5)
+        self.assertAlmostEqual(get_bucket('kraken', call_limit=30, per='minute').rate, 0.5)
+        assert get_bucket('unknown') is None
+        self.assertRaises(KeyError, get_bucket, 'other', call_limit=1, per='week')
+
+    def test_stalest(self):
+        last_fetched = {'ETH/BTC': 3.0, 'LTC/BTC': 1.0, 'XRP/BTC': 2.0}
+        symbols = ['ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'BCH/BTC']
+        self.assertEqual(stalest(symbols, last_fetched, 2), ['BCH/BTC', 'LTC/BTC'])
+        self.assertEqual(stalest(symbols, last_fetched, 10), ['BCH/BTC', 'LTC/BTC', 'XRP/BTC', 'ETH/BTC'])
+        self.assertEqual(stalest(symbols, last_fetched, 0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import time
+import tempfile
+
+from thorn.utils import ResponseCache, DiskCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        cache.store('a', 1)
+        cache.store('b', 2)
+        cache.lookup('a')
+        cache.store('c', 3)
+        # b was the least recently used
+        assert 'b' not in cache
+        self.assertEqual([cache.lookup(k)['value'] for k in ['a', 'c']], [1, 3])
+
+    def test_copies(self):
+        cache = ResponseCache()
+        value = {'symbols': ['ETHBTC', 'LTCBTC']}
+        entry = cache.store('a', value)
+        value['symbols'].pop()
+        cached = cache.value(cache.lookup('a'))
+        self.assertEqual(cached, {'symbols': ['ETHBTC', 'LTCBTC']})
+        # changing a returned value does not change the cache
+        cached['symbols'].pop()
+        self.assertEqual(cache.value(cache.lookup('a')), {'symbols': ['ETHBTC', 'LTCBTC']})
+
+    def test_fresh(self):
+        cache = ResponseCache()
+        entry = cache.store('a', 1, etag='"v1"', last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+        assert cache.fresh(entry, 10)
+        entry['stored_at'] -= 20
+        assert not cache.fresh(entry, 10)
+        self.assertEqual(cache.headers(entry), {'If-None-Match': '"v1"',
+                                                'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        assert cache.fresh(cache.touch('a', entry), 10)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(disk=DiskCache(tmp))
+            other = ResponseCache(disk=DiskCache(tmp))
+            cache.store('a', 1)
+            # another process finds the entry on disk
+            self.assertEqual(other.lookup('a', 10)['value'], 1)
+            stale = other.lookup('a')
+            stale['stored_at'] -= 20
+            cache.store('a', 2)
+            # a stale entry in memory is replaced by a fresher one on disk
+            self.assertEqual(other.lookup('a', 10)['value'], 2)
+
+    def test_disk_error(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = DiskCache(tmp)
+            cache = ResponseCache(disk=disk)
+
+            def full(key, value, **meta):
+                raise OSError(28, 'No space left on device')
+            disk.set = full
+            # the entry is kept in memory
+            self.assertEqual(cache.store('a', 1)['value'], 1)
+            self.assertEqual(cache.lookup('a', 10)['value'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
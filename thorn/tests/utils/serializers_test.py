@@ -0,0 +1,60 @@
+import unittest
+import json
+
+import numpy as np
+
+from thorn.utils import get_serializer, deserialize
+
+BOOK = {
+    'bids': [[0.0801, 2.0], [0.0800, 5.0], [0.0799, 1.5]],
+    'asks': [[0.0803, 1.0, 3], [0.0804, 3.0, 1]],
+    'timestamp': 1518996767361,
+    'datetime': '2018-02-18T23:32:47.361Z',
+    'nonce': None,
+    'exchange': 'binance',
+    'symbol': 'ETH/BTC'
+}
+
+class SerializersTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_binary(self):
+        s = get_serializer('binary')
+        b = s.dumps(BOOK, seq=7)
+        assert len(b) < len(json.dumps(BOOK))
+        m = s.loads(b)
+        assert m['exchange'] == 'binance'
+        assert m['symbol'] == 'ETH/BTC'
+        assert m['seq'] == 7
+        assert m['timestamp'] == BOOK['timestamp']
+        assert m['datetime'] == BOOK['datetime']
+        assert m['bids'].tolist() == BOOK['bids']
+        assert m['asks'].tolist() == [l[:2] for l in BOOK['asks']]
+
+        empty = dict(BOOK, bids=[], timestamp=None, symbol=None)
+        m = deserialize(s.dumps(empty))
+        assert m['bids'].shape == (0, 2)
+        assert m['timestamp'] is None and m['datetime'] is None
+        assert m['symbol'] == ''
+
+    def test_extra_fields(self):
+        s = get_serializer('binary')
+        # levels carrying a non-numeric order id after the price and quantity
+        book = dict(BOOK, bids=[[0.0801, 2.0, 'a1'], [0.0800, 5.0, 'b2']], asks=[[0.0803, 1.0, 'x']])
+        m = s.loads(s.dumps(book))
+        assert m['bids'].tolist() == [[0.0801, 2.0], [0.0800, 5.0]]
+        assert m['asks'].tolist() == [[0.0803, 1.0]]
+
+    def test_fallback(self):
+        b = get_serializer('json').dumps(BOOK).encode('utf-8')
+        assert deserialize(b) == BOOK
+        self.assertRaises(AttributeError, get_serializer, 'xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+
+import asyncio
+import ccxt.async as ccxt
+
+from thorn.utils import instantiate_exchanges, load_markets, DiskCache
+
+MARKETS = {
+    'ETH/BTC': {'id': 'ETHBTC', 'symbol': 'ETH/BTC', 'base': 'ETH', 'quote': 'BTC',
+                'baseId': 'ETH', 'quoteId': 'BTC', 'active': True, 'spot': True, 'type': 'spot',
+                'precision': {'amount': 3, 'price': 6}, 'limits': {}, 'info': {}},
+}
+
+
+class FakeExchange(object):
+    id = 'fake'
+
+    def __init__(self):
+        self.loads = 0
+        self.markets = None
+        self.currencies = {}
+
+    async def load_markets(self):
+        self.loads += 1
+        self.markets = dict(MARKETS)
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies
+
+
+class UtilsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_markets(self):
+        loop = asyncio.get_event_loop()
+        first, second = FakeExchange(), FakeExchange()
+        loop.run_until_complete(load_markets(first, self.cache, ttl=60))
+        markets = loop.run_until_complete(load_markets(second, self.cache, ttl=60))
+        # the second process reads the markets stored by the first one
+        self.assertEqual((first.loads, second.loads), (1, 0))
+        self.assertEqual(markets, MARKETS)
+        third = FakeExchange()
+        loop.run_until_complete(load_markets(third, self.cache, ttl=0))
+        self.assertEqual(third.loads, 1)
+
+    def test_instantiate_exchanges(self):
+        self.cache.set('markets:binance:{}'.format(ccxt.__version__), {'markets': MARKETS, 'currencies': None})
+        exchanges = instantiate_exchanges(['binance', 'not_an_exchange'], cache_dir=self.tmp.name, ttl=60)
+        self.assertEqual(list(exchanges), ['binance'])
+        self.assertEqual(exchanges['binance'].symbols, ['ETH/BTC'])
+        self.assertEqual(exchanges['binance'].markets['ETH/BTC']['id'], 'ETHBTC')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,26 @@
 import random
 import math
 
+def bounded_levels(levels, n=None, price=None, quantity=None, descending=False):
+    """ Yield from an iterable of [price, *quantities] levels ordered from the
+    best price, stopping after n levels, once a level is past price, or once
+    the cumulative quantity reaches quantity (that level is still yielded)
+    """
+    count = 0
+    total = 0.0
+    for level in levels:
+        if n is not None and count >= n:
+            return
+        if price is not None:
+            if (level[0] < price) if descending else (level[0] > price):
+                return
+        yield level
+        count += 1
+        if quantity is not None:
+            total += sum(level[1:])
+            if total >= quantity:
+                return
+
 class NodeKey(object):
     def __init__(self, price):
         # self.quantity = quantity
@@ -232,10 +252,13 @@ class Node(object):
 
 class BinaryTree(object):
     """ Binary Search Tree
-    Uses AVL Tree
+    Uses AVL Tree. The nodes holding the smallest and largest keys are cached
+    so that the top of the book can be read without traversing the tree.
     """
     def __init__(self, *args):
         self.root = None  # root Node
+        self.min_node = None  # Node with the smallest key
+        self.max_node = None  # Node with the largest key
         self.element_count = 0
         if len(args) == 1:
             for i in args[0]:
@@ -264,13 +287,22 @@ class BinaryTree(object):
     def insert(self, price, quantity, replace=False):
         if self.root is None:
             # If nothing in tree
+            self.element_count += 1
             self.root = Node(price, quantities=[quantity])
+            self.min_node = self.root
+            self.max_node = self.root
         else:
             n = self.find(price)
             if n is None:
                 # If key/quantity pair doesn't exist in tree
                 self.element_count += 1
-                self.add_as_child(self.root, Node(price, quantities=[quantity]))
+                n = Node(price, quantities=[quantity])
+                self.add_as_child(self.root, n)
+                # rotations keep the key order, so only a new extreme moves the cache
+                if n.key < self.min_node.key:
+                    self.min_node = n
+                if n.key > self.max_node.key:
+                    self.max_node = n
             else:
                 if replace:
                     n.quantities = [quantity]
@@ -397,6 +429,10 @@ class BinaryTree(object):
         if not node is None:
             if quantity is None:
                 self.element_count -= 1
+                if node is self.min_node:
+                    self.min_node = node.next()
+                if node is self.max_node:
+                    self.max_node = node.previous()
 
                 if node.is_leaf():
                     # The node is a leaf.  Remove it and return.
@@ -446,6 +482,10 @@ class BinaryTree(object):
                 assert node.right_child
                 node.right_child.parent = parent
             parent.update_height()
+        else:
+            # The node is the root, promote its only child
+            self.root = node.right_child or node.left_child
+            self.root.parent = None
 
         # rebalance
         node = parent
@@ -520,19 +560,70 @@ class BinaryTree(object):
         else:
             return start_node.out()
 
+    def ascending(self, n=None, price=None, quantity=None):
+        """ Lazily yield levels from the smallest price upwards via Node.next()
+        See bounded_levels for the stopping conditions. The tree must not be
+        modified while the generator is in use.
+        """
+        def walk():
+            node = self.min_node
+            while node is not None:
+                yield [node.key.price, *node.quantities]
+                node = node.next()
+        return bounded_levels(walk(), n=n, price=price, quantity=quantity)
+
+    def descending(self, n=None, price=None, quantity=None):
+        """ Lazily yield levels from the largest price downwards via Node.previous()
+        See bounded_levels for the stopping conditions. The tree must not be
+        modified while the generator is in use.
+        """
+        def walk():
+            node = self.max_node
+            while node is not None:
+                yield [node.key.price, *node.quantities]
+                node = node.previous()
+        return bounded_levels(walk(), n=n, price=price, quantity=quantity, descending=True)
+
+    def level(self, node):
+        """ Return the [price, *quantities] entry of node, as in the traversals
+        """
+        if len(node.quantities) > 0:
+            return [node.key.price, *node.quantities]
+        return node.key.price
+
+    def max_node_in_subtree(self, node):
+        while node.right_child is not None:
+            node = node.right_child
+        return node
+
+    def min_node_in_subtree(self, node):
+        while node.left_child is not None:
+            node = node.left_child
+        return node
+
     def max(self, start_node=None):
+        """ Return the largest level of the tree, or of the subtree at start_node
+        O(1) for the whole tree, O(log n) for a subtree. None if empty.
+        """
         if start_node is None:
-            io = self.inorder(self.root)
+            node = self.max_node
         else:
-            io = self.inorder(start_node)
-        return io[len(io)-1]
+            node = self.max_node_in_subtree(start_node)
+        if node is None:
+            return None
+        return self.level(node)
 
     def min(self, start_node=None):
+        """ Return the smallest level of the tree, or of the subtree at start_node
+        O(1) for the whole tree, O(log n) for a subtree. None if empty.
+        """
         if start_node is None:
-            io = self.inorder(self.root)
+            node = self.min_node
         else:
-            io = self.inorder(start_node)
-        return io[0]
+            node = self.min_node_in_subtree(start_node)
+        if node is None:
+            return None
+        return self.level(node)
 
 
 def test():
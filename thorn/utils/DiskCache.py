@@ -0,0 +1,76 @@
+import os
+import time
+import json
+import hashlib
+import tempfile
+
+
+class DiskCache(object):
+    '''A key-value store of JSON documents on disk, shared by every process
+    using the same directory. Every key is stored in its own file, written to a
+    temporary file first and then moved in place with `os.replace`, so readers
+    in other processes see either the previous value or the new one, never a
+    partial write.
+
+    Args:
+        directory (str): The directory of the cache. It is created if it does
+            not exist. `~` is expanded.
+        version (int, optional): The version of the stored documents. Entries
+            written with another version are treated as missing, so a change of
+            format invalidates the whole cache.
+    '''
+    def __init__(self, directory, version=1):
+        self.directory = os.path.expanduser(directory)
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key, ttl=None):
+        '''Returns the entry stored under `key`.
+
+        Args:
+            key (str): The key.
+            ttl (float, optional): The maximum age of the entry in seconds.
+
+        Returns:
+            dict: The entry, with the stored `value`, the `stored_at` time and
+                any metadata it was stored with, or None if it is missing,
+                expired, unreadable or of another version.
+        '''
+        try:
+            with open(self.path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('version') != self.version or entry.get('key') != key:
+            return None
+        if ttl is not None and time.time() - entry['stored_at'] > ttl:
+            return None
+        return entry
+
+    def set(self, key, value, stored_at=None, **meta):
+        '''Atomically stores `value` under `key`, with the `meta` fields.
+
+        Returns:
+            dict: The stored entry.
+        '''
+        entry = dict(meta, key=key, value=value, version=self.version,
+                     stored_at=time.time() if stored_at is None else stored_at)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self.path(key))
+        except Exception:
+            os.remove(tmp)
+            raise
+        return entry
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
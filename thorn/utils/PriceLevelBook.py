@@ -0,0 +1,124 @@
+from bisect import bisect_left, insort
+
+from .BinaryTree import bounded_levels
+
+class PriceLevelBook(object):
+    ''' Sorted price-level container
+    Keeps the prices of the book in a sorted Python list and the quantities of
+    each level in a dict keyed by price. This exposes the same insert/remove/
+    min/max/inorder interface as `BinaryTree`, so it may be used in its place
+    by `UnifiedOrderBook`, but without allocating a `Node` and `NodeKey` per
+    level or recursing on every insert: looking up an existing level is a
+    single dict access and new levels are placed with a binary search.
+
+    Sorted NumPy price/quantity arrays were considered for the layout as well,
+    but every new level would then reallocate both arrays, which is slower than
+    a list insert for the per-level updates coming off the socket streams.
+
+    Args:
+        - levels (iterable, optional): An iterable of (price, quantity) pairs
+            with which to initialize the book.
+    '''
+    def __init__(self, *args):
+        self.prices = []
+        self.levels = {}
+        if len(args) == 1:
+            for i in args[0]:
+                self.insert(i[0], i[1])
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __contains__(self, price):
+        return price in self.levels
+
+    def __str__(self):
+        return str(self.inorder())
+
+    @property
+    def element_count(self):
+        return len(self.prices)
+
+    def insert(self, price, quantity, replace=False):
+        '''Adds `quantity` at the level `price`. If the level already exists the
+        quantity is appended to it, or overwrites it when `replace` is set.
+
+        Args:
+            - price (float): The price of the level.
+            - quantity (float): The quantity at `price`.
+            - replace (bool, optional): Whether to overwrite the quantities of
+                an existing level.
+
+        Returns: None.
+        '''
+        quantities = self.levels.get(price)
+        if quantities is None:
+            insort(self.prices, price)
+            self.levels[price] = [quantity]
+        elif replace:
+            self.levels[price] = [quantity]
+        else:
+            quantities.append(quantity)
+
+    def remove(self, price, quantity=None):
+        '''Removes the level `price` from the book. If `quantity` is given, only
+        that quantity is removed from the level, as in `BinaryTree.remove`.
+
+        Args:
+            - price (float): The price of the level.
+            - quantity (float, optional): A single quantity to remove.
+
+        Returns: None.
+        '''
+        quantities = self.levels.get(price)
+        if quantities is None:
+            return None
+        if quantity is None:
+            del self.levels[price]
+            del self.prices[bisect_left(self.prices, price)]
+        else:
+            quantities.remove(quantity)
+
+    def find(self, price):
+        '''Returns the list of quantities at `price`, or None if there is no
+        such level.
+        '''
+        return self.levels.get(price)
+
+    def clear(self):
+        self.prices = []
+        self.levels = {}
+
+    def level(self, price):
+        return [price, *self.levels[price]]
+
+    def inorder(self):
+        levels = self.levels
+        return [[p, *levels[p]] for p in self.prices]
+
+    def ascending(self, n=None, price=None, quantity=None):
+        '''Lazily yields levels from the lowest price upwards. See
+        `bounded_levels` for the stopping conditions.
+        '''
+        levels = (self.level(p) for p in self.prices)
+        return bounded_levels(levels, n=n, price=price, quantity=quantity)
+
+    def descending(self, n=None, price=None, quantity=None):
+        '''Lazily yields levels from the highest price downwards. See
+        `bounded_levels` for the stopping conditions.
+        '''
+        levels = (self.level(p) for p in reversed(self.prices))
+        return bounded_levels(levels, n=n, price=price, quantity=quantity, descending=True)
+
+    def as_list(self, pre_in_post=1):
+        return self.inorder()
+
+    def max(self):
+        if not self.prices:
+            return None
+        return self.level(self.prices[-1])
+
+    def min(self):
+        if not self.prices:
+            return None
+        return self.level(self.prices[0])
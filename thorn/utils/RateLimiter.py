@@ -0,0 +1,144 @@
+import time
+import importlib
+import threading
+
+import asyncio
+
+PER_SECONDS = {'second': 1.0, 'minute': 60.0, 'hour': 3600.0, 'day': 86400.0}
+
+class TokenBucket(object):
+    '''A token bucket holding the request budget of one exchange. Tokens are
+    refilled continuously at `rate` per second up to `capacity`, and every
+    request takes one. A request that finds the bucket empty reserves its token
+    anyway and waits for it to be refilled, so concurrent callers are served in
+    the order they asked and the rate is never exceeded.
+
+    The bucket is shared by threads and coroutines: `acquire` blocks the
+    calling thread, `wait` only suspends the calling coroutine.
+
+    Args:
+        rate (float): The number of requests allowed per second.
+        capacity (float, optional): The largest burst of requests. Defaults to
+            one second worth of requests, and at least 1.
+    '''
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive, got {}'.format(rate))
+        self.rate = float(rate)
+        self.capacity = float(max(rate, 1) if capacity is None else capacity)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last)*self.rate)
+        self.last = now
+
+    def budget(self):
+        '''Returns the number of requests that can be sent right now without
+        waiting.
+        '''
+        with self.lock:
+            self.refill()
+            return max(int(self.tokens), 0)
+
+    def reserve(self, n=1):
+        '''Takes `n` tokens from the bucket, going into debt if needed.
+
+        Returns:
+            float: The time in seconds to wait before sending the request.
+        '''
+        with self.lock:
+            self.refill()
+            self.tokens -= n
+            return max(-self.tokens / self.rate, 0.0)
+
+    def acquire(self, n=1):
+        '''Blocks the calling thread until `n` requests may be sent.'''
+        delay = self.reserve(n)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait(self, n=1):
+        '''Suspends the calling coroutine until `n` requests may be sent.
+
+        ASYNC
+        '''
+        delay = self.reserve(n)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+BUCKETS = {}
+
+def config_rate(call_limit, per='second'):
+    '''Converts the `call_limit` and `per` fields of an exchange config into a
+    number of requests per second.
+
+    Raises:
+        KeyError: If `per` is not a known period.
+    '''
+    return call_limit / PER_SECONDS[per]
+
+def exchange_config(name):
+    '''Returns the `API_CONFIG` of the thorn client of exchange `name`, or None
+    if there is no such client.
+    '''
+    try:
+        module = importlib.import_module('thorn.api.exchanges.{}.config'.format(name))
+    except ImportError:
+        return None
+    return getattr(module, 'API_CONFIG', None)
+
+def get_bucket(name, call_limit=None, per='second', rate_limit=None):
+    '''Returns the token bucket of exchange `name`, creating it on first use.
+    The bucket is shared by every client of the exchange in the process, so the
+    thorn `PublicExchange` clients and the ccxt instances draw from the same
+    budget. The rate is the slowest of the `call_limit`/`per` limit, the limit
+    declared in the thorn config of the exchange, and the ccxt `rateLimit`.
+
+    Args:
+        name (str): The exchange id. Ex: 'binance'
+        call_limit (float, optional): The number of calls allowed per `per`.
+        per (str, optional): 'second', 'minute', 'hour' or 'day'.
+        rate_limit (float, optional): The minimum time between two calls in ms,
+            as in the ccxt `rateLimit` attribute.
+
+    Returns:
+        TokenBucket: The bucket, or None if no limit is known for the exchange.
+    '''
+    if name in BUCKETS:
+        return BUCKETS[name]
+    rates = []
+    if call_limit is not None:
+        rates.append(config_rate(call_limit, per))
+    api_config = exchange_config(name)
+    if api_config is not None and 'call_limit' in api_config:
+        rates.append(config_rate(api_config['call_limit'], api_config.get('per', 'second')))
+    if rate_limit:
+        rates.append(1e3 / rate_limit)
+    if len(rates) == 0:
+        return None
+    BUCKETS[name] = TokenBucket(min(rates))
+    return BUCKETS[name]
+
+def exchange_bucket(exchange):
+    '''Returns the token bucket of a ccxt exchange (see `get_bucket`).'''
+    return get_bucket(exchange.id, rate_limit=getattr(exchange, 'rateLimit', None))
+
+def stalest(symbols, last_fetched, n):
+    '''Returns at most `n` of `symbols`, the ones fetched the longest time ago
+    first. Symbols missing from `last_fetched` have never been fetched and come
+    before all the others.
+
+    Args:
+        symbols (list[str]): The candidate symbols.
+        last_fetched (dict): The time of the last fetch of each symbol.
+        n (int): The number of symbols to return.
+
+    Returns:
+        list[str]
+    '''
+    if n <= 0:
+        return []
+    return sorted(symbols, key=lambda s: last_fetched.get(s, float('-inf')))[:n]
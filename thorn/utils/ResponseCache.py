@@ -0,0 +1,114 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+    '''An LRU cache of API responses, optionally backed by a `DiskCache` shared
+    with other processes. Entries keep the `ETag` and `Last-Modified` headers
+    of their response, so that an expired entry can be revalidated with a
+    conditional request instead of downloaded again.
+
+    The cache does not decide how long entries stay valid, the time to live is
+    passed by the caller on every lookup (see `PublicExchange.get`).
+
+    The cache keeps its own copy of every stored value, and `value` returns a
+    copy of it, so callers may modify the responses they get.
+
+    Args:
+        max_size (int, optional): The number of entries kept in memory. The
+            least recently used entry is evicted first.
+        disk (DiskCache, optional): The on-disk store. Entries missing or
+            expired in memory are looked up there, and every stored entry is
+            written there as well.
+    '''
+    def __init__(self, max_size=256, disk=None):
+        self.max_size = max_size
+        self.disk = disk
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def lookup(self, key, ttl=None):
+        '''Returns the most recent entry of `key`, from memory or, if it is
+        missing or older than `ttl` there, from disk. The entry may be expired,
+        see `fresh`.
+
+        Returns:
+            dict: The entry, with `value`, `stored_at`, `etag` and
+                `last_modified` fields, or None.
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if self.disk is not None and (entry is None or not self.fresh(entry, ttl)):
+            stored = self.disk.get(key)
+            if stored is not None and (entry is None or stored['stored_at'] > entry['stored_at']):
+                entry = stored
+                self.remember(key, entry)
+        return entry
+
+    def fresh(self, entry, ttl):
+        return ttl is None or time.time() - entry['stored_at'] <= ttl
+
+    def store(self, key, value, etag=None, last_modified=None):
+        '''Stores the response `value` of `key` with its validators. If it
+        cannot be written to disk, it is still stored in memory.
+
+        Returns:
+            dict: The stored entry.
+        '''
+        value = copy.deepcopy(value)
+        entry = {'key': key, 'value': value, 'stored_at': time.time(),
+                 'etag': etag, 'last_modified': last_modified}
+        if self.disk is not None:
+            try:
+                entry = self.disk.set(key, value, stored_at=entry['stored_at'], etag=etag,
+                                      last_modified=last_modified)
+            except (OSError, TypeError, ValueError) as e:
+                print('Could not cache {} on disk:'.format(key), e)
+        self.remember(key, entry)
+        return entry
+
+    def value(self, entry):
+        '''Returns a copy of the value of `entry`.'''
+        return copy.deepcopy(entry['value'])
+
+    def touch(self, key, entry):
+        '''Marks `entry` as fresh again, after the server confirmed it did not
+        change.
+
+        Returns:
+            dict: The refreshed entry.
+        '''
+        return self.store(key, entry['value'], etag=entry.get('etag'),
+                          last_modified=entry.get('last_modified'))
+
+    def headers(self, entry):
+        '''Returns the conditional request headers revalidating `entry`.'''
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get('etag') is not None:
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified') is not None:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -1,3 +1,8 @@
 from .BinaryTree import BinaryTree
+from .PriceLevelBook import PriceLevelBook
 from .Printer import Printer
 from .utils import *
+from .serializers import JSONSerializer, BinarySerializer, get_serializer, deserialize
+from .RateLimiter import TokenBucket, get_bucket, exchange_bucket, exchange_config, stalest
+from .DiskCache import DiskCache
+from .ResponseCache import ResponseCache
@@ -0,0 +1,138 @@
+'''Serializers for the order book messages published to Kafka.
+
+The binary format is a fixed little-endian header followed by the exchange and
+symbol strings, padding to an 8-byte boundary, and the bids and asks as
+contiguous float64 [price, quantity] arrays. The kind is either `SNAPSHOT`, a
+full book, or `DELTA`, the levels changed since the previous message of the
+same exchange and symbol, where a quantity of 0 removes the level:
+
+    magic (4s) | version (B) | kind (B) | reserved (H) | seq (q) | timestamp (q)
+    | exchange length (H) | symbol length (H) | bid levels (I) | ask levels (I)
+
+A timestamp of -1 stands for a missing timestamp. Decoding does not copy the
+level arrays, they are views over the message buffer built with `np.frombuffer`.
+'''
+
+import json
+import struct
+import datetime
+
+import numpy as np
+
+from .utils import decode_message
+
+MAGIC = b'THOB'
+VERSION = 1
+SNAPSHOT = 0
+DELTA = 1
+HEADER = struct.Struct('<4sBBHqqHHII')
+
+def format_timestamp(ts):
+    '''Formats a ms timestamp the way ccxt fills the `datetime` field.'''
+    if ts is None:
+        return None
+    dt = datetime.datetime.utcfromtimestamp(ts // 1000)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S') + '.{:03d}Z'.format(int(ts % 1000))
+
+def level_array(levels):
+    '''Returns `levels` as a contiguous (n, 2) float64 array, dropping any
+    fields after the price and quantity, which may not be numeric (e.g. an
+    order id).
+    '''
+    if len(levels) == 0:
+        return np.empty((0, 2))
+    if isinstance(levels, np.ndarray) and levels.ndim == 2 and levels.dtype != object:
+        return np.ascontiguousarray(levels[:, :2], dtype=np.float64)
+    return np.array([l[:2] for l in levels], dtype=np.float64)
+
+def dumps_order_book(m, seq=0, kind=SNAPSHOT):
+    '''Packs an order book message into the binary format.
+
+    Args:
+        m (dict): An order book as returned by `fetch_order_book`, with the
+            `exchange` id added.
+        seq (int, optional): The sequence number of the message.
+        kind (int, optional): The kind of message. Defaults to `SNAPSHOT`.
+
+    Returns:
+        bytes: The packed message.
+    '''
+    exchange = (m.get('exchange') or '').encode('utf-8')
+    symbol = (m.get('symbol') or '').encode('utf-8')
+    bids = level_array(m['bids'])
+    asks = level_array(m['asks'])
+    ts = m.get('timestamp')
+    header = HEADER.pack(MAGIC, VERSION, kind, 0, seq, -1 if ts is None else ts,
+                            len(exchange), len(symbol), len(bids), len(asks))
+    pad = b'\0'*(-(HEADER.size + len(exchange) + len(symbol)) % 8)
+    return b''.join([header, exchange, symbol, pad, bids.tobytes(), asks.tobytes()])
+
+def loads_order_book(buf):
+    '''Unpacks a message in the binary format.
+
+    Args:
+        buf (bytes): The packed message.
+
+    Returns:
+        dict: The order book with `exchange`, `symbol`, `timestamp`, `datetime`,
+            `seq` and `kind` fields, and `bids`/`asks` as (n, 2) float64 arrays.
+
+    Raises:
+        ValueError: If `buf` is not a message in a supported version of the format.
+    '''
+    magic, version, kind, _, seq, ts, n_exchange, n_symbol, n_bids, n_asks = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a binary order book message of version {}'.format(VERSION))
+    offset = HEADER.size
+    exchange = bytes(buf[offset:offset+n_exchange]).decode('utf-8')
+    offset += n_exchange
+    symbol = bytes(buf[offset:offset+n_symbol]).decode('utf-8')
+    offset += n_symbol
+    offset += -offset % 8
+    bids = np.frombuffer(buf, dtype=np.float64, count=2*n_bids, offset=offset).reshape(n_bids, 2)
+    offset += bids.nbytes
+    asks = np.frombuffer(buf, dtype=np.float64, count=2*n_asks, offset=offset).reshape(n_asks, 2)
+    ts = None if ts < 0 else ts
+    return {'exchange': exchange, 'symbol': symbol, 'timestamp': ts,
+            'datetime': format_timestamp(ts), 'seq': seq, 'kind': kind,
+            'bids': bids, 'asks': asks}
+
+class JSONSerializer(object):
+    '''Serializes messages as JSON text.'''
+    name = 'json'
+
+    def dumps(self, m, **kwargs):
+        return json.dumps(m)
+
+    def loads(self, value):
+        return decode_message(value)
+
+class BinarySerializer(object):
+    '''Serializes order book messages in the packed binary format.'''
+    name = 'binary'
+
+    def dumps(self, m, seq=0, **kwargs):
+        return dumps_order_book(m, seq=seq, kind=m.get('kind', SNAPSHOT))
+
+    def loads(self, value):
+        return loads_order_book(value)
+
+SERIALIZERS = {'json': JSONSerializer, 'binary': BinarySerializer}
+
+def get_serializer(name):
+    '''Returns an instance of the serializer registered under `name`.
+
+    Raises:
+        AttributeError: If there is no such serializer.
+    '''
+    if name not in SERIALIZERS:
+        raise AttributeError('serializer {} is not a valid serializer'.format(name))
+    return SERIALIZERS[name]()
+
+def deserialize(value):
+    '''Decodes a Kafka message value written by any of the serializers, by
+    checking for the magic bytes of the binary format first.
+    '''
+    if value[:4] == MAGIC:
+        return loads_order_book(value)
+    return decode_message(value)
@@ -1,8 +1,21 @@
 import os
+import json
 import asyncio
 import pandas as pd
 import ccxt.async as ccxt
 
+from thorn import config as global_config
+from .DiskCache import DiskCache
+
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+try:
+    import ujson as _ujson
+except ImportError:
+    _ujson = None
+
 def read_private_api_info(loc, name, index_col_name='exchange'):
     '''Helper method for reading API Keys and Secret Keys. Returns a dictionary
     of form {'exchange': {'api_key': '<>'}, {'secret key':'<>'}} as expected
@@ -20,31 +33,78 @@ def read_private_api_info(loc, name, index_col_name='exchange'):
     df = df.set_index(index_col_name)
     return df.to_dict('index')
 
-def instantiate_exchanges(exchanges, loop=None):
+def instantiate_exchanges(exchanges, loop=None, cache_dir=None, ttl=None):
     '''Instantiates the exchanges listed in `exchanges` parameter. The parameter
     must be an iterable containing the name of the property returned by
     `exchange.id`. This function returns a dict mapping the id of the exchange
     to the instantiated exchange object.
 
+    The markets of all the exchanges are loaded concurrently, from the on-disk
+    markets cache when it holds an entry younger than `ttl` (see
+    `load_markets`), so that only the first of many processes started together
+    goes to the network.
+
     Args:
         - exchanges (list[str]): An iterable object whose first iterable object
             is a string representing the id of the exchange as per `exchange.id`.
+        - loop (asyncio.event_loop, optional): The loop to load markets with.
+        - cache_dir (str, optional): The directory of the markets cache.
+            Defaults to config settings; None in the config disables the cache.
+        - ttl (float, optional): The maximum age in seconds of the cached
+            markets. Defaults to config settings.
 
     Returns: dict mapping exchange id to instantiated exchange object.
     '''
-    ret = {}
+    conf = global_config.MARKETS_CACHE
+    cache_dir = conf['dir'] if cache_dir is None else cache_dir
+    ttl = conf['ttl'] if ttl is None else ttl
+    cache = None if cache_dir is None else DiskCache(cache_dir, version=conf['version'])
     loop = asyncio.get_event_loop() if loop is None else loop
+    instances = []
     for _id in exchanges:
-        exchange = getattr(ccxt, _id)
-        ex = exchange()
         try:
-            loop.run_until_complete(ex.load_markets())
-            ret[_id] = ex
+            instances.append(getattr(ccxt, _id)())
         except Exception as e:
             print('EXCEPTION RAISED FOR {}:'.format(_id), e)
+    results = loop.run_until_complete(asyncio.gather(*[load_markets(ex, cache, ttl) for ex in instances],
+                                                     return_exceptions=True))
+    ret = {}
+    for ex, result in zip(instances, results):
+        if isinstance(result, Exception):
+            print('EXCEPTION RAISED FOR {}:'.format(ex.id), result)
+        else:
+            ret[ex.id] = ex
     # loop.close()
     return ret
 
+async def load_markets(exchange, cache=None, ttl=None):
+    '''Loads the markets of a ccxt exchange from `cache` if it holds an entry
+    younger than `ttl` seconds, and from the exchange otherwise, storing them
+    in `cache` afterwards. Entries are keyed by exchange id and ccxt version,
+    since the unified market structure changes between versions.
+
+    ASYNC
+
+    Args:
+        - exchange (ccxt.exchange): The exchange.
+        - cache (DiskCache, optional): The markets cache.
+        - ttl (float, optional): The maximum age of the cached markets.
+
+    Returns: dict, the markets of the exchange.
+    '''
+    key = 'markets:{}:{}'.format(exchange.id, ccxt.__version__)
+    entry = None if cache is None else cache.get(key, ttl=ttl)
+    if entry is not None:
+        exchange.set_markets(entry['value']['markets'], entry['value']['currencies'])
+        return exchange.markets
+    markets = await exchange.load_markets()
+    if cache is not None:
+        try:
+            cache.set(key, {'markets': markets, 'currencies': exchange.currencies})
+        except (OSError, TypeError, ValueError) as e:
+            print('Could not cache the markets of {}:'.format(exchange.id), e)
+    return markets
+
 def create_diff_object(ts, seq, is_bid, price, quantity, exchange, is_trade=False):
     '''Returns a dict-formatted update object for order book tracking.
 
@@ -118,3 +178,38 @@ def reformat_pair(pair):
         str: The reformatted pair
     '''
     return pair.replace('/','_')
+
+def diff_levels(old, new):
+    '''Returns the levels that differ between two sides of an order book given
+    as {price: quantity} dicts. Levels missing from `new` are returned with a
+    quantity of 0.0.
+
+    Args:
+        old (dict): The previous levels.
+        new (dict): The current levels.
+
+    Returns:
+        list: [price, quantity] levels.
+    '''
+    diff = [[p, q] for p, q in new.items() if old.get(p) != q]
+    diff.extend([p, 0.0] for p in old if p not in new)
+    return diff
+
+def decode_message(value):
+    '''Decodes the JSON value of a Kafka message with the fastest available
+    backend: `orjson` if installed, then `ujson`, then the standard `json`
+    module.
+
+    Args:
+        value (bytes or str): The raw message value.
+
+    Returns:
+        The decoded object.
+    '''
+    if _orjson is not None:
+        return _orjson.loads(value)
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    if _ujson is not None:
+        return _ujson.loads(value)
+    return json.loads(value)